@@ -1,21 +1,31 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
 import time
 import sys
 import json
-import shutil
 from werkzeug.utils import secure_filename
-import subprocess
 # Add scripts directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-import re
+import asyncio
 
 
 # Import the necessary modules from scripts
-from mcp_builder import build_mcp_prompt
-from query_chunks import search_legal_chunks, rerank_by_keywords
-from ollama_caller import ask_ollama
+from mcp_builder import pack_mcp_prompt, pack_followup_prompt
+from context_packer import SCORE_CLIFF
+from query_chunks import hybrid_search, hybrid_search_batch, embed_query, query_embedding_cache
+from query_cache import normalize_query
+from answer_cache import AnswerCache, load_warmup_queries, warm_up
+from reranker import get_reranker, chunk_key, RERANKER_CANDIDATES, RERANKER_CONTEXT_K
+from ollama_caller import stream_ollama, get_ollama_client
+from readiness import Readiness
+from sessions import SessionStore
+from jobs import JobQueue, QueueFull
+from namespaces import NamespaceStore
+from embedding_cache import get_cache as get_embedding_cache
+import compare_with_LLMs
+import pipeline
+from pipeline import PipelineError
 
 app = Flask(__name__)
 
@@ -36,55 +46,188 @@ def after_request(response):
 # Sample standards data for demo
 STANDARDS = []
 
+LLM_MODEL = "llama3"
+MAX_BATCH_QUERIES = 100
+QUERIES_FILE = os.path.join(os.path.dirname(__file__), "data", "queries.txt")
+
+def run_compare_job(params, job):
+    namespace = uploads.get(params["namespace"])  # also marks it used so it outlives the job
+    if namespace is None:
+        raise FileNotFoundError("The uploaded policy has expired; upload it again")
+    return pipeline.compare_policy(
+        params["policy_path"], params["standard"], params["llm"],
+        mode=params["mode"], concurrency=params["concurrency"], progress=job.progress,
+        collection=namespace.collection,
+    )
+
+# The encoder and PDF worker pools are spawned, and a spawned worker re-imports
+# this file as __mp_main__. Workers only need the code, so the app's stores,
+# caches and warm-up are created in the serving process alone.
+if __name__ != "__mp_main__":
+    # Semantic cache of generated answers, invalidated when the corpus changes
+    answer_cache = AnswerCache(
+        maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    )
+
+    # Models and clients load lazily; this tracks their background warm-up
+    readiness = Readiness(LLM_MODEL)
+
+    # Conversations that reuse Ollama's context between turns
+    sessions = SessionStore()
+
+    # Each uploaded policy gets its own directory and collection, removed after NAMESPACE_TTL
+    uploads = NamespaceStore()
+
+    # Long compares run as background jobs persisted in data/jobs.sqlite3
+    jobs = JobQueue()
+
+    jobs.register("compare", run_compare_job)
+
+def format_sources(top_results):
+    sources = []
+    for r, score in top_results:
+        p = r.payload
+        sources.append({
+            "source": p.get("source", "Unknown"),
+            "article": p.get("article_id", "Unknown"),
+            "title": p.get("title", "Unknown"),
+            "page": p.get("page"),
+            "score": float(score)
+        })
+    return sources
+
+def candidate_count():
+    return RERANKER_CANDIDATES if get_reranker() else 6
+
+def select_context(ranked, query):
+    """
+    Pick the context blocks for the prompt, cross-encoder reranked when enabled.
+    Returns (results, sources, cliff): the score cliff only applies to
+    cross-encoder scores, never to the fused RRF order.
+    """
+    reranker = get_reranker()
+    cliff = 0
+    if reranker:
+        top_results, info = reranker.rerank(query, ranked, top_n=RERANKER_CONTEXT_K)
+        if info["reranker"] != "fallback":
+            cliff = SCORE_CLIFF
+    else:
+        top_results = ranked[:4]
+    return top_results, format_sources(top_results), cliff
+
+def retrieve_context(query, source_filter=None):
+    ranked, _ = hybrid_search(query, top_k=candidate_count(), source_filter=source_filter)
+    return select_context(ranked, query)
+
 # Process a query using MCP approach
 def process_mcp_query(query, source_filter=None):
     try:
-        # Step 1: Search for relevant chunks
-        raw_results, _ = search_legal_chunks(query, top_k=6, source_filter=source_filter)
-        
-        # Step 2: Rerank results by keywords
-        reranked = rerank_by_keywords(raw_results, query)
+        # Step 0: Return a cached answer for a near-identical question
+        query_vector = embed_query(query)
+        cached, similarity = answer_cache.lookup(query_vector, source_filter, LLM_MODEL)
+        if cached:
+            return {
+                "answer": cached["answer"],
+                "sources": cached["sources"],
+                "success": True,
+                "cached": True,
+                "cache_similarity": round(similarity, 4)
+            }
+
+        # Steps 1-3: Retrieve, rerank and build the prompt
+        top_results, sources, cliff = retrieve_context(query, source_filter)
         
-        if not reranked:
+        if not top_results:
             return {
                 "answer": "No relevant information found. Please try rephrasing or use a different source filter.",
                 "sources": [],
                 "success": False
             }
         
-        # Step 3: Build prompt with top context blocks
-        top_results = reranked[:4]
-        prompt = build_mcp_prompt(query, top_results)
+        prompt, top_results, packing = pack_mcp_prompt(query, top_results, cliff=cliff)
+        sources = format_sources(top_results)
         
         # Step 4: Run local LLM with MCP prompt using Ollama
+        generated = True
+        prompt_eval_count = None
         try:
-            response = ask_ollama(prompt, model="llama3")
+            reply = get_ollama_client().generate(prompt, LLM_MODEL)
+            response = reply["response"]
+            prompt_eval_count = reply.get("prompt_eval_count")
         except Exception as e:
             print(f"Error calling Ollama: {e}")
             # Fallback to simulated response
+            generated = False
             response = simulate_llm_response(query, [r for r, _ in top_results])["answer"]
         
-        # Step 5: Format sources for the response
-        sources = []
-        for idx, (r, score) in enumerate(top_results, 1):
-            p = r.payload
-            sources.append({
-                "source": p.get("source", "Unknown"),
-                "article": p.get("article_id", "Unknown"),
-                "title": p.get("title", "Unknown"),
-                "score": float(score)
-            })
+        # Only real LLM answers are worth serving again
+        if generated:
+            answer_cache.store(query_vector, source_filter, LLM_MODEL, response, sources, query=query)
         
         return {
             "answer": response,
             "sources": sources,
-            "success": True
+            "success": True,
+            "prompt_tokens": packing["prompt_tokens"],
+            "prompt_eval_count": prompt_eval_count,
+            "context": packing
         }
     except Exception as e:
         print(f"Error in process_mcp_query: {e}")
         # Fallback to simulated response
         return simulate_llm_response(query, [])
 
+def process_session_query(session, query, source_filter=None):
+    """
+    Answer one turn of a conversation. After the first turn Ollama gets the
+    previous context array plus a prompt with only the new question and the
+    retrieved chunks it has not seen yet. Session turns bypass the answer
+    cache since their answers depend on the conversation.
+    """
+    with session.lock:
+        source_filter = source_filter or session.source_filter
+        # Elliptical follow-ups ("and the 72-hour exception?") retrieve better with the previous question
+        retrieval_query = f"{session.last_query} {query}" if session.last_query else query
+        top_results, _, cliff = retrieve_context(retrieval_query, source_filter)
+
+        follow_up = session.context is not None
+        if follow_up:
+            new_results = [(hit, score) for hit, score in top_results if chunk_key(hit) not in session.chunk_keys]
+            prompt, used, packing = pack_followup_prompt(query, new_results, first_source=session.sources_shown + 1,
+                                                         cliff=cliff)
+        else:
+            if not top_results:
+                return {
+                    "answer": "No relevant information found. Please try rephrasing or use a different source filter.",
+                    "sources": [],
+                    "success": False,
+                    "session_id": session.id
+                }
+            prompt, used, packing = pack_mcp_prompt(query, top_results, cliff=cliff)
+
+        reply = get_ollama_client().generate(prompt, LLM_MODEL, context=session.ollama_context())
+        new_keys = [chunk_key(hit) for hit, _ in used]
+        # Sources are the retrieved chunks the model can actually see
+        visible = session.chunk_keys.union(new_keys)
+        sources = format_sources([(hit, score) for hit, score in top_results if chunk_key(hit) in visible])
+        session.record_turn(query, reply["response"], sources, new_keys, reply.get("context"), sessions.max_context)
+
+        return {
+            "answer": reply["response"],
+            "sources": sources,
+            "success": True,
+            "session_id": session.id,
+            "turn": len(session.turns),
+            "follow_up": follow_up,
+            "new_chunks": len(used),
+            "prompt_tokens": packing["prompt_tokens"],
+            "prompt_eval_count": reply.get("prompt_eval_count"),
+            "context_tokens": session.context_tokens(),
+            "context": packing
+        }
+
 # Simulated vector DB and LLM functions - would be replaced with actual implementations
 def simulate_vector_search(query, standard=None):
     """Simulate retrieving relevant chunks from vector DB based on query and standard"""
@@ -168,6 +311,17 @@ def process_query():
     
     if not query:
         return jsonify({"error": "Missing query"}), 400
+
+    session_id = data.get('session_id')
+    if session_id or data.get('new_session'):
+        session = sessions.get(session_id) if session_id else sessions.create(standard, LLM_MODEL)
+        if session is None:
+            return jsonify({"error": "Unknown or expired session", "session_id": session_id}), 404
+        try:
+            return jsonify(process_session_query(session, query, standard))
+        except Exception as e:
+            print(f"Error in process_session_query: {e}")
+            return jsonify({"error": str(e), "session_id": session.id}), 502
     
     try:
         # Try to use the MCP query processor
@@ -180,73 +334,277 @@ def process_query():
         response = simulate_llm_response(query, chunks)
         return jsonify(response)
 
+def process_mcp_batch(queries, source_filters, generate=False, concurrency=2):
+    """Answer many queries with one batched embed + search and bounded LLM concurrency."""
+    start = time.perf_counter()
+    raw_batches, query_vectors = hybrid_search_batch(queries, top_k=candidate_count(), source_filters=source_filters)
+    search_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    results = []
+    pending = []
+    duplicates = []
+    first_pending = {}
+    for query, source_filter, raw_results, vector in zip(queries, source_filters, raw_batches, query_vectors):
+        top_results, sources, cliff = select_context(raw_results, query)
+        item = {"query": query, "standard": source_filter, "sources": sources, "success": bool(top_results)}
+        results.append(item)
+        if not generate or not top_results:
+            continue
+        cached, similarity = answer_cache.lookup(vector, source_filter, LLM_MODEL)
+        key = (normalize_query(query), source_filter)
+        if cached:
+            item.update(answer=cached["answer"], cached=True, cache_similarity=round(similarity, 4))
+        elif key in first_pending:
+            duplicates.append((item, first_pending[key]))
+        else:
+            first_pending[key] = item
+            prompt, used, packing = pack_mcp_prompt(query, top_results, cliff=cliff)
+            item.update(sources=format_sources(used), prompt_tokens=packing["prompt_tokens"])
+            pending.append((item, vector, prompt))
+
+    generate_start = time.perf_counter()
+    if pending:
+        replies = asyncio.run(get_ollama_client().agenerate_many(
+            [prompt for _, _, prompt in pending], LLM_MODEL,
+            concurrency=concurrency, return_exceptions=True
+        ))
+        for (item, vector, _), reply in zip(pending, replies):
+            if isinstance(reply, Exception):
+                item.update(success=False, error=str(reply))
+                continue
+            item["answer"] = reply["response"]
+            answer_cache.store(vector, item["standard"], LLM_MODEL, item["answer"], item["sources"], query=item["query"])
+        for item, original in duplicates:
+            item.update({k: original[k] for k in ("answer", "success", "error") if k in original})
+
+    return {
+        "results": results,
+        "timing": {
+            "search_ms": search_ms,
+            "generate_ms": round((time.perf_counter() - generate_start) * 1000, 1),
+            "generated": len(pending)
+        }
+    }
+
+@app.route('/api/query/batch', methods=['POST'])
+def process_query_batch():
+    """Retrieve (and optionally answer) a list of queries in one request"""
+    data = request.json or {}
+    items = data.get('queries') or []
+    default_standard = data.get('standard')
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing queries"}), 400
+    if len(items) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+
+    queries, standards = [], []
+    for item in items:
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not item.get('query'):
+            return jsonify({"error": "Each entry needs a query"}), 400
+        queries.append(item['query'])
+        standards.append(item.get('standard', default_standard))
+
+    try:
+        concurrency = max(1, int(data.get('concurrency', 2)))
+        result = process_mcp_batch(queries, standards, bool(data.get('generate', False)), concurrency)
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in process_mcp_batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_mcp_query(query, source_filter=None):
+    """Yield SSE events: sources first, then tokens as Ollama produces them, then timings."""
+    start = time.perf_counter()
+    elapsed_ms = lambda: round((time.perf_counter() - start) * 1000, 1)
+
+    query_vector = embed_query(query)
+    cached, similarity = answer_cache.lookup(query_vector, source_filter, LLM_MODEL)
+    if cached:
+        yield sse_event("sources", {"sources": cached["sources"], "cached": True})
+        yield sse_event("token", {"token": cached["answer"]})
+        yield sse_event("done", {
+            "cached": True,
+            "cache_similarity": round(similarity, 4),
+            "time_to_first_token_ms": elapsed_ms(),
+            "total_ms": elapsed_ms()
+        })
+        return
+
+    top_results, _, cliff = retrieve_context(query, source_filter)
+    prompt, top_results, packing = pack_mcp_prompt(query, top_results, cliff=cliff)
+    sources = format_sources(top_results)
+    retrieval_ms = elapsed_ms()
+    yield sse_event("sources", {"sources": sources, "retrieval_ms": retrieval_ms})
+    if not top_results:
+        yield sse_event("done", {
+            "success": False,
+            "answer": "No relevant information found. Please try rephrasing or use a different source filter.",
+            "retrieval_ms": retrieval_ms,
+            "total_ms": elapsed_ms()
+        })
+        return
+
+    tokens = []
+    first_token_ms = None
+    final = {}
+    # Leaving this loop early (client disconnect closes the generator) closes
+    # the Ollama connection, which cancels generation.
+    for message in stream_ollama(prompt, model=LLM_MODEL):
+        token = message.get("response", "")
+        if token:
+            if first_token_ms is None:
+                first_token_ms = elapsed_ms()
+            tokens.append(token)
+            yield sse_event("token", {"token": token})
+        if message.get("done"):
+            final = message
+
+    answer_cache.store(query_vector, source_filter, LLM_MODEL, "".join(tokens), sources, query=query)
+    yield sse_event("done", {
+        "success": True,
+        "retrieval_ms": retrieval_ms,
+        "time_to_first_token_ms": first_token_ms,
+        "total_ms": elapsed_ms(),
+        "prompt_tokens": packing["prompt_tokens"],
+        "prompt_eval_count": final.get("prompt_eval_count"),
+        "eval_count": final.get("eval_count"),
+        "ollama_total_ms": round(final.get("total_duration", 0) / 1e6, 1)
+    })
+
+@app.route('/api/query/stream', methods=['POST'])
+def process_query_stream():
+    """Stream an answer as Server-Sent Events"""
+    data = request.json or {}
+    query = data.get('query')
+    standard = data.get('standard')
+
+    if not query:
+        return jsonify({"error": "Missing query"}), 400
+
+    def generate():
+        try:
+            yield from stream_mcp_query(query, standard)
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            print(f"Error in stream_mcp_query: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/api/compare', methods=['POST'])
 def compare_policy():
-    """Compare uploaded company policy against a selected standard."""
+    """
+    Compare uploaded company policy against a selected standard.
+    With async=true the compare is queued and a job id is returned at once (202).
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
 
     policy_file = request.files['file']
     standard = request.form.get('standard')
     llm_model = request.form.get('llm', 'llama3')
+    mode = request.form.get('mode', pipeline.COMPARE_MODE)
+    run_async = request.form.get('async', '').lower() in ('1', 'true', 'yes')
 
     if not policy_file or not standard:
         return jsonify({"error": "Missing file or standard"}), 400
+    if mode not in pipeline.COMPARE_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(pipeline.COMPARE_MODES)}"}), 400
+    try:
+        concurrency = max(1, int(request.form.get('concurrency', compare_with_LLMs.COMPARE_CONCURRENCY)))
+    except ValueError:
+        return jsonify({"error": "concurrency must be an integer"}), 400
 
     try:
         # Ensure file name is safe
         filename = secure_filename(policy_file.filename)
-
-        # Create a fresh directory for company policies
-        raw_policy_dir = os.path.join(os.path.dirname(__file__), "data", "company_chunks")
-        if os.path.exists(raw_policy_dir):
-            shutil.rmtree(raw_policy_dir)
-        os.makedirs(raw_policy_dir, exist_ok=True)
-
-        # Save uploaded file
-        base_name = os.path.splitext(filename)[0]  # Remove .pdf
-        jsonl_filename = base_name + ".jsonl"
-
-        temp_path = os.path.join(raw_policy_dir, jsonl_filename)
-        policy_file.save(temp_path)
-        print(f"Saved policy file to {temp_path}")
-
-        # 1. Chunk the policy
-        chunk_proc = subprocess.run(
-            ["python", "scripts/chunk_company_policy.py", temp_path],
-            capture_output=True, text=True
-        )
-        if chunk_proc.returncode != 0:
-            return jsonify({"error": f"Policy chunking failed:\n{chunk_proc.stderr}"}), 500
-        
-        print("Policy chunking successful")
-
-        # 2. Embed the policy
-        embed_proc = subprocess.run(
-            ["python", "scripts/embed_company_policy.py", temp_path],
-            capture_output=True, text=True
-        )
-        print("Policy embedding successful")
-        if embed_proc.returncode != 0:
-            return jsonify({"error": f"Policy embedding failed:\n{embed_proc.stderr}"}), 500
-
-        # 3. Compare using LLM
-        print("Comparing policy with LLM", temp_path, standard, llm_model)
-        compare_proc = subprocess.run(
-            ["python", "scripts/compare_with_LLMs.py", "--policy", temp_path, "--standard", standard, "--llm", llm_model, "--quiet" ],
-            capture_output=True, text=True
+        if not filename:
+            return jsonify({"error": "Invalid file name"}), 400
+
+        # Save uploaded file into its own namespace
+        namespace = uploads.create()
+        policy_path = str(namespace.path(filename))
+        policy_file.save(policy_path)
+        print(f"Saved policy file to {policy_path}")
+
+        if run_async:
+            try:
+                job_id = jobs.submit("compare", {
+                    "policy_path": policy_path, "standard": standard, "llm": llm_model,
+                    "mode": mode, "concurrency": concurrency, "namespace": namespace.id,
+                })
+            except QueueFull:
+                uploads.delete(namespace.id)
+                raise
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/jobs/{job_id}",
+                "result_url": f"/api/jobs/{job_id}/result",
+            }), 202
+
+        # Parse, chunk, embed and compare in-process
+        result = pipeline.compare_policy(
+            policy_path, standard, llm_model, mode=mode, concurrency=concurrency, collection=namespace.collection
         )
-        if compare_proc.returncode != 0:
-            return jsonify({"error": f"Comparison failed:\n{compare_proc.stderr}"}), 500
-
-        # Return result
-        response_text = compare_proc.stdout.strip()
-        return jsonify({"result": response_text})
+        return jsonify({**result, "namespace": namespace.id})
 
+    except QueueFull as e:
+        return jsonify({"error": f"Too many compare jobs: {e}"}), 429
+    except PipelineError as e:
+        return jsonify({"error": f"Policy {e.stage} failed: {e.message}", "stages": e.stages}), 500
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
 
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Most recent jobs first, without their results."""
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    return jsonify({"jobs": jobs.store.list(limit)})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and progress (stage, articles_done / articles_total) of a job."""
+    job = jobs.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """The compare result once the job succeeded; 202 while it is still queued or running."""
+    job = jobs.store.get(job_id, with_result=True)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] == "succeeded":
+        return jsonify(job["result"])
+    if job["status"] in ("queued", "running"):
+        return jsonify({"job_id": job_id, "status": job["status"], "progress": job["progress"]}), 202
+    body = {"job_id": job_id, "status": job["status"], "error": job["error"] or f"Job {job['status']}"}
+    body.update(job["result"] or {})
+    return jsonify(body), 409
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next stage or LLM call."""
+    status = jobs.cancel(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({"job_id": job_id, "status": status}), 202 if status == "cancelling" else 200
+
+
 @app.route('/api/upload-standard', methods=['POST'])
 def upload_standard():
     """Upload a new compliance standard, chunk, and embed it."""
@@ -254,8 +612,7 @@ def upload_standard():
         return jsonify({"error": "No file provided"}), 400
 
     standard_file = request.files['file']
-    standard_name = request.form.get('name')
-   
+    standard_name = secure_filename(request.form.get('name') or '')
 
     if not standard_file or not standard_name:
         return jsonify({"error": "Missing file or standard name"}), 400
@@ -267,36 +624,81 @@ def upload_standard():
     standard_file.save(file_path)
 
     try:
-        # 1. Chunk the document (processes all files in raw_docs)
-        import subprocess
-        print("Chunking document...")
-        chunker_result = subprocess.run(
-            ["python", "scripts/chunker.py"],
-            capture_output=True, text=True
-        )
-
-        if chunker_result.returncode != 0:
-            return jsonify({"error": f"Chunking failed: {chunker_result.stderr}"}), 500
-
-        # 2. Embed and store the chunks for this standard
-        embed_result = subprocess.run(
-            ["python", "scripts/embed_store.py", standard_name],
-            capture_output=True, text=True
-        )
-        if embed_result.returncode != 0:
-            return jsonify({"error": f"Embedding failed: {embed_result.stderr}"}), 500
+        # Chunk, embed and store only the uploaded document
+        print("Ingesting document...")
+        ingest = pipeline.ingest_standard(file_path, standard_name)
 
         # Add to available standards
         if standard_name not in STANDARDS:
             STANDARDS.append(standard_name)
 
+        # Answers generated against the old corpus are now stale
+        if not ingest["unchanged"]:
+            answer_cache.bump_corpus_version()
+
         return jsonify({
-            "message": f"Successfully uploaded, chunked, and embedded {standard_name}",
-            "added": True
+            "message": f"{standard_name} is unchanged since its last ingest" if ingest["unchanged"]
+            else f"Successfully uploaded, chunked, and embedded {standard_name}",
+            "added": True,
+            "unchanged": ingest["unchanged"],
+            "chunks": ingest["chunks"],
+            "skipped": ingest["skipped"],
+            "added_chunks": ingest["added"],
+            "updated": ingest["updated"],
+            "deleted": ingest["deleted"],
+            "stages": ingest["stages"]
         })
+    except PipelineError as e:
+        return jsonify({"error": f"Ingestion {e.stage} failed: {e.message}", "stages": e.stages}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """Start a conversation; pass the returned session_id to /api/query"""
+    data = request.json or {}
+    session = sessions.create(data.get('standard'), LLM_MODEL)
+    return jsonify({"session_id": session.id, "expires_in": sessions.ttl}), 201
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    return jsonify(session.summary())
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if not sessions.delete(session_id):
+        return jsonify({"error": "Unknown or expired session"}), 404
+    return '', 204
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Return hit/miss counters for the in-process caches."""
+    reranker = get_reranker()
+    embedding_cache = get_embedding_cache()
+    return jsonify({
+        "query_embeddings": query_embedding_cache.stats(),
+        "embeddings": embedding_cache.stats() if embedding_cache else None,
+        "answers": answer_cache.stats(),
+        "sessions": sessions.stats(),
+        "uploads": uploads.stats(),
+        "reranker": reranker.stats() if reranker else None
+    })
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up; includes each dependency's warm-up state and latency."""
+    return jsonify(readiness.health())
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 only once warm-up has finished and dependencies are reachable."""
+    readiness.start()  # no-op if already warming, covers servers that skip __main__
+    ready, report = readiness.readiness()
+    return jsonify(report), 200 if ready else 503
+
 @app.route('/api/embedded-standards', methods=['GET'])
 def get_embedded_standards():
     """Return standards for which embeddings exist (based on parsed_json_semantic files)."""
@@ -312,4 +714,13 @@ def get_embedded_standards():
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5001)
+    debug = True
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    serving = not debug or os.getenv("WERKZEUG_RUN_MAIN") == "true"
+    if serving:
+        readiness.start()
+        uploads.start_collector()
+        jobs.resume()
+    if os.getenv("ANSWER_CACHE_WARMUP", "1") == "1" and serving:
+        warm_up(process_mcp_query, load_warmup_queries(QUERIES_FILE), ready=readiness.finished)
+    app.run(debug=debug, host="0.0.0.0", port=5001)
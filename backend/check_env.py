@@ -43,16 +43,21 @@ for package in required_packages:
         missing_packages.append(package)
         print(f"❌ {package}")
 
-# Check Qdrant connection
-try:
-    print("\nChecking Qdrant connection...")
-    from qdrant_client import QdrantClient
-    client = QdrantClient(host="localhost", port=6333)
-    client.get_collections()
-    print("✅ Successfully connected to Qdrant")
-except Exception as e:
-    print(f"❌ Could not connect to Qdrant: {e}")
-    print("Make sure Qdrant is installed and running on localhost:6333")
+# Check Qdrant connection (skipped for the in-process NumPy vector store)
+qdrant_host = os.getenv("QDRANT_HOST", "localhost")
+qdrant_port = int(os.getenv("QDRANT_PORT", "6333"))
+if os.getenv("VECTOR_BACKEND", "qdrant").lower() == "numpy":
+    print("\nVECTOR_BACKEND=numpy: using the in-process vector store, Qdrant not required")
+else:
+    try:
+        print("\nChecking Qdrant connection...")
+        from qdrant_client import QdrantClient
+        client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        client.get_collections()
+        print("✅ Successfully connected to Qdrant")
+    except Exception as e:
+        print(f"❌ Could not connect to Qdrant: {e}")
+        print(f"Make sure Qdrant is installed and running on {qdrant_host}:{qdrant_port}")
 
 # Suggest installation command for missing packages
 if missing_packages:
@@ -68,7 +73,19 @@ required_scripts = [
     "run_mcp_query.py",
     "mcp_builder.py",
     "query_chunks.py",
-    "ollama_caller.py"
+    "ollama_caller.py",
+    "pipeline.py",
+    "vector_store.py",
+    "embeddings.py",
+    "readiness.py",
+    "jobs.py",
+    "namespaces.py",
+    "manifest.py",
+    "pdf_parser.py",
+    "chunking.py",
+    "keywords.py",
+    "bulk_encoder.py",
+    "embedding_cache.py"
 ]
 
 for script in required_scripts:
@@ -0,0 +1,134 @@
+"""
+Semantic cache for generated answers.
+
+Answers are keyed by (query embedding, source filter, LLM model, corpus
+version). A lookup returns a stored answer when a previous query with the
+same filter, model and corpus version has cosine similarity above the
+threshold. Entries expire after a TTL and the least recently used ones are
+evicted once the cache is full. Bumping the corpus version (after a new
+standard is ingested) makes every older answer unreachable.
+"""
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+class AnswerCache:
+    def __init__(self, maxsize=256, ttl=3600, threshold=0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.corpus_version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry, now):
+        return self.ttl and now - entry["created_at"] > self.ttl
+
+    def _purge_expired(self, now):
+        for key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+            del self._entries[key]
+
+    def lookup(self, query_vector, source_filter, model):
+        """Return (entry, similarity) for the closest fresh match, or (None, score)."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            now = time.time()
+            self._purge_expired(now)
+            candidates = [
+                (key, e) for key, e in self._entries.items()
+                if e["source_filter"] == source_filter
+                and e["model"] == model
+                and e["corpus_version"] == self.corpus_version
+            ]
+            if not candidates:
+                self.misses += 1
+                return None, 0.0
+            matrix = np.stack([e["vector"] for _, e in candidates])
+            scores = matrix @ query_vector
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                self.misses += 1
+                return None, score
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry, score
+
+    def store(self, query_vector, source_filter, model, answer, sources, query=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[next(self._ids)] = {
+                "vector": np.asarray(query_vector, dtype=np.float32),
+                "source_filter": source_filter,
+                "model": model,
+                "corpus_version": self.corpus_version,
+                "query": query,
+                "answer": answer,
+                "sources": sources,
+                "created_at": time.time(),
+            }
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def bump_corpus_version(self):
+        """Invalidate every cached answer; call after the indexed corpus changes."""
+        with self._lock:
+            self.corpus_version += 1
+            self._entries.clear()
+            return self.corpus_version
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+                "corpus_version": self.corpus_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def load_warmup_queries(path):
+    """Extract the quoted questions from a queries.txt style file."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    text = path.read_text(encoding="utf-8")
+    return [q.strip() for q in re.findall(r'"([^"]+)"', text) if q.strip()]
+
+
+def warm_up(answer_fn, queries, ready=None):
+    """Pre-answer queries in a daemon thread so their answers land in the cache.
+
+    If ready (a threading.Event) is given, wait for it first so the answers
+    come from the real model rather than start-up fallbacks.
+    """
+    def run():
+        if ready is not None:
+            ready.wait()
+        start = time.perf_counter()
+        for q in queries:
+            try:
+                answer_fn(q)
+            except Exception as e:
+                print(f"⚠️ Warm-up failed for {q!r}: {e}")
+        print(f"🔥 Answer cache warm-up: {len(queries)} queries in {time.perf_counter() - start:.1f}s")
+
+    thread = threading.Thread(target=run, name="answer-cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,82 @@
+"""
+Compare embedding models and runtimes on latency and retrieval agreement.
+
+    python scripts/bench_embeddings.py
+    python scripts/bench_embeddings.py --configs e5-large-v2:torch e5-small-v2:onnx bge-small-en-v1.5:onnx
+
+The first config is the reference. For every config the sample of parsed
+chunks and the questions in data/queries.txt are embedded, and recall@k is
+the share of the reference top-k chunks that the config also retrieves.
+Query latency is measured one question at a time, as in /api/query.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import load_warmup_queries
+from bm25_index import load_records
+from embeddings import load_encoder
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+QUERIES_FILE = BASE_DIR / "data" / "queries.txt"
+DEFAULT_CONFIGS = ["e5-large-v2:torch", "e5-large-v2:onnx", "e5-base-v2:onnx", "e5-small-v2:onnx", "bge-small-en-v1.5:onnx"]
+
+
+def top_k(passages, queries, k):
+    scores = queries @ passages.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def run_config(config, texts, questions, k):
+    model, runtime = config.split(":")
+    start = time.perf_counter()
+    encoder = load_encoder(model, runtime)
+    load_s = time.perf_counter() - start
+
+    encoder.encode_queries(questions[:1], cache=False)  # first call pays for lazy initialization
+    start = time.perf_counter()
+    passages = encoder.encode_passages(texts, cache=False)
+    passage_s = time.perf_counter() - start
+
+    latencies = []
+    vectors = []
+    for q in questions:
+        start = time.perf_counter()
+        vectors.append(encoder.encode_queries(q, cache=False))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "config": config,
+        "dim": encoder.dim,
+        "load_s": round(load_s, 1),
+        "chunks_per_s": round(len(texts) / passage_s, 1) if passage_s else None,
+        "query_ms_p50": round(float(np.percentile(latencies, 50)), 1),
+        "query_ms_p95": round(float(np.percentile(latencies, 95)), 1),
+        "top": top_k(passages, np.stack(vectors), k),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="model:runtime pairs, reference first")
+    parser.add_argument("--chunks", type=int, default=1000, help="Number of parsed chunks to embed")
+    parser.add_argument("--k", type=int, default=6)
+    args = parser.parse_args()
+
+    records = load_records()
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(records), size=min(args.chunks, len(records)), replace=False)
+    texts = [records[i]["full_text"] for i in sorted(rows)]
+    questions = load_warmup_queries(QUERIES_FILE)
+    print(f"📊 {len(texts)} chunks, {len(questions)} queries, k={args.k}")
+
+    reference = None
+    for config in args.configs:
+        row = run_config(config, texts, questions, args.k)
+        reference = reference or row["top"]
+        recall = np.mean([len(a & b) / args.k for a, b in zip(reference, row["top"])])
+        print(
+            f"{row['config']:>26}: dim={row['dim']}, load {row['load_s']}s, {row['chunks_per_s']} chunks/s, "
+            f"query p50={row['query_ms_p50']} ms p95={row['query_ms_p95']} ms, recall@{args.k}={recall:.3f}"
+        )
@@ -0,0 +1,92 @@
+"""
+Benchmark keyword extraction on the ingested standards: the corpus-level
+TF-IDF scorer against per-chunk RAKE.
+
+    python scripts/bench_keywords.py [STANDARD ...]
+
+For every standard in data/parsed_json_semantic it reports chunks/s for
+each method (uncached) and how much the two keyword lists agree: the mean
+share of a chunk's RAKE keywords whose words also appear in its TF-IDF
+keywords.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import keywords
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CHUNK_DIR = BASE_DIR / "data" / "parsed_json_semantic"
+
+
+def load_texts(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["full_text"] for line in f if line.strip()]
+
+
+def timed(method, texts):
+    start = time.perf_counter()
+    result = keywords.score_document(texts, method, keywords.KEYWORD_TOP_K)
+    return result, time.perf_counter() - start
+
+
+def agreement(rake, tfidf):
+    """Mean share of RAKE keywords fully covered by the words of the TF-IDF keywords."""
+    shares = []
+    for a, b in zip(rake, tfidf):
+        if not a:
+            continue
+        words = {w for phrase in b for w in phrase.split()}
+        shares.append(sum(all(w in words for w in p.split()) for p in a) / len(a))
+    return sum(shares) / len(shares) if shares else None
+
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("standards", nargs="*", help="standard names (default: all)")
+    args = parser.parse_args()
+
+    paths = sorted(CHUNK_DIR.glob("*.jsonl"))
+    if args.standards:
+        paths = [p for p in paths if p.stem in args.standards]
+    totals = {"chunks": 0, "tfidf": 0.0, "rake": 0.0}
+    rake_error = None
+    for path in paths:
+        texts = load_texts(path)
+        tfidf, tfidf_s = timed("tfidf", texts)
+        line = f"📄 {path.stem}: {len(texts)} chunks | tfidf {rate(len(texts), tfidf_s)} chunks/s"
+        totals["chunks"] += len(texts)
+        totals["tfidf"] += tfidf_s
+        if rake_error is None:
+            try:
+                rake, rake_s = timed("rake", texts)
+            except Exception as e:  # RAKE needs the NLTK stopwords/punkt data
+                rake_error = e
+            else:
+                totals["rake"] += rake_s
+                line += f" | rake {rate(len(texts), rake_s)} chunks/s"
+                share = agreement(rake, tfidf)
+                if share is not None:
+                    line += f" | agreement {share:.0%}"
+        print(line)
+        if texts:
+            print(f"   tfidf: {', '.join(tfidf[0][:6])}")
+
+    print(f"✅ tfidf: {totals['chunks']} chunks in {totals['tfidf']:.3f}s "
+          f"({rate(totals['chunks'], totals['tfidf'])} chunks/s)")
+    if rake_error is not None:
+        reason = " ".join(str(rake_error).replace("*", "").split())[:160]
+        print(f"⚠️ RAKE unavailable, not compared: {type(rake_error).__name__}: {reason}")
+    elif totals["rake"]:
+        print(f"✅ rake: {totals['chunks']} chunks in {totals['rake']:.3f}s "
+              f"({rate(totals['chunks'], totals['rake'])} chunks/s, "
+              f"{totals['rake'] / totals['tfidf']:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measure memory savings and recall@k of int8 / binary quantization against
+the float32 baseline on a stored collection.
+
+    python scripts/bench_quantization.py                       # queries from data/queries.txt
+    python scripts/bench_quantization.py --corpus-queries 200  # no model needed
+
+Recall@k is the share of the exact float32 top-k that the quantized search
+returns, both on the codes alone and after full-precision rescoring of the
+top_k * oversample candidates.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import load_warmup_queries
+from quantization import QUANTIZERS, memory_report, rescore
+from vector_store import get_vector_store
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+QUERIES_FILE = BASE_DIR / "data" / "queries.txt"
+
+
+def top_rows(scores, k):
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def load_queries(vectors, corpus_queries, seed=0):
+    if corpus_queries:
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(vectors), size=min(corpus_queries, len(vectors)), replace=False)
+        return vectors[rows]
+    from embeddings import get_encoder
+    return get_encoder().encode_queries(load_warmup_queries(QUERIES_FILE))
+
+
+def benchmark(vectors, queries, k=6, oversample=4.0):
+    exact_top = [set(top_rows(vectors @ q, k).tolist()) for q in queries]
+    report = []
+    for name, cls in QUANTIZERS.items():
+        quantizer = cls().fit(vectors)
+        codes = quantizer.encode(vectors)
+        raw_hits = rescored_hits = 0
+        start = time.perf_counter()
+        for q, truth in zip(queries, exact_top):
+            approx = quantizer.scores(codes, q)
+            raw_hits += len(truth & set(top_rows(approx, k).tolist()))
+            candidates = top_rows(approx, min(len(approx), int(np.ceil(k * oversample))))
+            rows, _ = rescore(vectors, candidates, q, k)
+            rescored_hits += len(truth & set(rows.tolist()))
+        elapsed = time.perf_counter() - start
+        report.append({
+            "mode": name,
+            **memory_report(len(vectors), vectors.shape[1], name),
+            f"recall@{k}_codes": round(raw_hits / (k * len(queries)), 4),
+            f"recall@{k}_rescored": round(rescored_hits / (k * len(queries)), 4),
+            "ms_per_query": round(elapsed * 1000 / len(queries), 3),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default="compliance_semantic")
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--oversample", type=float, default=4.0)
+    parser.add_argument("--corpus-queries", type=int, default=0,
+                        help="Use N stored vectors as queries instead of embedding data/queries.txt")
+    args = parser.parse_args()
+
+    _, vectors, _ = get_vector_store().scroll(args.collection, with_vectors=True)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = load_queries(vectors, args.corpus_queries)
+    print(f"📊 {len(vectors)} vectors × {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    for row in benchmark(vectors, queries, k=args.k, oversample=args.oversample):
+        mem = f"{row['float32_bytes'] / 1e6:.2f} MB → {row[row['mode'] + '_bytes'] / 1e6:.2f} MB ({row['ratio']}x)"
+        print(
+            f"{row['mode']:>6}: {mem}, recall@{args.k} codes={row[f'recall@{args.k}_codes']:.3f} "
+            f"rescored={row[f'recall@{args.k}_rescored']:.3f}, {row['ms_per_query']} ms/query"
+        )
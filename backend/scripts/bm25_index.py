@@ -0,0 +1,210 @@
+"""
+BM25 inverted index over the regulation chunks in data/parsed_json_semantic.
+
+The index is built at ingest time and persisted as a CSR-style posting list
+in a single compressed .npz file (terms, posting offsets, doc ids, term
+frequencies, doc lengths, chunk ids) together with a hash of the indexed
+chunk ids and texts. Payloads are not duplicated: they are read back from
+the chunk files when the index is loaded, once per process, and the index
+is rebuilt if the chunk files no longer hash to the stored value.
+A query only touches the postings of its own terms, so
+exact matches like "Article 33" or "A.9.2" are found in well under a
+millisecond even when the dense embedding misses them.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from vector_store import ScoredHit
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data" / "parsed_json_semantic"
+INDEX_DIR = BASE_DIR / "data" / "bm25"
+INDEX_FILE = INDEX_DIR / "bm25.npz"
+
+K1 = 1.2
+B = 0.75
+HEADING_WEIGHT = 3  # article id + title count as this many occurrences in the body
+PAYLOAD_FIELDS = ("article_id", "title", "source", "jurisdiction", "top_keywords", "full_text")
+
+# Dotted clause ids (A.9.2, 1798.140) are kept whole; everything else splits on non-alphanumerics.
+TOKEN_RE = re.compile(r"§|(?:[a-z]\.)?\d+(?:\.\d+)*|[a-z0-9]+")
+LABEL_WORDS = {"article", "art", "section", "clause", "chapter", "annex", "recital", "§"}
+
+
+def tokenize(text):
+    """Lowercase tokens plus a joined token for labels like 'Article 33' -> 'article_33'."""
+    tokens = TOKEN_RE.findall(text.lower())
+    labels = [
+        f"{a}_{b}" for a, b in zip(tokens, tokens[1:])
+        if a in LABEL_WORDS and any(c.isdigit() for c in b)
+    ]
+    # "a.9.2" also matches documents that only print the numeric part
+    bare = [t[2:] for t in tokens if len(t) > 2 and t[1] == "." and t[0].isalpha()]
+    return tokens + labels + bare
+
+
+def content_hash(records):
+    """Digest of every record's id and indexed text, in index order."""
+    digest = hashlib.sha256()
+    for doc_id, r in enumerate(records):
+        text = json.dumps([r.get("id", str(doc_id)), r.get("article_id"), r.get("title"), r.get("full_text")],
+                          ensure_ascii=False)
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class BM25Index:
+    def __init__(self, terms, indptr, doc_ids, tfs, doc_len, docs, k1=K1, b=B, content_hash=""):
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+        self.content_hash = content_hash
+        n = len(docs)
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg = float(doc_len.mean()) if n else 0.0
+        self.norm = (k1 * (1 - b + b * doc_len / avg)).astype(np.float32) if n else doc_len.astype(np.float32)
+        self._source_masks = {}
+        sources = np.array([d["payload"].get("source", "") for d in docs])
+        for source in set(sources.tolist()):
+            self._source_masks[source] = sources == source
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, records):
+        docs = []
+        postings = {}
+        doc_len = []
+        for doc_id, r in enumerate(records):
+            heading = tokenize(f"{r.get('article_id', '')} {r.get('title', '')}")
+            counts = Counter(tokenize(r.get("full_text", "")))
+            for term in heading:
+                counts[term] += HEADING_WEIGHT
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+            doc_len.append(sum(counts.values()))
+            docs.append({"id": r.get("id", str(doc_id)), "payload": {k: r.get(k) for k in PAYLOAD_FIELDS}})
+
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            indptr[i + 1] = indptr[i] + len(postings[term])
+        doc_ids = np.fromiter((d for t in terms for d, _ in postings[t]), dtype=np.int32, count=int(indptr[-1]))
+        tfs = np.fromiter((min(tf, 65535) for t in terms for _, tf in postings[t]), dtype=np.uint16, count=int(indptr[-1]))
+        return cls(terms, indptr, doc_ids, tfs, np.array(doc_len, dtype=np.float32), docs,
+                   content_hash=content_hash(records))
+
+    def save(self, index_file=INDEX_FILE):
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        np.savez_compressed(
+            index_file,
+            terms=np.array(terms),
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+            ids=np.array([d["id"] for d in self.docs]),
+            content_hash=np.array(self.content_hash),
+        )
+
+    @classmethod
+    def load(cls, records, index_file=INDEX_FILE):
+        """Load postings from disk; returns None if they no longer match the chunk files."""
+        with np.load(index_file) as data:
+            arrays = {k: data[k] for k in data.files}
+        digest = content_hash(records)
+        if "content_hash" not in arrays or str(arrays["content_hash"]) != digest:
+            return None
+        docs = [
+            {"id": i, "payload": {k: r.get(k) for k in PAYLOAD_FIELDS}}
+            for i, r in zip(arrays["ids"].tolist(), records)
+        ]
+        return cls(arrays["terms"].tolist(), arrays["indptr"], arrays["doc_ids"], arrays["tfs"], arrays["doc_len"],
+                   docs, content_hash=digest)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.term_ids.get(term)
+            if t is None:
+                continue
+            start, end = self.indptr[t], self.indptr[t + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        return scores
+
+    def search(self, query, top_k=8, source_filter=None):
+        if not self.docs:
+            return []
+        scores = self.scores(query)
+        if source_filter:
+            mask = self._source_masks.get(source_filter)
+            if mask is None:
+                return []
+            scores = np.where(mask, scores, 0.0)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            ScoredHit(self.docs[i]["id"], float(scores[i]), self.docs[i]["payload"])
+            for i in top if scores[i] > 0
+        ]
+
+
+# === Build / Load ===
+def load_records(data_dir=DATA_DIR):
+    records = []
+    for file in sorted(Path(data_dir).glob("*.jsonl")):
+        with open(file, "r", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def build_index(data_dir=DATA_DIR):
+    """Rebuild the index from every parsed chunk, persist it and swap it in."""
+    global _index
+    index = BM25Index.build(load_records(data_dir))
+    index.save()
+    with _index_lock:
+        _index = index
+    return index
+
+def get_index():
+    """Return the loaded index, reading it from disk (or building it) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                records = load_records()
+                index = BM25Index.load(records) if INDEX_FILE.exists() else None
+                if index is None:
+                    print("⚠️ BM25 index missing or stale, rebuilding")
+                    index = BM25Index.build(records)
+                    index.save()
+                _index = index
+    return _index
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    index = build_index()
+    print(f"✅ BM25 index: {len(index)} chunks, {len(index.term_ids)} terms in {time.perf_counter() - start:.2f}s → {INDEX_FILE}")
@@ -0,0 +1,154 @@
+"""
+Length-bucketed, multi-process passage encoder for ingestion.
+
+Encoding a whole file with one encode() call pads every batch to its
+longest member, and chunk lengths vary from a heading to a full section.
+Here texts are sorted by token length and cut into batches of neighbours,
+so each batch holds texts of about the same length. Large jobs (at least
+ENCODE_POOL_MIN texts) are spread over ENCODE_WORKERS processes, each with
+its own copy of the model and an equal share of the CPU threads, so a bulk
+re-embed uses every core. The longest batches are sent first so the
+workers finish together, and vectors are put back in input order.
+
+Passages already in the embedding cache are not encoded again.
+
+Token counts are the tokenizer-free estimate from context_packer, capped at
+the model's maximum sequence length.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import embedding_cache
+import embeddings
+from context_packer import count_tokens
+
+CPU_COUNT = os.cpu_count() or 1
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "0")) or min(CPU_COUNT, 4)
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+ENCODE_POOL_MIN = int(os.getenv("ENCODE_POOL_MIN", "256"))  # smaller jobs are encoded in-process
+BATCHES_PER_TASK = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_encoder = None
+
+
+# === Worker side ===
+def _init_worker(threads):
+    """Load the configured model once per worker, limited to its share of the cores."""
+    global _worker_encoder
+    embeddings.ONNX_THREADS = threads
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_encoder = embeddings.load_encoder()
+
+
+def _encode_batches(batches):
+    return [_worker_encoder.encode(batch, batch_size=len(batch)) for batch in batches]
+
+
+def get_pool():
+    """Encoder worker pool, started on first use; spawned so it is safe from a threaded server."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                threads = max(1, CPU_COUNT // ENCODE_WORKERS)
+                _pool = ProcessPoolExecutor(
+                    ENCODE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(threads,),
+                )
+    return _pool
+
+
+# === Bucketing ===
+def token_lengths(texts):
+    return np.array([min(count_tokens(t), embeddings.MAX_SEQ_LENGTH) for t in texts], dtype=np.int64)
+
+
+def length_batches(lengths, batch_size=ENCODE_BATCH_SIZE):
+    """Row indices grouped into batches of similar length, shortest first."""
+    order = np.argsort(lengths, kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def padded_tokens(lengths, batches):
+    """Tokens a batch-padded encoder processes for these batches."""
+    return int(sum(lengths[b].max() * len(b) for b in batches))
+
+
+# === Entry points ===
+def encode(texts, workers=ENCODE_WORKERS, batch_size=ENCODE_BATCH_SIZE, pool_min=ENCODE_POOL_MIN):
+    """
+    Encode texts as given (prefixes included). Returns (vectors in input
+    order, stats) where stats has chunks, tokens, padded_tokens, workers,
+    seconds, chunks_per_s and tokens_per_s.
+    """
+    start = time.perf_counter()
+    texts = list(texts)
+    lengths = token_lengths(texts)
+    batches = length_batches(lengths, batch_size)
+    use_pool = workers > 1 and len(texts) >= pool_min
+    if not texts:
+        vectors = np.zeros((0, embeddings.get_spec(embeddings.EMBEDDING_MODEL).dim), dtype=np.float32)
+    elif use_pool:
+        # Longest batches first, a few per task to keep the inter-process traffic down
+        ranked = batches[::-1]
+        tasks = [ranked[i:i + BATCHES_PER_TASK] for i in range(0, len(ranked), BATCHES_PER_TASK)]
+        futures = [
+            get_pool().submit(_encode_batches, [[texts[i] for i in batch] for batch in task])
+            for task in tasks
+        ]
+        vectors = None
+        for task, future in zip(tasks, futures):
+            for batch, encoded in zip(task, future.result()):
+                if vectors is None:
+                    vectors = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+                vectors[batch] = encoded
+    else:
+        encoder = embeddings.get_encoder()
+        vectors = np.zeros((len(texts), encoder.dim), dtype=np.float32)
+        for batch in batches:
+            vectors[batch] = encoder.encode([texts[i] for i in batch], batch_size=len(batch))
+    seconds = time.perf_counter() - start
+    tokens = int(lengths.sum())
+    stats = {
+        "chunks": len(texts),
+        "tokens": tokens,
+        "padded_tokens": padded_tokens(lengths, batches),
+        "workers": workers if use_pool else 1,
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(len(texts) / seconds, 1) if seconds else None,
+        "tokens_per_s": round(tokens / seconds, 1) if seconds else None,
+    }
+    return vectors, stats
+
+
+def encode_passages(texts, cache=True, **kwargs):
+    """
+    encode() with the active model's passage prefix. Vectors already in the
+    embedding cache are reused and only the rest are encoded; stats count
+    the encoded chunks and add `cached` for the reused ones.
+    """
+    spec = embeddings.get_spec(embeddings.EMBEDDING_MODEL)
+    stats = {}
+
+    def encode_missing(prefixed):
+        vectors, encoded = encode(prefixed, **kwargs)
+        stats.update(encoded)
+        return vectors
+
+    vectors, hits = embedding_cache.cached_encode(
+        spec.name, embeddings.active_runtime(), spec.passage_prefix, texts, encode_missing, cache
+    )
+    if not stats:
+        stats.update(encode([], **kwargs)[1])
+    return vectors, {**stats, "cached": hits}
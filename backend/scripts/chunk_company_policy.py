@@ -1,99 +1,43 @@
 import os
-import re
 import json
 from pathlib import Path
-import fitz  # PyMuPDF
-import nltk
-import ssl
-from rake_nltk import Rake
+from chunking import iter_chunks
+from pdf_parser import iter_documents, parse_pages
+import keywords
 
 
 
-# RAKE setup
-rake = Rake()
-
 # Directory paths
 BASE_DIR = Path(__file__).resolve().parents[1]
 UPLOAD_DIR = BASE_DIR / "data" / "company_policies"
 OUT_DIR = BASE_DIR / "data" / "company_chunks"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def is_article_header(line):
-    line = line.strip()
-    return bool(
-        re.match(r'^(Article|Clause|Section|CHAPTER|§)\s+\d+', line, re.IGNORECASE)
-        or re.match(r'^([A-Z]\.)?\d+(\.\d+)*(\s+-?\s*[\w\(\) ]+)?$', line)
-    )
-
-def clean_line(line):
-    return re.sub(r'\s+', ' ', line.strip())
-
-def extract_keywords(text, top_k=13):
-    rake.extract_keywords_from_text(text)
-    return rake.get_ranked_phrases()[:top_k]
-
 def parse_pdf(path):
-    doc = fitz.open(str(path))
-    return "\n".join(page.get_text() for page in doc)
+    """[(page_number, text), ...], extracted in parallel page ranges"""
+    return parse_pages(path)
 
 def chunk_text(text, source_name="CompanyPolicy", jurisdiction="Company"):
-    chunks = []
-    lines = text.split("\n")
-    current = {"article_id": "", "title": "", "content": ""}
-
-    for line in lines:
-        print(line)
-        line = clean_line(line)
-        if not line:
-            continue
-        if is_article_header(line):
-            if current["content"]:
-                chunks.append(current)
-            parts = line.split(" ", 2)
-            article_id = parts[0]
-            title = parts[1] if len(parts) > 1 else ""
-            if len(parts) > 2:
-                title += " " + parts[2]
-            current = {
-                "article_id": article_id,
-                "title": title.strip(),
-                "content": ""
-            }
-        else:
-            current["content"] += " " + line
-
-    if current["content"]:
-        chunks.append(current)
-
-    structured = []
-    for i, chunk in enumerate(chunks):
-        full_text = chunk["content"].strip()
-        top_keywords = extract_keywords(full_text)
-        structured.append({
-            "id": f"{source_name.lower()}_{i}",
-            "source": source_name,
-            "jurisdiction": jurisdiction,
-            "article_id": chunk["article_id"],
-            "title": chunk["title"],
-            "top_keywords": top_keywords,
-            "full_text": full_text
-        })
-    return structured
+    return keywords.annotate(list(iter_chunks(text, source_name, jurisdiction)))
 
 def process_uploaded():
-    for file in os.listdir(UPLOAD_DIR):
-        print(file)
-        if file.endswith(".pdf"):
-            source = Path(file).stem
-            text = parse_pdf(UPLOAD_DIR / file)
-            print(f"📄 {file} → {len(text)} characters")
-            structured_chunks = chunk_text(text, source_name=source)
-            out_file = OUT_DIR / f"{source}.jsonl"
-            with open(out_file, "w", encoding="utf-8") as f:
-                for chunk in structured_chunks:
-                    json.dump(chunk, f)
-                    f.write("\n")
-            print(f"✅ {file} → {len(structured_chunks)} company chunks")
+    files = sorted(UPLOAD_DIR / f for f in os.listdir(UPLOAD_DIR) if f.endswith(".pdf"))
+    # All documents are parsed together in the page-range worker pool; each is chunked once its pages are in
+    stats = {}
+    chunks = {}
+    for path, pages in iter_documents(files, stats=stats):
+        print(f"📄 {path.name} → {len(pages)} pages, {sum(len(t) for _, t in pages)} characters")
+        chunks[path] = list(iter_chunks(pages, path.stem, "Company"))
+    print(f"📄 Parsed {stats['pages']} pages in {stats['seconds']}s ({stats['pages_per_s']} pages/s)")
+    # Keywords for all documents, scored in parallel
+    keywords.annotate_documents(chunks)
+    for path in files:
+        out_file = OUT_DIR / f"{path.stem}.jsonl"
+        with open(out_file, "w", encoding="utf-8") as f:
+            for chunk in chunks[path]:
+                json.dump(chunk, f)
+                f.write("\n")
+        print(f"✅ {path.name} → {len(chunks[path])} company chunks")
 
 if __name__ == "__main__":
     process_uploaded()
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Streaming, size-bounded chunker shared by standards and company policies.
+
+Lines are consumed one at a time and chunks are yielded as soon as they
+are complete, so only the current section is held in memory. A chunk
+starts at every article/section header. A section longer than
+CHUNK_MAX_TOKENS is cut into pieces of at most that size, preferably after
+a sentence, and each piece repeats the last CHUNK_OVERLAP_TOKENS of the one
+before it. Every piece keeps the section's article_id and title and gets a
+`part` number, so provenance survives the split. Bounded chunks also keep
+encode batches close to uniform length and stop one document-sized chunk
+from being truncated by the embedding model yet sent whole to the LLM.
+"""
+import os
+import re
+
+from context_packer import count_tokens
+from pdf_parser import page_lines
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+SENTENCE_END = re.compile(r"[.;:!?][\"')\]]*$")
+
+
+# === Header Detector (Generalized) ===
+def is_article_header(line: str) -> bool:
+    line = line.strip()
+    return bool(
+        re.match(r'^(Article|Clause|Section|CHAPTER|§)\s+\d+', line, re.IGNORECASE)
+        or re.match(r'^([A-Z]\.)?\d+(\.\d+)*(\s+-?\s*[\w\(\) ]+)?$', line)
+        or is_numbered_heading(line)
+    )
+
+
+HEADING_SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+
+def is_numbered_heading(line: str) -> bool:
+    """
+    "1.  PURPOSE" or "2. Roles and Responsibilities": a number with a trailing
+    dot, then a short all-caps or title-case title. Numbered list items inside
+    an article ("1. The controller shall notify...") are sentences, not titles.
+    """
+    match = re.match(r'^\d+\.\s+([A-Z][\w\(\) ]{0,60})$', line)
+    if not match:
+        return False
+    words = match.group(1).split()
+    if len(words) > 6:
+        return False
+    return match.group(1).isupper() or all(
+        w[0].isupper() or w[0] == "(" or w in HEADING_SMALL_WORDS for w in words[1:]
+    )
+
+
+def clean_line(line: str) -> str:
+    return re.sub(r'\s+', ' ', line.strip())
+
+
+def split_header(line):
+    parts = line.split(" ", 2)
+    title = " ".join(parts[1:])
+    return parts[0], title.strip()
+
+
+class _Section:
+    """Words of the section being read, with their token counts and pages."""
+
+    def __init__(self, article_id="", title="", page=None):
+        self.article_id = article_id
+        self.title = title
+        self.page = page
+        self.words = []   # (word, tokens, page)
+        self.tokens = 0
+        self.parts = 0
+
+    def add(self, line, page):
+        for word in line.split(" "):
+            size = count_tokens(word)
+            self.words.append((word, size, page))
+            self.tokens += size
+
+    def _cut(self, max_tokens):
+        """Number of words in the next piece: up to max_tokens, ending after a sentence if one ends in its second half."""
+        used, end, sentence_end = 0, 0, 0
+        for i, (word, size, _) in enumerate(self.words):
+            if used + size > max_tokens and i:
+                break
+            used += size
+            end = i + 1
+            if SENTENCE_END.search(word) and used >= max_tokens // 2:
+                sentence_end = end
+        return sentence_end or end
+
+    def _piece(self, words):
+        self.parts += 1
+        pages = [p for _, _, p in words if p is not None]
+        return {
+            "article_id": self.article_id,
+            "title": self.title,
+            "content": " ".join(w for w, _, _ in words),
+            "page": pages[0] if pages else self.page,
+            "page_end": pages[-1] if pages else self.page,
+            "part": self.parts,
+        }
+
+    def take_full(self, max_tokens, overlap):
+        """Yield pieces while more than max_tokens are buffered, keeping `overlap` tokens of context."""
+        while max_tokens and self.tokens > max_tokens:
+            end = self._cut(max_tokens)
+            yield self._piece(self.words[:end])
+            start, kept = end, 0
+            while start > 0 and kept + self.words[start - 1][1] <= overlap:
+                start -= 1
+                kept += self.words[start][1]
+            self.words = self.words[max(start, 1):]  # always make progress
+            self.tokens = sum(size for _, size, _ in self.words)
+
+    def finish(self):
+        if not self.words:
+            return None
+        piece = self._piece(self.words)
+        if self.parts == 1:
+            del piece["part"]  # never split
+        return piece
+
+
+def iter_sections(text, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Yield raw chunks {article_id, title, content, page, page_end[, part]}
+    from a string or [(page_number, text), ...] without materializing the
+    document's chunks.
+    """
+    overlap = min(overlap, max_tokens // 3) if max_tokens else 0
+    section = _Section()
+    for page, line in page_lines(text):
+        line = clean_line(line)
+        if not line:
+            continue
+        if is_article_header(line):
+            done = section.finish()
+            if done:
+                yield done
+            article_id, title = split_header(line)
+            section = _Section(article_id, title, page)
+        else:
+            if section.page is None:
+                section.page = page
+            section.add(line, page)
+            yield from section.take_full(max_tokens, overlap)
+    done = section.finish()
+    if done:
+        yield done
+
+
+def iter_chunks(text, source_name, jurisdiction, extract_keywords=None, max_tokens=CHUNK_MAX_TOKENS,
+                overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Yield finished chunk records (id, source, keywords, ...) one at a time.
+    Without extract_keywords, top_keywords is left empty for keywords.annotate()
+    to fill in over the whole document.
+    """
+    for i, chunk in enumerate(iter_sections(text, max_tokens, overlap)):
+        full_text = chunk["content"]
+        record = {
+            "id": f"{source_name.lower()}_{i}",
+            "source": source_name,
+            "jurisdiction": jurisdiction,
+            "article_id": chunk["article_id"],
+            "title": chunk["title"],
+            "top_keywords": extract_keywords(full_text) if extract_keywords else [],
+            "full_text": full_text,
+        }
+        if chunk["page"] is not None:
+            record["page"] = chunk["page"]
+            record["page_end"] = chunk["page_end"]
+        if "part" in chunk:
+            record["part"] = chunk["part"]
+        yield record
@@ -1,18 +1,37 @@
+"""
+Regulation × policy coverage matrix.
+
+Regulation vectors are already stored at ingest time, so instead of
+re-encoding each article and running one search per article, the stored
+regulation and policy vectors are loaded once and compared with a single
+matrix product. Each article's best policy match sorts it into:
+
+- covered:   best similarity >= threshold + margin
+- missing:   best similarity <  threshold - margin
+- ambiguous: everything in between, the only articles worth an LLM call
+
+Similarity scales differ between embedding models, so the threshold and
+margin come from the active model's ModelSpec unless SIMILARITY_THRESHOLD
+or COVERAGE_MARGIN is set.
+"""
 import json
+import os
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import SearchParams
+
+import numpy as np
+
+from embeddings import active_model_name, check_model, get_spec
+from vector_store import get_vector_store
 
 # === Configuration ===
 BASE_DIR = Path(__file__).resolve().parents[1]
 REG_DIR = BASE_DIR / "data" / "parsed_json_semantic"
 COMPANY_COLLECTION = "company_policy_temp"
 REG_COLLECTION = "compliance_semantic"
-SIMILARITY_THRESHOLD = 0.75
+SIMILARITY_THRESHOLD = os.getenv("SIMILARITY_THRESHOLD")  # unset = the embedding model's default
+COVERAGE_MARGIN = os.getenv("COVERAGE_MARGIN")
+COVERAGE_GROUPS = ("covered", "ambiguous", "missing")
 
-client = QdrantClient(host="localhost", port=6333)
-model = SentenceTransformer("intfloat/e5-large-v2")
 
 def load_regulation_chunks(source_name):
     filepath = REG_DIR / f"{source_name}.jsonl"
@@ -21,32 +40,84 @@ def load_regulation_chunks(source_name):
     with open(filepath, "r", encoding="utf-8") as f:
         return [json.loads(line) for line in f]
 
-def compare_chunks(reg_source):
+
+def stored_vectors(collection, source_filter=None):
+    """(payloads, float32 matrix) of every stored point, optionally for one source."""
+    _, vectors, payloads = get_vector_store().scroll(collection, source_filter=source_filter, with_vectors=True)
+    if vectors is None or not len(vectors):
+        return payloads, np.zeros((0, 0), dtype=np.float32)
+    return payloads, np.asarray(vectors, dtype=np.float32)
+
+
+def coverage_thresholds(model=None):
+    """Similarity bands of an embedding model (default: the active one) as {threshold, covered, missing}."""
+    spec = get_spec(model or active_model_name())
+    threshold = float(SIMILARITY_THRESHOLD or spec.similarity_threshold)
+    margin = float(COVERAGE_MARGIN or spec.coverage_margin)
+    return {"model": spec.name, "threshold": threshold, "covered": threshold + margin, "missing": threshold - margin}
+
+
+def coverage_matrix(reg_vectors, policy_vectors):
+    """Cosine similarity of every article with every policy chunk (vectors are normalized)."""
+    return np.asarray(reg_vectors, dtype=np.float32) @ np.asarray(policy_vectors, dtype=np.float32).T
+
+
+def classify(sims, thresholds=None):
+    """Return (best score, best policy row, group) arrays, one entry per article."""
+    thresholds = thresholds or coverage_thresholds()
+    covered, missing = thresholds["covered"], thresholds["missing"]
+    if not sims.size:
+        n = sims.shape[0]
+        return np.zeros(n, dtype=np.float32), np.full(n, -1), np.full(n, "missing", dtype=object)
+    best = sims.argmax(axis=1)
+    scores = sims[np.arange(len(sims)), best]
+    groups = np.where(scores >= covered, "covered", np.where(scores < missing, "missing", "ambiguous")).astype(object)
+    return scores, best, groups
+
+
+def coverage_report(articles, policy_chunks, sims, label=None):
+    """Instant per-article report from the similarity matrix, no LLM involved."""
+    label = label or (lambda a: f"{a.get('article_id', '')} {a.get('title', '')}".strip())
+    thresholds = coverage_thresholds()
+    scores, best, groups = classify(sims, thresholds)
+    rows = []
+    for article, score, row, group in zip(articles, scores, best, groups):
+        match = policy_chunks[row] if row >= 0 else {}
+        rows.append({
+            "article": label(article),
+            "group": group,
+            "score": round(float(score), 4),
+            "best_match": (match.get("full_text") or "")[:200],
+        })
+    counts = {g: int((groups == g).sum()) for g in COVERAGE_GROUPS}
+    return {"counts": counts, "thresholds": thresholds, "articles": rows}
+
+
+def compare_chunks(reg_source, company_collection=COMPANY_COLLECTION):
+    """Articles of a standard whose best match in the stored company policy is below the similarity threshold."""
     print(f"🔍 Comparing regulation: {reg_source}")
-    reg_chunks = load_regulation_chunks(reg_source)
-    uncovered = []
+    for collection in (REG_COLLECTION, company_collection):
+        check_model(get_vector_store(), collection)
+    reg_payloads, reg_vectors = stored_vectors(REG_COLLECTION, source_filter=reg_source)
+    if not reg_payloads:
+        raise FileNotFoundError(f"No stored vectors for: {reg_source}")
+    policy_payloads, policy_vectors = stored_vectors(company_collection)
+    thresholds = coverage_thresholds()
+    if policy_vectors.size:
+        scores, _, _ = classify(coverage_matrix(reg_vectors, policy_vectors), thresholds)
+    else:
+        scores = np.zeros(len(reg_payloads), dtype=np.float32)
 
-    for reg in reg_chunks:
+    uncovered = []
+    for reg, score in zip(reg_payloads, scores):
         full_text = reg.get("full_text", "")
         if not full_text.strip():
             continue
-
-        query_vector = model.encode(f"query: {full_text}", normalize_embeddings=True).tolist()
-
-        results = client.search(
-            collection_name=COMPANY_COLLECTION,
-            query_vector=query_vector,
-            limit=1,
-            with_payload=True,
-            with_vectors=False,
-            search_params=SearchParams(hnsw_ef=128)
-        )
-
-        if not results or results[0].score < SIMILARITY_THRESHOLD:
+        if score < thresholds["threshold"]:
             uncovered.append({
                 "article_id": reg.get("article_id", ""),
                 "title": reg.get("title", ""),
-                "score": results[0].score if results else 0.0,
+                "score": float(score),
                 "source": reg.get("source", ""),
                 "text": full_text[:250]
             })
@@ -65,4 +136,4 @@ if __name__ == "__main__":
             for g in gaps:
                 print(f"- Article {g['article_id']} ({g['title']}), Score: {g['score']:.2f}")
     except Exception as e:
-        print(f"❌ Error: {e}")
\ No newline at end of file
+        print(f"❌ Error: {e}")
@@ -79,11 +79,14 @@
 #     print(result)
 
 
+import asyncio
 import json
+import os
 from pathlib import Path
-import subprocess
 import argparse
 import re
+from context_packer import truncate_tokens
+from ollama_caller import ask_ollama, get_ollama_client
 
 # === CONFIG ===
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -92,18 +95,29 @@ REG_DIR = BASE_DIR / "data" / "parsed_json_semantic"
 DEFAULT_MODEL = "nous-hermes2"
 MAX_ARTICLES = 20  # Optional limit to reduce context length
 
+# === Map-reduce compare ===
+COMPARE_CONCURRENCY = int(os.getenv("COMPARE_CONCURRENCY", "4"))
+ARTICLES_PER_CALL = int(os.getenv("COMPARE_ARTICLES_PER_CALL", "2"))
+EXCERPTS_PER_ARTICLE = 3
+ARTICLE_TOKENS = 400
+EXCERPT_TOKENS = 200
+STATUSES = ("Missing", "Partial", "Covered")
+STATUS_MARKS = {"Covered": "✅", "Partial": "⚠️", "Missing": "❌", "Not assessed": "❔"}
+ITEM_RE = re.compile(r"ITEM\s*(\d+)[^\w\n]*(covered|partial|missing)", re.I)
+
+def summarize_chunk(r):
+    return {
+        "id": r.get("article_id", ""),
+        "title": r.get("title", ""),
+        "text": r.get("full_text", "")[:300],
+        "keywords": ", ".join(r.get("top_keywords", [])[:5])
+    }
+
 def load_chunks(path, max_chunks=None):
     chunks = []
     with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
         for line in f:
-            r = json.loads(line)
-            entry = {
-                "id": r.get("article_id", ""),
-                "title": r.get("title", ""),
-                "text": r.get("full_text", "")[:300],
-                "keywords": ", ".join(r.get("top_keywords", [])[:5])
-            }
-            chunks.append(entry)
+            chunks.append(summarize_chunk(json.loads(line)))
             if max_chunks and len(chunks) >= max_chunks:
                 break
     return chunks
@@ -143,15 +157,128 @@ Start your analysis below.
 """.strip()
 
 def query_llm(prompt, model):
-    process = subprocess.Popen(
-        ["ollama", "run", model],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
+    return ask_ollama(prompt, model=model).strip()
+
+def article_label(r):
+    label = " ".join(x for x in (r.get("article_id", ""), r.get("title", "")) if x).strip()
+    return label or r.get("id") or "Preamble"
+
+def build_article_prompt(items, reg_source):
+    """Map prompt: a few regulation articles, each with only its most relevant policy excerpts."""
+    blocks = []
+    for n, (article, excerpts) in enumerate(items, 1):
+        excerpt_text = "\n".join(f"- {truncate_tokens(e, EXCERPT_TOKENS)}" for e in excerpts) or "- (no related policy text found)"
+        blocks.append(
+            f"ITEM {n} — {article_label(article)}\n"
+            f"{truncate_tokens(article.get('full_text', ''), ARTICLE_TOKENS)}\n\n"
+            f"Relevant company policy excerpts:\n{excerpt_text}"
+        )
+    items_section = "\n\n".join(blocks)
+    return f"""
+You are a compliance and risk analysis AI.
+
+### TASK
+For each regulation item below, decide whether the company policy excerpts listed under it
+cover the requirement. Be strict: excerpts that only mention the topic are Partial.
+
+### REGULATION: {reg_source}
+{items_section}
+
+### OUTPUT FORMAT (one block per item, nothing else):
+- ITEM n: Covered / Partial / Missing
+  Risk: [short risk if partial/missing]
+  Mitigation: [specific recommended fix]
+""".strip()
+
+def parse_verdicts(response, items):
+    """Split a map reply into one verdict per item; items the model skipped are 'Not assessed'."""
+    matches = list(ITEM_RE.finditer(response))
+    found = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        body = response[match.end():next_match.start() if next_match else len(response)]
+        risk = re.search(r"Risk:\s*(.+)", body)
+        mitigation = re.search(r"Mitigation:\s*(.+)", body)
+        found.setdefault(int(match.group(1)), {
+            "status": match.group(2).capitalize(),
+            "risk": risk.group(1).strip() if risk else "",
+            "mitigation": mitigation.group(1).strip() if mitigation else "",
+        })
+    return [
+        {"article": article_label(article), **found.get(n, {"status": "Not assessed", "risk": "", "mitigation": ""})}
+        for n, (article, _) in enumerate(items, 1)
+    ]
+
+def map_articles(articles, excerpts, reg_source, model, concurrency=COMPARE_CONCURRENCY, group_size=ARTICLES_PER_CALL,
+                 progress=None):
+    """
+    Map step: evaluate articles in small groups with concurrent LLM calls.
+    excerpts[i] holds the policy passages relevant to articles[i]. Returns
+    (verdicts, stats); a failed call marks its articles 'Not assessed'.
+    progress(done, total) is called with article counts as calls finish.
+    """
+    pairs = list(zip(articles, excerpts))
+    groups = [pairs[i:i + group_size] for i in range(0, len(pairs), max(1, group_size))]
+    prompts = [build_article_prompt(group, reg_source) for group in groups]
+    done = [0]
+
+    def on_done(index, _):
+        done[0] += len(groups[index])
+        progress(done[0], len(pairs))
+
+    replies = asyncio.run(get_ollama_client().agenerate_many(
+        prompts, model, concurrency=concurrency, return_exceptions=True, on_done=on_done if progress else None
+    ))
+    verdicts, failed = [], 0
+    for group, reply in zip(groups, replies):
+        if isinstance(reply, Exception):
+            failed += 1
+            print(f"⚠️ Compare call failed for {len(group)} article(s): {reply}")
+            reply = {"response": ""}
+        verdicts.extend(parse_verdicts(reply["response"], group))
+    return verdicts, {"calls": len(prompts), "failed_calls": failed, "concurrency": concurrency}
+
+def build_summary_prompt(verdicts, reg_source):
+    findings = "\n".join(
+        f"- {v['article']} ({v['status']}): {v['risk']}" for v in verdicts if v["status"] in ("Missing", "Partial")
     )
-    output, _ = process.communicate(input=prompt)
-    return output.strip()
+    return f"""
+You are a compliance and risk analysis AI. Below are the gaps found when checking a company
+policy against {reg_source}. Write a short executive summary (at most 6 sentences): the main
+themes of the gaps, the highest risks, and what to fix first.
+
+### GAPS
+{truncate_tokens(findings, 1500) or "- none"}
+""".strip()
+
+def reduce_verdicts(verdicts, reg_source, model=None):
+    """Reduce step: aggregate per-article verdicts into one report, with an LLM summary if a model is given."""
+    counts = {status: sum(v["status"] == status for v in verdicts) for status in (*STATUSES, "Not assessed")}
+    summary = ""
+    if model and (counts["Missing"] or counts["Partial"]):
+        try:
+            summary = query_llm(build_summary_prompt(verdicts, reg_source), model)
+        except Exception as e:
+            print(f"⚠️ Summary call failed: {e}")
+
+    lines = [f"# {reg_source} compliance report", ""]
+    lines.append(", ".join(f"{STATUS_MARKS[s]} {s}: {n}" for s, n in counts.items()))
+    if summary:
+        lines += ["", summary]
+    for status in (*STATUSES, "Not assessed"):
+        group = [v for v in verdicts if v["status"] == status]
+        if not group:
+            continue
+        lines += ["", f"## {STATUS_MARKS[status]} {status}"]
+        if status in ("Covered", "Not assessed"):
+            lines.append(", ".join(v["article"] for v in group))
+            continue
+        for v in group:
+            lines.append(f"- {v['article']}")
+            if v["risk"]:
+                lines.append(f"  Risk: {v['risk']}")
+            if v["mitigation"]:
+                lines.append(f"  Mitigation: {v['mitigation']}")
+    return "\n".join(lines), counts
 
 # 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""
+Token-budgeted context packing for the MCP prompt.
+
+Prefill time on CPU Ollama grows with prompt length, and some chunks are
+thousands of words (DATA_STANDARD.jsonl is one chunk holding a whole
+document). Before the prompt is built:
+
+1. The ranked list is cut where scores fall off a cliff, so weak matches
+   behind a strong one are not sent at all.
+2. The token budget is shared between the remaining chunks: short chunks
+   keep their full text and leave the rest of their share to longer ones.
+3. A chunk longer than its share is cut into sentence passages. The
+   passages that best match the query (BM25 weights of the query terms)
+   are kept, in their original order, until the share is used up.
+
+Token counts are a tokenizer-free estimate (one token per word piece of up
+to five characters, one per punctuation mark), which runs slightly above
+real Llama counts so the budget is not overshot.
+"""
+import math
+import os
+import re
+from collections import Counter
+
+import bm25_index
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # 0 = no limit
+SCORE_CLIFF = float(os.getenv("CONTEXT_SCORE_CLIFF", "0.4"))  # 0 = never cut
+MIN_CHUNK_TOKENS = 40  # a chunk gets at least this much room or is left out
+PASSAGE_TOKENS = 30    # sentences are merged into passages of about this size
+ELLIPSIS = "\n[…]\n"
+
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_RE = re.compile(r"(?<=[.;:!?])\s+|\n+")
+
+
+def count_tokens(text):
+    return sum(max(1, math.ceil(len(w) / 5)) if w[0].isalnum() or w[0] == "_" else 1 for w in WORD_RE.findall(text))
+
+
+def truncate_tokens(text, limit):
+    """Cut text after roughly `limit` estimated tokens, on a word boundary."""
+    used = 0
+    for match in re.finditer(r"\S+", text):
+        used += count_tokens(match.group())
+        if used > limit:
+            return text[:match.start()].rstrip() + " …"
+    return text
+
+
+def cut_at_cliff(results, cliff=SCORE_CLIFF):
+    """
+    Drop results after the first step down larger than `cliff` times the top score.
+
+    Scores must be on a 0-1 scale (cosine similarities or reranker
+    probabilities); a drop relative to a raw logit near 0 is meaningless.
+    """
+    if len(results) < 2 or not cliff:
+        return results
+    scores = [float(s) for _, s in results]
+    top = abs(scores[0]) or 1.0
+    for i in range(len(scores) - 1):
+        if (scores[i] - scores[i + 1]) / top > cliff:
+            return results[:i + 1]
+    return results
+
+
+def split_passages(text, target=PASSAGE_TOKENS):
+    passages, current, size = [], [], 0
+    for sentence in SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        size += count_tokens(sentence)
+        if size >= target:
+            passages.append(" ".join(current))
+            current, size = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def query_weights(query):
+    """BM25 idf of each query term, so rare terms like 'A.9.2' outweigh 'data'."""
+    terms = set(bm25_index.tokenize(query))
+    try:
+        index = bm25_index.get_index()
+    except Exception:
+        return {t: 1.0 for t in terms}
+    default = float(index.idf.max()) if len(index.idf) else 1.0
+    return {t: float(index.idf[index.term_ids[t]]) if t in index.term_ids else default for t in terms}
+
+
+def trim_to_budget(text, weights, limit):
+    """Keep the best-matching passages of text (original order) within `limit` tokens."""
+    if count_tokens(text) <= limit:
+        return text, False
+    passages = split_passages(text)
+    scored = []
+    for i, passage in enumerate(passages):
+        counts = Counter(bm25_index.tokenize(passage))
+        score = sum(w * counts[t] / (counts[t] + bm25_index.K1) for t, w in weights.items() if t in counts)
+        scored.append((score, i, count_tokens(passage)))
+    gap = count_tokens(ELLIPSIS)  # worst case: every kept passage needs a separator
+    keep, used = [], 0
+    for score, i, size in sorted(scored, key=lambda x: (-x[0], x[1])):
+        if used + size + gap <= limit:
+            keep.append(i)
+            used += size + gap
+    if not keep:
+        best = max(scored, key=lambda x: (x[0], -x[1]))[1]
+        return truncate_tokens(passages[best], limit - 1), True
+    keep.sort()
+    parts = [passages[keep[0]]]
+    for prev, i in zip(keep, keep[1:]):
+        parts.append(ELLIPSIS if i != prev + 1 else " ")
+        parts.append(passages[i])
+    return "".join(parts), True
+
+
+def allocate(sizes, budget):
+    """Share budget between items: smaller ones get what they need, the rest split what is left."""
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        shares[i] = min(sizes[i], remaining // (len(sizes) - n))
+        remaining -= shares[i]
+    return shares
+
+
+def pack_context(query, results, render_header, budget=CONTEXT_TOKEN_BUDGET, cliff=0):
+    """
+    Fit ranked [(hit, score)] results into a token budget.
+
+    render_header(position, hit, score) gives the text placed above each
+    chunk; it counts against the budget. Returns (blocks, stats) where
+    blocks is a list of (hit, score, text) in rank order.
+
+    The score cliff only makes sense for 0-1 scores (cosine similarities or
+    cross-encoder probabilities), so callers pass cliff=SCORE_CLIFF for those. Fused RRF
+    scores halve between a hit both retrievers found and one found by only
+    one of them, which would read as a cliff after the first hit.
+    """
+    kept = cut_at_cliff(results, cliff)
+    texts = [hit.payload.get("full_text") or "[No full text available]" for hit, _ in kept]
+    headers = [count_tokens(render_header(i + 1, hit, score)) for i, (hit, score) in enumerate(kept)]
+    stats = {"budget": budget, "candidates": len(results), "cut_by_score": len(results) - len(kept)}
+
+    if not budget:
+        blocks = [(hit, score, text) for (hit, score), text in zip(kept, texts)]
+        return blocks, {**stats, "chunks": len(blocks), "trimmed": 0, "dropped": 0,
+                        "context_tokens": sum(headers) + sum(map(count_tokens, texts))}
+
+    # Leave out the lowest-ranked chunks until every chunk gets a useful share
+    while kept and budget // len(kept) < MIN_CHUNK_TOKENS + max(headers):
+        kept, texts, headers = kept[:-1], texts[:-1], headers[:-1]
+    dropped = len(results) - stats["cut_by_score"] - len(kept)
+    shares = allocate([h + count_tokens(t) for h, t in zip(headers, texts)], budget)
+
+    weights = query_weights(query) if kept else {}
+    blocks, trimmed, used = [], 0, 0
+    for (hit, score), text, header, share in zip(kept, texts, headers, shares):
+        text, was_trimmed = trim_to_budget(text, weights, share - header)
+        trimmed += was_trimmed
+        used += header + count_tokens(text)
+        blocks.append((hit, score, text))
+    return blocks, {**stats, "chunks": len(blocks), "trimmed": trimmed, "dropped": dropped, "context_tokens": used}
@@ -1,55 +1,50 @@
 import os
 import json
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
-import uuid
+from embeddings import EmbeddingModelMismatch, check_model
+from pipeline import delete_points, sync_sources
+from vector_store import get_vector_store
 
 # === Config ===
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "data" / "company_chunks"
 COLLECTION_NAME = "company_policy_temp"
-MODEL_NAME = "intfloat/e5-large-v2"
-
-# === Load model and client ===
-model = SentenceTransformer(MODEL_NAME)
-client = QdrantClient(host="localhost", port=6333)
-
-# === Ensure collection ===
-def ensure_collection():
-    if COLLECTION_NAME not in [c.name for c in client.get_collections().collections]:
-        dim = model.get_sentence_embedding_dimension()
-        client.recreate_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
-        )
-        print(f"🆕 Created collection: {COLLECTION_NAME}")
-    else:
-        print(f"✅ Collection exists: {COLLECTION_NAME}")
 
 # === Embed and upsert points ===
-def embed_and_store(filepath):
+def load_records(filepath):
     with open(filepath, "r", encoding="utf-8") as f:
         records = [json.loads(line) for line in f]
-
-    texts = [f"passage: {r['full_text']}" for r in records]
-    vectors = model.encode(texts, normalize_embeddings=True)
-
-    points = [
-        PointStruct(id=str(uuid.uuid4()), vector=vec.tolist(), payload=r)
-        for r, vec in zip(records, vectors)
-    ]
-
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
-    print(f"🔼 Uploaded {len(points)} chunks from {filepath.name}")
+    return (records[0]["source"] if records else filepath.stem), records
+
+def embed_and_store(files):
+    """Sync chunk files: unchanged chunks are skipped, new ones embedded (in one bulk pass), removed ones deleted."""
+    sources = dict(load_records(path) for path in files)
+    stats, encoded = sync_sources(COLLECTION_NAME, sources)
+    if encoded["chunks"]:
+        print(f"✅ Embedded {encoded['chunks']} chunks: {encoded['chunks_per_s']} chunks/s, "
+              f"{encoded['tokens_per_s']} tokens/s")
+    for source, s in stats.items():
+        print(f"🔼 {source}: {s['added']} added, {s['updated']} updated, {s['skipped']} unchanged, "
+              f"{s['deleted']} deleted")
+    return set(sources)
 
 # === Process all company policy chunks ===
 def process_all():
-    ensure_collection()
-    for file in os.listdir(DATA_DIR):
-        if file.endswith(".jsonl"):
-            embed_and_store(DATA_DIR / file)
+    store = get_vector_store()
+    if COLLECTION_NAME in store.list_collections():
+        try:
+            check_model(store, COLLECTION_NAME)
+        except EmbeddingModelMismatch as e:
+            # Scratch collection built with another model or runtime: start over instead of failing
+            print(f"⚠️ {e} Recreating it.")
+            store.delete_collection(COLLECTION_NAME)
+    sources = embed_and_store([DATA_DIR / f for f in sorted(os.listdir(DATA_DIR)) if f.endswith(".jsonl")])
+    # Drop chunks of policies whose file is gone, so the collection holds only the current ones
+    if COLLECTION_NAME in store.list_collections():
+        ids, _, payloads = store.scroll(COLLECTION_NAME)
+        removed = delete_points(COLLECTION_NAME, [i for i, p in zip(ids, payloads) if p.get("source") not in sources])
+        if removed:
+            print(f"🗑️ Removed {removed} chunks of deleted policies")
 
 if __name__ == "__main__":
-    process_all()
\ No newline at end of file
+    process_all()
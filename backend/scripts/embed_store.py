@@ -63,71 +63,51 @@
 #     process_all()
 
 import os
+import sys
 import json
+from itertools import groupby
 from pathlib import Path
-from tqdm import tqdm
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
-from sentence_transformers import SentenceTransformer
-import uuid
+from pipeline import standard_payload, sync_sources
 
 # === Config ===
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "data" / "parsed_json_semantic"
 COLLECTION_NAME = "compliance_semantic"
-MODEL_NAME = "intfloat/e5-large-v2"
-
-# === Load Model + DB ===
-model = SentenceTransformer(MODEL_NAME)
-client = QdrantClient(host="localhost", port=6333)
-
-# === Ensure Collection ===
-def ensure_collection():
-    if COLLECTION_NAME not in [c.name for c in client.get_collections().collections]:
-        dim = model.get_sentence_embedding_dimension()
-        client.recreate_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
-        )
-        print(f"🆕 Created collection: {COLLECTION_NAME}")
-    else:
-        print(f"✅ Collection exists: {COLLECTION_NAME}")
 
 # === Embed and Store ===
-def embed_and_store(filepath):
+def load_sources(filepath):
+    """{source: payloads} of one parsed file."""
     with open(filepath, "r", encoding="utf-8") as f:
-        records = [json.loads(line) for line in f]
-
-    texts = [f"passage: {r['full_text']}" for r in records]
-    ids = [str(uuid.uuid4()) for _ in records]
-
-    vectors = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
-    payloads = [
-        {
-            "article_id": r["article_id"],
-            "title": r["title"],
-            "source": r["source"],
-            "jurisdiction": r["jurisdiction"],
-            "top_keywords": r["top_keywords"],
-            "full_text": r["full_text"]
-        }
-        for r in records
-    ]
-
-    points = [
-        PointStruct(id=id_, vector=vec.tolist(), payload=meta)
-        for id_, vec, meta in zip(ids, vectors, payloads)
-    ]
-
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
-    print(f"🔼 Uploaded {len(points)} chunks from {filepath.name}")
+        payloads = [standard_payload(json.loads(line)) for line in f]
+    return {source: list(group) for source, group in groupby(payloads, key=lambda p: p["source"])}
+
+def report(name, stats):
+    totals = {key: sum(s[key] for s in stats) for key in ("skipped", "added", "updated", "deleted")}
+    print(f"🔼 {name}: {totals['added']} added, {totals['updated']} updated, {totals['skipped']} unchanged, "
+          f"{totals['deleted']} deleted")
+    return totals
+
+def report_encoding(encoded):
+    if encoded["chunks"]:
+        print(f"✅ Embedded {encoded['chunks']} chunks in {encoded['seconds']}s with {encoded['workers']} worker(s): "
+              f"{encoded['chunks_per_s']} chunks/s, {encoded['tokens_per_s']} tokens/s")
+
+def embed_and_store(filepath):
+    """Sync one parsed file: unchanged chunks are skipped, new ones embedded, removed ones deleted."""
+    stats, encoded = sync_sources(COLLECTION_NAME, load_sources(filepath))
+    report_encoding(encoded)
+    return report(filepath.name, stats.values())
 
 # === Entry ===
-def process_all():
-    ensure_collection()
-    for file in os.listdir(DATA_DIR):
-        if file.endswith(".jsonl"):
-            embed_and_store(DATA_DIR / file)
+def process_all(standard_names=None):
+    """Sync every parsed standard, or only the named ones, embedding all their new chunks in one bulk pass."""
+    files = [DATA_DIR / f for f in sorted(os.listdir(DATA_DIR))
+             if f.endswith(".jsonl") and (not standard_names or Path(f).stem in standard_names)]
+    by_file = {path: load_sources(path) for path in files}
+    stats, encoded = sync_sources(COLLECTION_NAME, {s: p for sources in by_file.values() for s, p in sources.items()})
+    report_encoding(encoded)
+    for path, sources in by_file.items():
+        report(path.name, [stats[s] for s in sources])
 
 if __name__ == "__main__":
-    process_all()
+    process_all(sys.argv[1:] or None)
@@ -0,0 +1,393 @@
+"""
+Persistent embedding cache shared by every process and script.
+
+The same passages were embedded again and again: every standard re-ingest,
+every load of a regulation whose vectors were not stored, and every upload
+of a policy that had been compared before. Vectors are now looked up by
+(model name, runtime, prefix, SHA-256 of the text) before anything is
+encoded. The runtime is part of the key because the ONNX int8 export and
+the PyTorch model give slightly different vectors for the same text.
+
+Layout under EMBED_CACHE_DIR:
+
+- segment_<id>.npy: float32 matrices of EMBED_CACHE_SEGMENT_ROWS rows,
+  one model (and dimension) per segment. Rows are only ever appended, and
+  readers memory-map the files, so a lookup copies just the rows it needs.
+- index.sqlite3 (WAL): key -> (segment, row, last_used), plus each
+  segment's fill level. last_used is refreshed at most every
+  TOUCH_INTERVAL seconds per entry, so repeated hits cost no writes.
+
+A writer fills the rows first and commits their index entries afterwards,
+so readers in other processes never see an entry whose vector is not on
+disk yet. When the segments grow past EMBED_CACHE_MAX_MB, the least
+recently used entries are dropped until the cache is back under 80% of
+the limit. The live rows are then compacted into fresh segments and the
+old files are removed. A reader that still maps a removed file keeps
+reading it, and a lookup that finds its file already gone counts as a
+miss. EMBED_CACHE_MAX_MB=0 turns the cache off.
+
+    python scripts/embedding_cache.py [stats|compact|evict|clear]
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+EMBED_CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", BASE_DIR / "data" / "embedding_cache"))
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "1024"))  # 0 = no cache
+SEGMENT_ROWS = int(os.getenv("EMBED_CACHE_SEGMENT_ROWS", "4096"))
+EVICT_TO = 0.8      # eviction frees space down to this share of the limit
+MAX_OPEN_MAPS = 64  # cached read-only segment maps per process
+BATCH = 500         # keys per SQL IN (...) query
+TOUCH_INTERVAL = 300  # seconds before a hit refreshes an entry's last_used again
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    capacity INTEGER NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def entry_key(model, runtime, prefix, text):
+    return hashlib.sha256(f"{model}\n{runtime}\n{prefix}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _batches(items):
+    for start in range(0, len(items), BATCH):
+        yield items[start:start + BATCH]
+
+
+class EmbeddingCache:
+    def __init__(self, root=EMBED_CACHE_DIR, max_mb=EMBED_CACHE_MAX_MB, segment_rows=SEGMENT_ROWS):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.segment_rows = segment_rows
+        self.hits = 0
+        self.misses = 0
+        self._maps = {}
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self):
+        # Autocommit mode: write transactions are opened explicitly with BEGIN IMMEDIATE
+        db = sqlite3.connect(self.root / "index.sqlite3", timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def segment_path(self, segment):
+        return self.root / f"segment_{segment:06d}.npy"
+
+    def _map(self, segment):
+        with self._lock:
+            mapped = self._maps.get(segment)
+            if mapped is None:
+                if len(self._maps) >= MAX_OPEN_MAPS:
+                    self._maps.clear()  # also lets go of segments removed by a compaction
+                mapped = self._maps[segment] = np.load(self.segment_path(segment), mmap_mode="r")
+            return mapped
+
+    # === Lookups ===
+    def get(self, model, runtime, prefix, texts):
+        """Returns ({index: vector} for cached texts, [indices of the missing ones])."""
+        keys = [entry_key(model, runtime, prefix, t) for t in texts]
+        located, last_used = {}, {}
+        db = self._connect()
+        try:
+            for batch in _batches(list(set(keys))):
+                marks = ",".join("?" for _ in batch)
+                for key, segment, row, used in db.execute(
+                        f"SELECT key, segment, row, last_used FROM entries WHERE key IN ({marks})", batch):
+                    located[key] = (segment, row)
+                    last_used[key] = used
+            by_segment = {}
+            for i, key in enumerate(keys):
+                if key in located:
+                    segment, row = located[key]
+                    by_segment.setdefault(segment, []).append((i, row))
+            found = {}
+            for segment, items in by_segment.items():
+                try:
+                    rows = np.array(self._map(segment)[[row for _, row in items]], dtype=np.float32)
+                except FileNotFoundError:
+                    continue  # compacted away since the index was read
+                found.update((i, vector) for (i, _), vector in zip(items, rows))
+            now = time.time()
+            stale = list({keys[i] for i in found if last_used[keys[i]] < now - TOUCH_INTERVAL})
+            if stale:
+                db.execute("BEGIN IMMEDIATE")
+                for batch in _batches(stale):
+                    marks = ",".join("?" for _ in batch)
+                    db.execute(f"UPDATE entries SET last_used = ? WHERE key IN ({marks})", [now, *batch])
+                db.execute("COMMIT")
+        finally:
+            db.close()
+        missing = [i for i in range(len(keys)) if i not in found]
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    # === Writes ===
+    def put(self, model, runtime, prefix, texts, vectors):
+        """Append vectors for texts that are not cached yet, then evict if the cache is over its limit."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return 0
+        dim = vectors.shape[1]
+        pending = {}
+        for text, vector in zip(texts, vectors):
+            pending.setdefault(entry_key(model, runtime, prefix, text), vector)
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            for batch in _batches(list(pending)):
+                marks = ",".join("?" for _ in batch)
+                for (key,) in db.execute(f"SELECT key FROM entries WHERE key IN ({marks})", batch):
+                    del pending[key]
+            items = list(pending.items())
+            now = time.time()
+            while items:
+                segment, capacity, used = self._open_segment(db, model, dim)
+                take = items[:capacity - used]
+                items = items[len(take):]
+                # Rows first, index entries after: readers only see finished rows
+                mapped = np.load(self.segment_path(segment), mmap_mode="r+")
+                mapped[used:used + len(take)] = np.stack([v for _, v in take])
+                mapped.flush()
+                del mapped
+                db.executemany(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                    [(key, model, segment, used + n, now) for n, (key, _) in enumerate(take)],
+                )
+                db.execute("UPDATE segments SET used = ? WHERE id = ?", (used + len(take), segment))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        if self.max_bytes and self.size_bytes() > self.max_bytes:
+            self.evict()
+        return len(pending)
+
+    def _open_segment(self, db, model, dim):
+        """(id, capacity, used) of the model's segment with free rows, creating one if needed."""
+        row = db.execute(
+            "SELECT id, capacity, used FROM segments WHERE model = ? AND dim = ? AND used < capacity "
+            "ORDER BY id DESC LIMIT 1", (model, dim),
+        ).fetchone()
+        if row:
+            return row
+        segment = db.execute(
+            "INSERT INTO segments (model, dim, capacity) VALUES (?, ?, ?)", (model, dim, self.segment_rows)
+        ).lastrowid
+        mapped = np.lib.format.open_memmap(
+            self.segment_path(segment), mode="w+", dtype=np.float32, shape=(self.segment_rows, dim)
+        )
+        del mapped
+        return segment, self.segment_rows, 0
+
+    # === Maintenance ===
+    def size_bytes(self):
+        db = self._connect()
+        try:
+            return db.execute("SELECT COALESCE(SUM(capacity * dim * 4), 0) FROM segments").fetchone()[0]
+        finally:
+            db.close()
+
+    def evict(self, target_bytes=None):
+        """Drop least recently used entries until live vectors fit in target_bytes, then compact."""
+        target = int(self.max_bytes * EVICT_TO) if target_bytes is None else target_bytes
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            live = db.execute(
+                "SELECT COALESCE(SUM(s.dim * 4), 0) FROM entries e JOIN segments s ON s.id = e.segment"
+            ).fetchone()[0]
+            drop = []
+            for key, size in db.execute(
+                    "SELECT e.key, s.dim * 4 FROM entries e JOIN segments s ON s.id = e.segment "
+                    "ORDER BY e.last_used"):
+                if live <= target:
+                    break
+                drop.append(key)
+                live -= size
+            for batch in _batches(drop):
+                marks = ",".join("?" for _ in batch)
+                db.execute(f"DELETE FROM entries WHERE key IN ({marks})", batch)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        if drop:
+            print(f"🧹 Evicted {len(drop)} cached embeddings")
+        self.compact()
+        return len(drop)
+
+    def compact(self):
+        """Copy live rows into fresh, full segments and delete the old files; returns bytes freed."""
+        before = self.size_bytes()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            old = [s for (s,) in db.execute("SELECT id FROM segments")]
+            groups = db.execute("SELECT DISTINCT e.model, s.dim FROM entries e JOIN segments s ON s.id = e.segment")
+            for model, dim in groups.fetchall():
+                entries = db.execute(
+                    "SELECT e.key, e.segment, e.row FROM entries e JOIN segments s ON s.id = e.segment "
+                    "WHERE e.model = ? AND s.dim = ? ORDER BY e.segment, e.row", (model, dim),
+                ).fetchall()
+                for start in range(0, len(entries), self.segment_rows):
+                    chunk = entries[start:start + self.segment_rows]
+                    segment = db.execute(
+                        "INSERT INTO segments (model, dim, capacity, used) VALUES (?, ?, ?, ?)",
+                        (model, dim, len(chunk), len(chunk)),
+                    ).lastrowid
+                    mapped = np.lib.format.open_memmap(
+                        self.segment_path(segment), mode="w+", dtype=np.float32, shape=(len(chunk), dim)
+                    )
+                    sources = np.array([source for _, source, _ in chunk])
+                    rows = np.array([row for _, _, row in chunk])
+                    for source in np.unique(sources):
+                        selected = sources == source
+                        mapped[selected] = np.load(self.segment_path(int(source)), mmap_mode="r")[rows[selected]]
+                    mapped.flush()
+                    del mapped
+                    db.executemany(
+                        "UPDATE entries SET segment = ?, row = ? WHERE key = ?",
+                        [(segment, n, key) for n, (key, _, _) in enumerate(chunk)],
+                    )
+            for batch in _batches(old):
+                marks = ",".join("?" for _ in batch)
+                db.execute(f"DELETE FROM segments WHERE id IN ({marks})", batch)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            for segment in old:
+                self._maps.pop(segment, None)
+        for segment in old:
+            self.segment_path(segment).unlink(missing_ok=True)
+        return before - self.size_bytes()
+
+    def clear(self):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            old = [s for (s,) in db.execute("SELECT id FROM segments")]
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM segments")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            self._maps.clear()
+        for segment in old:
+            self.segment_path(segment).unlink(missing_ok=True)
+
+    def stats(self):
+        db = self._connect()
+        try:
+            entries, live = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(s.dim * 4), 0) FROM entries e JOIN segments s ON s.id = e.segment"
+            ).fetchone()
+            segments, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(capacity * dim * 4), 0) FROM segments"
+            ).fetchone()
+        finally:
+            db.close()
+        return {
+            "entries": entries,
+            "segments": segments,
+            "bytes": size,
+            "live_bytes": live,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide cache, or None when EMBED_CACHE_MAX_MB is 0."""
+    global _cache
+    if EMBED_CACHE_MAX_MB <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def cached_encode(model, runtime, prefix, texts, encode, use_cache=True):
+    """
+    Vectors for prefix + text, in order. Cached vectors are reused and only
+    the rest go to encode(prefixed_texts) -> matrix; they are then stored.
+    Returns (vectors, number of cache hits).
+    """
+    texts = list(texts)
+    cache = get_cache() if use_cache else None
+    if cache is None or not texts:
+        return encode([f"{prefix}{t}" for t in texts]), 0
+    found, missing = cache.get(model, runtime, prefix, texts)
+    if not missing:
+        return np.stack([found[i] for i in range(len(texts))]), len(found)
+    fresh = np.asarray(encode([f"{prefix}{texts[i]}" for i in missing]), dtype=np.float32)
+    cache.put(model, runtime, prefix, [texts[i] for i in missing], fresh)
+    vectors = np.zeros((len(texts), fresh.shape[1]), dtype=np.float32)
+    for i, vector in found.items():
+        vectors[i] = vector
+    vectors[missing] = fresh
+    return vectors, len(found)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = EmbeddingCache(max_mb=EMBED_CACHE_MAX_MB or 1024)
+    if command == "compact":
+        print(f"✅ Freed {cache.compact()} bytes")
+    elif command == "evict":
+        print(f"✅ Evicted {cache.evict()} entries")
+    elif command == "clear":
+        cache.clear()
+        print("✅ Embedding cache cleared")
+    elif command != "stats":
+        sys.exit(f"Unknown command '{command}', expected stats, compact, evict or clear")
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,297 @@
+"""
+Embedding backends and model registry.
+
+EMBEDDING_MODEL picks a model from MODELS (default e5-large-v2) and
+EMBEDDING_RUNTIME picks how it runs:
+
+- "torch" (default): sentence-transformers on PyTorch.
+- "onnx": the same model exported to ONNX and dynamically quantized to
+  int8 weights, run by ONNX Runtime on CPU. The export is done once and
+  cached under data/models.
+
+Every encoder knows its model's query/passage prefixes and pooling, so
+callers only choose between encode_queries and encode_passages. Both look
+texts up in the shared on-disk embedding cache first (embedding_cache.py)
+and only encode the ones it does not hold. The model
+name and runtime are recorded in each collection's metadata on ingest and
+checked on search, so query-time and ingest-time vectors can never
+silently come from different models or runtimes.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+import embedding_cache
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+ONNX_DIR = BASE_DIR / "data" / "models"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "e5-large-v2")
+EMBEDDING_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch").lower()
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = let ONNX Runtime decide
+MAX_SEQ_LENGTH = 512
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    dim: int
+    query_prefix: str = "query: "
+    passage_prefix: str = "passage: "
+    pooling: str = "mean"
+    # Policy coverage bands (compare_policies.py): e5 cosine similarities
+    # cluster around 0.7-0.9 even for unrelated text, bge ones spread wider
+    similarity_threshold: float = 0.82
+    coverage_margin: float = 0.03
+
+
+BGE_QUERY = "Represent this sentence for searching relevant passages: "
+
+MODELS = {
+    "e5-large-v2": ModelSpec("intfloat/e5-large-v2", 1024),
+    "e5-base-v2": ModelSpec("intfloat/e5-base-v2", 768),
+    "e5-small-v2": ModelSpec("intfloat/e5-small-v2", 384),
+    "bge-base-en-v1.5": ModelSpec("BAAI/bge-base-en-v1.5", 768, BGE_QUERY, "", "cls", 0.70, 0.05),
+    "bge-small-en-v1.5": ModelSpec("BAAI/bge-small-en-v1.5", 384, BGE_QUERY, "", "cls", 0.70, 0.05),
+}
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    pass
+
+
+def get_spec(key):
+    if key in MODELS:
+        return MODELS[key]
+    for spec in MODELS.values():
+        if spec.name == key:
+            return spec
+    raise ValueError(f"Unknown embedding model '{key}', expected one of {sorted(MODELS)}")
+
+
+class Encoder:
+    """Base class: subclasses implement _encode(texts) -> normalized float32 matrix."""
+
+    runtime = None
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    @property
+    def model_name(self):
+        return self.spec.name
+
+    @property
+    def dim(self):
+        return self.spec.dim
+
+    def metadata(self):
+        return {"embedding_model": self.spec.name, "dim": self.dim, "runtime": self.runtime}
+
+    def _encode(self, texts, batch_size):
+        raise NotImplementedError
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        vectors = self._encode([texts] if single else list(texts), batch_size)
+        return vectors[0] if single else vectors
+
+    def _encode_prefixed(self, prefix, texts, batch_size, cache):
+        """Encode prefix + text, reusing vectors from the shared on-disk cache unless cache=False."""
+        vectors, _ = embedding_cache.cached_encode(
+            self.model_name, self.runtime, prefix, texts, lambda batch: self.encode(batch, batch_size), cache
+        )
+        return vectors
+
+    def encode_queries(self, texts, batch_size=32, cache=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = self._encode_prefixed(self.spec.query_prefix, texts, batch_size, cache)
+        return vectors[0] if single else vectors
+
+    def encode_passages(self, texts, batch_size=32, cache=True):
+        return self._encode_prefixed(self.spec.passage_prefix, texts, batch_size, cache)
+
+
+class TorchEncoder(Encoder):
+    runtime = "torch"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(spec.name, device="cpu")
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension() or self.spec.dim
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def _encode(self, texts, batch_size):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def export_onnx(spec, out_dir=None):
+    """Export a model to ONNX and write a dynamically int8-quantized copy; returns its path."""
+    out_dir = Path(out_dir or ONNX_DIR / spec.name.replace("/", "__"))
+    quantized = out_dir / "model_int8.onnx"
+    if quantized.exists():
+        return quantized
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(spec.name)
+    model = AutoModel.from_pretrained(spec.name).eval()
+    model.config.return_dict = False
+    dummy = tokenizer(["passage: export"], return_tensors="pt")
+    fp32 = out_dir / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(fp32),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=14,
+        )
+    quantize_dynamic(str(fp32), str(quantized), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    fp32.unlink()
+    print(f"✅ Exported {spec.name} → {quantized}")
+    return quantized
+
+
+class OnnxEncoder(Encoder):
+    runtime = "onnx-int8"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_RUNTIME=onnx needs 'onnxruntime' and 'transformers' installed") from e
+        path = export_onnx(spec)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(path.parent)
+
+    def _encode(self, texts, batch_size):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=MAX_SEQ_LENGTH, return_tensors="np"
+            )
+            mask = batch["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                ["last_hidden_state"],
+                {"input_ids": batch["input_ids"].astype(np.int64), "attention_mask": mask},
+            )[0]
+            if self.spec.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                weights = mask[..., None].astype(np.float32)
+                pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            out[start:start + len(pooled)] = pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+        return out
+
+
+RUNTIMES = {"torch": TorchEncoder, "onnx": OnnxEncoder}
+
+
+def active_model_name():
+    """Name of the configured model, available without loading it."""
+    return get_spec(EMBEDDING_MODEL).name
+
+
+def active_runtime():
+    """Runtime name of the configured encoder (as stamped in metadata), available without loading it."""
+    if EMBEDDING_RUNTIME not in RUNTIMES:
+        raise ValueError(f"Unknown EMBEDDING_RUNTIME '{EMBEDDING_RUNTIME}', expected one of {sorted(RUNTIMES)}")
+    return RUNTIMES[EMBEDDING_RUNTIME].runtime
+
+
+def load_encoder(model=EMBEDDING_MODEL, runtime=EMBEDDING_RUNTIME):
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown EMBEDDING_RUNTIME '{runtime}', expected one of {sorted(RUNTIMES)}")
+    return RUNTIMES[runtime](get_spec(model))
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder() -> Encoder:
+    """Return the process-wide encoder selected by EMBEDDING_MODEL / EMBEDDING_RUNTIME."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = load_encoder()
+    return _encoder
+
+
+# === Collection metadata ===
+def record_model(store, collection, encoder, reset=False):
+    """
+    Create the collection if needed and stamp (or verify) the model and
+    runtime it holds.
+
+    With reset=True a collection built with another model or runtime is
+    dropped and recreated instead of raising; meant for scratch collections
+    such as the uploaded company policy.
+    """
+    store.ensure_collection(collection, encoder.dim)
+    meta = store.get_metadata(collection)
+    stored = meta.get("embedding_model")
+    stored_runtime = meta.get("runtime")
+    if stored and reset and (stored != encoder.model_name or stored_runtime not in (None, encoder.runtime)):
+        print(f"⚠️ Recreating '{collection}': it was embedded with {stored} ({stored_runtime})")
+        store.delete_collection(collection)
+        store.ensure_collection(collection, encoder.dim)
+        meta, stored = {}, None
+    if not stored:
+        store.set_metadata(collection, {**meta, **encoder.metadata()})
+        return
+    check_model(store, collection, encoder)
+    if stored_runtime is None:
+        # Collections stamped before the runtime was recorded
+        store.set_metadata(collection, {**meta, "runtime": encoder.runtime})
+
+
+def check_model(store, collection, encoder=None):
+    """Raise EmbeddingModelMismatch if a collection was built with a different model or runtime."""
+    active = encoder.model_name if encoder else active_model_name()
+    runtime = encoder.runtime if encoder else active_runtime()
+    meta = store.get_metadata(collection)
+    stored = meta.get("embedding_model")
+    if stored and stored != active:
+        raise EmbeddingModelMismatch(
+            f"Collection '{collection}' was embedded with {stored}, but the active model is "
+            f"{active}. Re-ingest it or set EMBEDDING_MODEL to match."
+        )
+    stored_runtime = meta.get("runtime")
+    if stored and stored_runtime and stored_runtime != runtime:
+        raise EmbeddingModelMismatch(
+            f"Collection '{collection}' was embedded with the {stored_runtime} runtime, but the active "
+            f"runtime is {runtime}. Re-ingest it or set EMBEDDING_RUNTIME to match."
+        )
@@ -0,0 +1,231 @@
+"""
+Background jobs with progress, cancellation and persisted results.
+
+Long pipelines (a map-reduce compare can take minutes) run on a bounded
+worker pool instead of inside a Flask request. Every job is a row in a
+local SQLite database (data/jobs.sqlite3) holding its parameters, status,
+latest progress and result, so finished results survive a restart. On
+start-up jobs that were still queued are queued again, and jobs that were
+running are marked interrupted.
+
+Job functions are registered by kind and called as fn(params, job) where
+job.progress(**fields) publishes progress and raises JobCancelled once a
+cancel was requested, so work stops at the next progress update.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+JOBS_DB = Path(os.getenv("JOBS_DB", BASE_DIR / "data" / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed", "cancelled", "interrupted")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class JobStore:
+    """SQLite persistence; one short-lived connection per call keeps it thread-safe."""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @staticmethod
+    def _row(row, with_result=False):
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "progress": json.loads(row["progress"]) if row["progress"] else {},
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if with_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), time.time()),
+            )
+        return job_id
+
+    def get(self, job_id, with_result=False):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row, with_result) if row else None
+
+    def list(self, limit=50):
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def update(self, job_id, **fields):
+        for key in ("progress", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id, from_statuses, status, **fields):
+        """Change status only if the job is currently in one of from_statuses; returns True if it was."""
+        fields["status"] = status
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        marks = ", ".join("?" for _ in from_statuses)
+        with self._connect() as db:
+            cursor = db.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND status IN ({marks})",
+                (*fields.values(), job_id, *from_statuses),
+            )
+        return cursor.rowcount == 1
+
+    def count_active(self):
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM jobs WHERE status IN {ACTIVE}").fetchone()[0]
+
+    def ids_with_status(self, status):
+        with self._connect() as db:
+            return [r[0] for r in db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (status,))]
+
+    def purge(self, older_than):
+        marks = ", ".join("?" for _ in FINISHED)
+        with self._connect() as db:
+            cursor = db.execute(
+                f"DELETE FROM jobs WHERE status IN ({marks}) AND finished_at < ?", (*FINISHED, older_than)
+            )
+        return cursor.rowcount
+
+
+class Job:
+    """Handle passed to a running job function."""
+
+    def __init__(self, queue, job_id):
+        self._queue = queue
+        self.id = job_id
+        self._progress = {}
+
+    @property
+    def cancelled(self):
+        return self.id in self._queue._cancel_requested
+
+    def progress(self, **fields):
+        """Publish progress (merged with earlier fields); raises JobCancelled if a cancel was requested."""
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        self._progress.update(fields)
+        self._queue.store.update(self.id, progress=self._progress)
+
+
+class JobQueue:
+    def __init__(self, store=None, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, retention_hours=JOB_RETENTION_HOURS):
+        self.store = store or JobStore()
+        self.max_pending = max_pending
+        self.retention = retention_hours * 3600
+        self._handlers = {}
+        self._cancel_requested = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+
+    def register(self, kind, fn):
+        self._handlers[kind] = fn
+
+    def resume(self):
+        """After a restart: requeue jobs that never started, mark running ones interrupted."""
+        interrupted = 0
+        for job_id in self.store.ids_with_status("running"):
+            interrupted += self.store.transition(
+                job_id, ("running",), "interrupted", error="Server restarted while the job was running",
+                finished_at=time.time(),
+            )
+        queued = self.store.ids_with_status("queued")
+        for job_id in queued:
+            self._pool.submit(self._run, job_id)
+        if interrupted or queued:
+            print(f"🔁 Jobs: {len(queued)} requeued, {interrupted} marked interrupted")
+
+    def submit(self, kind, params):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        with self._lock:
+            self.store.purge(time.time() - self.retention)
+            if self.store.count_active() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already queued or running")
+            job_id = self.store.create(kind, params)
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a queued job at once, or ask a running one to stop. Returns the new status or None."""
+        if self.store.transition(job_id, ("queued",), "cancelled", finished_at=time.time()):
+            return "cancelled"
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == "running":
+            self._cancel_requested.add(job_id)
+            return "cancelling"
+        return job["status"]
+
+    def _run(self, job_id):
+        if not self.store.transition(job_id, ("queued",), "running", started_at=time.time()):
+            return  # cancelled while queued
+        job = self.store.get(job_id)
+        handle = Job(self, job_id)
+        try:
+            result = self._handlers[job["kind"]](job["params"], handle)
+            self.store.transition(job_id, ("running",), "succeeded", result=json.dumps(result), finished_at=time.time())
+        except JobCancelled:
+            self.store.transition(job_id, ("running",), "cancelled", finished_at=time.time())
+        except Exception as e:
+            error = getattr(e, "message", None) or str(e)
+            stages = getattr(e, "stages", None)
+            self.store.transition(
+                job_id, ("running",), "failed", error=f"{type(e).__name__}: {error}",
+                result=json.dumps({"stages": stages}) if stages else None, finished_at=time.time(),
+            )
+        finally:
+            self._cancel_requested.discard(job_id)
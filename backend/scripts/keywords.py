@@ -0,0 +1,207 @@
+"""
+Keyword extraction for chunk `top_keywords`.
+
+RAKE ran once per chunk in pure Python. The default "tfidf" method scores
+every chunk of a document at once instead: candidate phrases are cut at
+stopwords and punctuation (as RAKE does), their 1- to 3-word n-grams are
+counted into one sparse (chunk, n-gram) table, and the TF-IDF weights and
+per-chunk top-k are computed with numpy over the whole table. IDF is taken
+over the document's own chunks, so terms every article repeats ("personal
+data" in the GDPR) rank below the ones specific to a chunk.
+
+Documents are scored in parallel in the shared worker pool, and results
+are cached in SQLite by (method, top_k, chunk text hash) so unchanged
+chunks are never scored again. KEYWORD_METHOD=rake switches back to RAKE.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+KEYWORD_METHOD = os.getenv("KEYWORD_METHOD", "tfidf")
+KEYWORD_TOP_K = int(os.getenv("KEYWORD_TOP_K", "13"))
+KEYWORD_CACHE = Path(os.getenv("KEYWORD_CACHE", BASE_DIR / "data" / "keywords.sqlite3"))
+METHODS = ("tfidf", "rake")
+MAX_NGRAM = 3
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each either etc few for from further had has have having he
+her here hers herself him himself his how however i if in into is it its itself just may me might more most must
+my myself no nor not now of off on once only or other our ours ourselves out over own per same shall she should so
+some such than that the their theirs them themselves then there these they this those through thus to too under
+until up upon us very via was we were what when where whether which while who whom why will with within without
+would you your yours yourself yourselves
+""".split())
+WORD_RE = re.compile(r"[^\W\d_]\w*(?:[-'’]\w+)*|\d+(?:\.\d+)+")
+BREAK_RE = re.compile(r"[^\w\s'’-]+|\s-\s")
+
+
+# === Candidates ===
+def phrases(text):
+    """Runs of non-stopwords between punctuation and stopwords, as word lists."""
+    for part in BREAK_RE.split(text.lower()):
+        phrase = []
+        for word in WORD_RE.findall(part):
+            if word in STOPWORDS or len(word) < 3 and not word[0].isdigit():
+                if phrase:
+                    yield phrase
+                phrase = []
+            else:
+                phrase.append(word)
+        if phrase:
+            yield phrase
+
+
+def ngrams(text, max_n=MAX_NGRAM):
+    for phrase in phrases(text):
+        for n in range(1, min(max_n, len(phrase)) + 1):
+            for i in range(len(phrase) - n + 1):
+                yield " ".join(phrase[i:i + n])
+
+
+# === Scorers ===
+def tfidf_keywords(texts, top_k=KEYWORD_TOP_K):
+    """Top-k keywords for every text, scored together (one document's chunks at a time)."""
+    vocab, rows, cols = {}, [], []
+    for row, text in enumerate(texts):
+        for gram in ngrams(text):
+            rows.append(row)
+            cols.append(vocab.setdefault(gram, len(vocab)))
+    if not vocab:
+        return [[] for _ in texts]
+    terms = np.array(list(vocab), dtype=object)
+    n_terms = len(terms)
+    # Sparse (row, term) counts
+    cells, tf = np.unique(np.asarray(rows, dtype=np.int64) * n_terms + np.asarray(cols, dtype=np.int64),
+                          return_counts=True)
+    cell_rows, cell_terms = cells // n_terms, cells % n_terms
+    df = np.bincount(cell_terms, minlength=n_terms)
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+    length = np.array([g.count(" ") + 1 for g in terms], dtype=np.float64)
+    scores = (1 + np.log(tf)) * idf[cell_terms] * np.sqrt(length[cell_terms])
+    # Per-row top-k: sort by row, then score descending, then keep the first k of each row
+    order = np.lexsort((cell_terms, -scores, cell_rows))
+    ranked_rows = cell_rows[order]
+    starts = np.searchsorted(ranked_rows, np.arange(len(texts)))
+    rank = np.arange(len(order)) - starts[ranked_rows]
+    keep = order[rank < top_k]
+    result = [[] for _ in texts]
+    for row, term in zip(cell_rows[keep].tolist(), cell_terms[keep].tolist()):
+        result[row].append(terms[term])
+    return result
+
+
+_rake = None
+
+
+def rake_keywords(texts, top_k=KEYWORD_TOP_K):
+    """The original per-chunk RAKE extraction (needs the NLTK stopwords corpus)."""
+    global _rake
+    if _rake is None:
+        from rake_nltk import Rake
+        _rake = Rake()
+    result = []
+    for text in texts:
+        _rake.extract_keywords_from_text(text)
+        result.append(_rake.get_ranked_phrases()[:top_k])
+    return result
+
+
+SCORERS = {"tfidf": tfidf_keywords, "rake": rake_keywords}
+
+
+def score_document(texts, method, top_k):
+    """Worker entry point: keywords for one document's texts."""
+    return SCORERS[method](texts, top_k)
+
+
+# === Cache ===
+_cache_lock = threading.Lock()
+
+
+def _connect():
+    KEYWORD_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(KEYWORD_CACHE, timeout=30)
+    db.execute("CREATE TABLE IF NOT EXISTS keywords (key TEXT PRIMARY KEY, keywords TEXT NOT NULL)")
+    return db
+
+
+def cache_key(text, method, top_k):
+    return hashlib.sha256(f"{method}\n{top_k}\n{text}".encode("utf-8")).hexdigest()
+
+
+def cache_get(keys):
+    found = {}
+    unique = list(set(keys))
+    with _cache_lock, _connect() as db:
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            marks = ",".join("?" for _ in batch)
+            for key, value in db.execute(f"SELECT key, keywords FROM keywords WHERE key IN ({marks})", batch):
+                found[key] = json.loads(value)
+    return found
+
+
+def cache_put(entries):
+    if entries:
+        with _cache_lock, _connect() as db:
+            db.executemany("INSERT OR REPLACE INTO keywords VALUES (?, ?)",
+                           [(k, json.dumps(v)) for k, v in entries.items()])
+
+
+# === Entry points ===
+def extract_documents(documents, method=KEYWORD_METHOD, top_k=KEYWORD_TOP_K, workers=None, cache=True):
+    """
+    documents maps a name to the list of its chunk texts. Returns the same
+    mapping with a keyword list per text. Cached chunks are reused; a
+    document with any uncached chunk is scored as a whole, in parallel
+    with the other documents.
+    """
+    if method not in SCORERS:
+        raise ValueError(f"Unknown KEYWORD_METHOD '{method}', expected one of {METHODS}")
+    keys = {name: [cache_key(t, method, top_k) for t in texts] for name, texts in documents.items()}
+    cached = cache_get([k for ks in keys.values() for k in ks]) if cache else {}
+    todo = [name for name, ks in keys.items() if any(k not in cached for k in ks)]
+
+    from pdf_parser import PDF_WORKERS, get_pool
+    workers = PDF_WORKERS if workers is None else workers
+    if workers > 1 and len(todo) > 1:
+        futures = {name: get_pool().submit(score_document, documents[name], method, top_k) for name in todo}
+        scored = {name: future.result() for name, future in futures.items()}
+    else:
+        scored = {name: score_document(documents[name], method, top_k) for name in todo}
+
+    fresh = {}
+    for name, result in scored.items():
+        for key, words in zip(keys[name], result):
+            if key not in cached:
+                fresh[key] = cached[key] = words
+    if cache:
+        cache_put(fresh)
+    return {name: [cached[k] for k in ks] for name, ks in keys.items()}
+
+
+def annotate(chunks, method=KEYWORD_METHOD, top_k=KEYWORD_TOP_K):
+    """Fill top_keywords on one document's chunk records in place."""
+    texts = [c["full_text"] for c in chunks]
+    for chunk, words in zip(chunks, extract_documents({"": texts}, method, top_k)[""]):
+        chunk["top_keywords"] = words
+    return chunks
+
+
+def annotate_documents(documents, method=KEYWORD_METHOD, top_k=KEYWORD_TOP_K):
+    """annotate() for several documents ({name: chunks}) at once, scored in parallel."""
+    results = extract_documents(
+        {name: [c["full_text"] for c in chunks] for name, chunks in documents.items()}, method, top_k
+    )
+    for name, chunks in documents.items():
+        for chunk, words in zip(chunks, results[name]):
+            chunk["top_keywords"] = words
+    return documents
@@ -0,0 +1,71 @@
+"""
+Ingest manifest: what was ingested from each source document.
+
+data/manifest.json maps a standard's name to the SHA-256 of its raw file,
+its chunk count, the embedding model, runtime and vector-store backend it
+was stored with, and the ingest time. A rebuild compares file hashes with
+the manifest and only re-processes documents that are new or changed (or
+were embedded with another model or runtime, or stored in another backend).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MANIFEST_FILE = Path(os.getenv("MANIFEST_FILE", BASE_DIR / "data" / "manifest.json"))
+
+_lock = threading.Lock()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(path=MANIFEST_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def get(source, path=MANIFEST_FILE):
+    return load(path).get(source)
+
+
+def record(source, doc_path, sha256, chunks, model_name, path=MANIFEST_FILE, **extra):
+    """Store (or replace) the entry for one source document."""
+    entry = {
+        "file": Path(doc_path).name,
+        "sha256": sha256,
+        "chunks": chunks,
+        "embedding_model": model_name,
+        "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **extra,
+    }
+    with _lock:
+        entries = load(path)
+        entries[source] = entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    return entry
+
+
+def is_current(source, sha256, model_name, path=MANIFEST_FILE, **expected):
+    """
+    True if the document with this hash was already ingested with this
+    model and every `expected` field (e.g. runtime) matches its entry.
+    """
+    entry = get(source, path)
+    return (bool(entry) and entry["sha256"] == sha256 and entry["embedding_model"] == model_name
+            and all(entry.get(k) == v for k, v in expected.items()))
@@ -1,28 +1,41 @@
 from typing import List, Tuple
 
-def build_mcp_prompt(
-    query: str,
-    results: List[Tuple[object, float]],
-    system_instruction: str = "You are a legal compliance expert. Respond ONLY based on the provided context. If you don’t know the answer, say so."
-) -> str:
-    """
-    Build a structured MCP (Model Context Protocol) prompt.
-    Each result is a tuple (QdrantPoint, score).
-    """
-    context_blocks = []
+from context_packer import CONTEXT_TOKEN_BUDGET, count_tokens, pack_context
+
+SYSTEM_INSTRUCTION = "You are a legal compliance expert. Respond ONLY based on the provided context. If you don’t know the answer, say so."
+
 
-    for idx, (res, score) in enumerate(results):
-        payload = res.payload
-        block = f"""### SOURCE {idx+1}
+def render_header(idx, res, score):
+    payload = res.payload
+    return f"""### SOURCE {idx}
 Source: {payload.get("source", "N/A")}
 Article: {payload.get("article_id", "N/A")} - {payload.get("title", "N/A")}
 Score: {score:.4f}
-
-{payload.get("full_text", "[No full text available]")}
 """
-        context_blocks.append(block)
 
-    context = "\n\n".join(context_blocks)
+
+def render_blocks(blocks, first=1):
+    return "\n\n".join(
+        f"{render_header(first + idx, res, score)}\n{text}\n"
+        for idx, (res, score, text) in enumerate(blocks)
+    )
+
+
+def pack_mcp_prompt(
+    query: str,
+    results: List[Tuple[object, float]],
+    system_instruction: str = SYSTEM_INSTRUCTION,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    cliff: float = 0
+):
+    """
+    Build the MCP prompt with the context packed into token_budget tokens.
+    Returns (prompt, used_results, stats); used_results are the (hit, score)
+    pairs that made it into the prompt and stats includes prompt_tokens.
+    cliff is the score cliff for similarity-scored results (see pack_context).
+    """
+    blocks, stats = pack_context(query, results, render_header, budget=token_budget, cliff=cliff)
+    context = render_blocks(blocks)
 
     full_prompt = f"""{system_instruction}
 
@@ -34,4 +47,45 @@ Score: {score:.4f}
 
 ### ANSWER
 """
-    return full_prompt
\ No newline at end of file
+    stats["prompt_tokens"] = count_tokens(full_prompt)
+    return full_prompt, [(res, score) for res, score, _ in blocks], stats
+
+
+def build_mcp_prompt(
+    query: str,
+    results: List[Tuple[object, float]],
+    system_instruction: str = SYSTEM_INSTRUCTION,
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> str:
+    """
+    Build a structured MCP (Model Context Protocol) prompt.
+    Each result is a tuple (QdrantPoint, score).
+    """
+    return pack_mcp_prompt(query, results, system_instruction, token_budget)[0]
+
+
+def pack_followup_prompt(
+    query: str,
+    new_results: List[Tuple[object, float]],
+    first_source: int = 1,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    cliff: float = 0
+):
+    """
+    Prompt for a follow-up turn sent together with Ollama's context array.
+    The instruction and earlier sources are already in that context, so only
+    chunks not shown before and the new question are added. Returns the same
+    (prompt, used_results, stats) triple as pack_mcp_prompt.
+    """
+    blocks, stats = pack_context(query, new_results, lambda i, r, s: render_header(first_source + i - 1, r, s),
+                                 budget=token_budget, cliff=cliff)
+    context = f"### ADDITIONAL CONTEXT\n{render_blocks(blocks, first_source)}\n\n" if blocks else ""
+    prompt = f"""
+
+{context}### FOLLOW-UP QUESTION
+{query}
+
+### ANSWER
+"""
+    stats["prompt_tokens"] = count_tokens(prompt)
+    return prompt, [(res, score) for res, score, _ in blocks], stats
@@ -0,0 +1,137 @@
+"""
+Per-upload namespaces for company policies.
+
+Every /api/compare upload gets its own namespace: a working directory
+(data/uploads/<id>/) for the uploaded file and a vector collection
+(company_policy_ns_<id>) for its chunks. Concurrent uploads no longer write
+into one shared collection, and a search only ever scans the chunks of one
+policy.
+
+A namespace records when it was last used in namespace.json. A background
+collector deletes namespaces idle for longer than NAMESPACE_TTL seconds,
+together with their collection, and drops collections whose directory is
+already gone.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from vector_store import get_vector_store
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_ROOT", BASE_DIR / "data" / "uploads"))
+NAMESPACE_TTL = float(os.getenv("NAMESPACE_TTL", "21600"))
+NAMESPACE_GC_INTERVAL = float(os.getenv("NAMESPACE_GC_INTERVAL", "300"))
+COLLECTION_PREFIX = "company_policy_ns_"
+MARKER = "namespace.json"
+NAMESPACE_RE = re.compile(r"[0-9a-f]{16}")
+
+
+class Namespace:
+    def __init__(self, root, ns_id, created_at=None):
+        self.id = ns_id
+        self.dir = Path(root) / ns_id
+        self.collection = f"{COLLECTION_PREFIX}{ns_id}"
+        self.created_at = created_at or time.time()
+
+    def path(self, filename):
+        return self.dir / filename
+
+    def touch(self):
+        """Record a use; the TTL counts from the last one."""
+        marker = self.dir / MARKER
+        marker.write_text(json.dumps({
+            "namespace": self.id,
+            "collection": self.collection,
+            "created_at": self.created_at,
+            "last_used": time.time(),
+        }), encoding="utf-8")
+
+    def summary(self):
+        return {"namespace": self.id, "collection": self.collection}
+
+
+class NamespaceStore:
+    def __init__(self, root=UPLOAD_ROOT, ttl=NAMESPACE_TTL, interval=NAMESPACE_GC_INTERVAL):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.interval = interval
+        self.collected = 0
+        self._collector = None
+        self._lock = threading.Lock()
+
+    def create(self):
+        self.start_collector()
+        namespace = Namespace(self.root, uuid.uuid4().hex[:16])
+        namespace.dir.mkdir(parents=True)
+        namespace.touch()
+        return namespace
+
+    def get(self, ns_id):
+        """A live namespace by id (marked used), or None."""
+        if not NAMESPACE_RE.fullmatch(str(ns_id)):
+            return None
+        marker = self.root / ns_id / MARKER
+        if not marker.is_file():
+            return None
+        info = json.loads(marker.read_text(encoding="utf-8"))
+        namespace = Namespace(self.root, info["namespace"], info["created_at"])
+        namespace.touch()
+        return namespace
+
+    def delete(self, ns_id):
+        namespace = Namespace(self.root, ns_id)
+        store = get_vector_store()
+        if namespace.collection in store.list_collections():
+            store.delete_collection(namespace.collection)
+        shutil.rmtree(namespace.dir, ignore_errors=True)
+
+    def _last_used(self, directory):
+        try:
+            return json.loads((directory / MARKER).read_text(encoding="utf-8"))["last_used"]
+        except (OSError, ValueError, KeyError):
+            return directory.stat().st_mtime
+
+    def collect(self):
+        """Delete expired namespaces and orphaned namespace collections; returns how many were removed."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        if self.root.is_dir():
+            for directory in self.root.iterdir():
+                if directory.is_dir() and self._last_used(directory) < cutoff:
+                    self.delete(directory.name)
+                    removed += 1
+        store = get_vector_store()
+        for name in store.list_collections():
+            # The directory is created before the collection, so a collection without one is left over
+            if name.startswith(COLLECTION_PREFIX) and not (self.root / name[len(COLLECTION_PREFIX):]).is_dir():
+                store.delete_collection(name)
+                removed += 1
+        self.collected += removed
+        if removed:
+            print(f"🧹 Removed {removed} expired upload namespace(s)")
+        return removed
+
+    def _collect_forever(self):
+        while True:
+            try:
+                self.collect()
+            except Exception as e:
+                print(f"⚠️ Namespace cleanup failed: {e}")
+            time.sleep(self.interval)
+
+    def start_collector(self):
+        """Start the background collector once; later calls do nothing."""
+        with self._lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect_forever, name="namespace-gc", daemon=True)
+                self._collector.start()
+
+    def stats(self):
+        count = sum(1 for d in self.root.iterdir() if d.is_dir()) if self.root.is_dir() else 0
+        return {"namespaces": count, "ttl": self.ttl, "collected": self.collected}
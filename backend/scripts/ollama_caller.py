@@ -1,12 +1,201 @@
+"""
+Shared Ollama HTTP client.
+
+Every caller (the Flask app, compare_with_LLMs, run_mcp_query) goes through
+one pooled requests.Session, so connections are kept alive between calls.
+Connect/read timeouts, retries with backoff and the model keep_alive window
+are configurable through the environment. The async helpers run blocking
+calls in worker threads so several prompts can be generated concurrently.
+"""
+import asyncio
+import json
+import os
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def ask_ollama(prompt: str, model="mistral"):
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
+MAX_RETRIES = int(os.getenv("OLLAMA_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("OLLAMA_BACKOFF", "0.5"))
+POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        host=OLLAMA_HOST,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        pool_size=POOL_SIZE,
+        keep_alive=KEEP_ALIVE,
+    ):
+        self.host = host
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        # Retry refused connections and 5xx answers, but never re-run a
+        # generation that timed out while reading.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _body(self, prompt, model, stream, keep_alive=None, options=None, **extra):
+        body = {
             "model": model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream,
+            "keep_alive": self.keep_alive if keep_alive is None else keep_alive,
         }
-    )
-    return response.json()["response"]
+        if options:
+            body["options"] = options
+        body.update({k: v for k, v in extra.items() if v is not None})
+        return body
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise OllamaError(f"Ollama returned {response.status_code}: {message}")
+
+    def generate(self, prompt, model, keep_alive=None, options=None, **extra):
+        """Run a non-streaming generation and return Ollama's full JSON reply."""
+        response = self.session.post(
+            f"{self.host}/api/generate",
+            json=self._body(prompt, model, False, keep_alive, options, **extra),
+            timeout=self.timeout,
+        )
+        self._check(response)
+        message = response.json()
+        if "error" in message:
+            raise OllamaError(message["error"])
+        return message
+
+    def stream(self, prompt, model, keep_alive=None, options=None, **extra):
+        """
+        Yield Ollama's streamed generation messages as they arrive.
+
+        Each item is the decoded JSON line ({"response": "...", "done": false}, ...);
+        the last one has "done": true and carries Ollama's timing counters.
+        Closing the generator closes the HTTP connection, which makes Ollama
+        stop generating.
+        """
+        with self.session.post(
+            f"{self.host}/api/generate",
+            json=self._body(prompt, model, True, keep_alive, options, **extra),
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            self._check(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise OllamaError(message["error"])
+                yield message
+                if message.get("done"):
+                    break
+
+    def preload(self, model, keep_alive=None):
+        """Load a model into memory without generating anything."""
+        return self.generate("", model, keep_alive=keep_alive)
+
+    def loaded_models(self, timeout=2):
+        """Models currently in memory (/api/ps). Bypasses retries so health probes stay fast."""
+        response = requests.get(f"{self.host}/api/ps", timeout=(min(CONNECT_TIMEOUT, timeout), timeout))
+        self._check(response)
+        return [m["name"] for m in response.json().get("models", [])]
+
+    def list_models(self):
+        response = self.session.get(f"{self.host}/api/tags", timeout=self.timeout)
+        self._check(response)
+        return [m["name"] for m in response.json().get("models", [])]
+
+    # === Async interface ===
+    async def agenerate(self, prompt, model, **kwargs):
+        return await asyncio.to_thread(self.generate, prompt, model, **kwargs)
+
+    async def agenerate_many(self, prompts, model, concurrency=4, return_exceptions=False, on_done=None, **kwargs):
+        """
+        Generate several prompts concurrently; results keep the input order.
+
+        With return_exceptions=True a failed prompt yields its exception in
+        place of a reply instead of failing the whole batch. on_done(index,
+        reply_or_exception) is called as each prompt finishes; if it raises,
+        prompts that have not started yet are skipped and that error is raised.
+        """
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, self.pool_size)))
+        aborted = []
+
+        def notify(index, result):
+            try:
+                on_done(index, result)
+            except Exception as e:
+                aborted.append(e)
+
+        async def one(index, prompt):
+            async with semaphore:
+                if aborted:
+                    raise aborted[0]
+                try:
+                    result = await self.agenerate(prompt, model, **kwargs)
+                except Exception as e:
+                    if on_done:
+                        notify(index, e)
+                    raise
+                if on_done:
+                    notify(index, result)
+                return result
+
+        results = await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts)), return_exceptions=return_exceptions)
+        if aborted:
+            raise aborted[0]
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_ollama_client() -> OllamaClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
+
+def ask_ollama(prompt: str, model="mistral"):
+    return get_ollama_client().generate(prompt, model)["response"]
+
+def stream_ollama(prompt: str, model="mistral"):
+    return get_ollama_client().stream(prompt, model)
+
+def generate_many(prompts, model="mistral", concurrency=4):
+    """Blocking wrapper around agenerate_many for synchronous callers."""
+    replies = asyncio.run(get_ollama_client().agenerate_many(prompts, model, concurrency=concurrency))
+    return [r["response"] for r in replies]
@@ -0,0 +1,483 @@
+"""
+In-process ingestion pipeline: parse → chunk → embed → upsert → compare.
+
+The Flask app used to run the chunk/embed/compare scripts as subprocesses,
+so every request re-imported torch and reloaded the embedding model. This
+module runs the same stages inside the app, reusing the shared encoder and
+vector store and passing chunks between stages in memory. Every stage is
+timed and reported as a plain dict so callers can return it as JSON.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+import bm25_index
+import bulk_encoder
+import chunker
+import manifest
+import pdf_parser
+import chunk_company_policy
+import compare_policies
+import compare_with_LLMs
+from embeddings import active_model_name, active_runtime, check_model, get_encoder, record_model
+from jobs import JobCancelled
+from query_chunks import COLLECTION_NAME
+from vector_store import VECTOR_BACKEND, get_vector_store
+
+# === Config ===
+BASE_DIR = Path(__file__).resolve().parents[1]
+REG_DIR = BASE_DIR / "data" / "parsed_json_semantic"
+RAW_DIR = BASE_DIR / "data" / "raw_docs"
+DOCUMENT_SUFFIXES = (".pdf", ".docx", ".txt", ".md")
+COMPANY_COLLECTION = "company_policy_temp"
+STANDARD_PAYLOAD_FIELDS = ("article_id", "title", "source", "jurisdiction", "top_keywords", "full_text", "page", "page_end",
+                           "part")
+COMPARE_MODE = os.getenv("COMPARE_MODE", "single")  # see compare_policy
+COMPARE_MODES = ("single", "map_reduce", "gated", "coverage")
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "compliance-ai/chunks")
+CHUNK_HASH_FIELDS = ("article_id", "title", "full_text")  # positional fields like "id" are left out
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails; carries the stage reports collected so far."""
+
+    def __init__(self, stage, message, stages):
+        super().__init__(f"{stage} failed: {message}")
+        self.stage = stage
+        self.message = message
+        self.stages = stages
+
+
+class PipelineRun:
+    """
+    Runs stages in order and records a report for each one.
+
+    progress(**fields), if given, is told each stage name before it starts;
+    a JobCancelled raised by it or by a stage stops the run unwrapped.
+    """
+
+    def __init__(self, progress=None):
+        self.stages = []
+        self.progress = progress
+
+    def stage(self, name, fn, *args, summarize=None, rate=None, **kwargs):
+        """rate names a summarize key to also report per second, e.g. rate="pages" adds pages_per_s."""
+        if self.progress:
+            self.progress(stage=name)
+        start = time.perf_counter()
+        report = {"stage": name, "ok": True, "seconds": 0.0, "error": None}
+        self.stages.append(report)
+        try:
+            value = fn(*args, **kwargs)
+        except JobCancelled:
+            report["ok"] = False
+            report["error"] = "cancelled"
+            raise
+        except Exception as e:
+            report["ok"] = False
+            report["error"] = f"{type(e).__name__}: {e}"
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            raise PipelineError(name, report["error"], self.stages) from e
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        if summarize:
+            report.update(summarize(value))
+        if rate and report["seconds"]:
+            report[f"{rate}_per_s"] = round(report[rate] / report["seconds"], 1)
+        return value
+
+
+# === Stages ===
+def parse_document(path):
+    """A PDF's [(page_number, text), ...] pages, or the plain text of other formats."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        return chunker.parse_pdf(path)
+    if suffix == ".docx":
+        import docx2txt
+        return docx2txt.process(str(path))
+    if suffix in (".txt", ".md"):
+        return path.read_text(encoding="utf-8", errors="replace")
+    raise ValueError(f"Unsupported document type: {suffix or path.name}")
+
+
+def chunk_policy(text, source_name):
+    chunks = chunk_company_policy.chunk_text(text, source_name=source_name)
+    if not chunks:
+        raise ValueError("No text could be extracted from the policy")
+    return chunks
+
+
+def encode_chunks(chunks):
+    """(vectors, stats) for chunks; stats carry chunks_per_s and tokens_per_s (see bulk_encoder)."""
+    return bulk_encoder.encode_passages([c["full_text"] for c in chunks])
+
+
+def embed_chunks(chunks):
+    return encode_chunks(chunks)[0]
+
+
+def chunk_id(source, payload, model_name):
+    """Point id derived from (source, content hash, model): the same chunk always maps to the same point."""
+    content = json.dumps([payload.get(k) for k in CHUNK_HASH_FIELDS], ensure_ascii=False)
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}\n{digest}\n{model_name}"))
+
+
+def upsert_chunks(collection_name, payloads, vectors, scratch=False, ids=None):
+    """scratch=True for upload collections: they are emptied first and hold only this upload."""
+    store = get_vector_store()
+    if scratch and collection_name in store.list_collections():
+        store.delete_collection(collection_name)
+    encoder = get_encoder()
+    record_model(store, collection_name, encoder, reset=scratch)
+    if ids is None:
+        ids = [chunk_id(p.get("source", ""), p, encoder.model_name) for p in payloads]
+    # Identical chunks share an id; store each once
+    first = {}
+    for row, id_ in enumerate(ids):
+        first.setdefault(id_, row)
+    rows = list(first.values())
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return store.upsert(collection_name, [ids[r] for r in rows], vectors[rows], [payloads[r] for r in rows])
+
+
+def diff_chunks(collection_name, source, payloads):
+    """
+    Compare a source's chunks with the points already stored for it.
+    Returns (new [(id, payload)], updated [(id, payload)], stale ids, stats).
+    Only the new chunks need embedding; updated ones have the same content
+    but other metadata (page, part, keywords, ...) and just need their
+    payload rewritten, and the stale points are the ones to delete.
+    """
+    store = get_vector_store()
+    model = active_model_name()
+    stored = {}
+    if collection_name in store.list_collections():
+        check_model(store, collection_name)
+        stored_ids, _, stored_payloads = store.scroll(collection_name, source_filter=source)
+        stored = {str(i): p for i, p in zip(stored_ids, stored_payloads)}
+    wanted = {}
+    for payload in payloads:
+        wanted.setdefault(chunk_id(source, payload, model), payload)
+    new = [(id_, payload) for id_, payload in wanted.items() if id_ not in stored]
+    updated = [(id_, payload) for id_, payload in wanted.items() if id_ in stored and stored[id_] != payload]
+    stale = [id_ for id_ in stored if id_ not in wanted]
+    stats = {
+        "skipped": len(wanted) - len(new) - len(updated),
+        "added": len(new),
+        "updated": len(updated),
+        "deleted": len(stale),
+        "duplicates": len(payloads) - len(wanted),
+    }
+    return new, updated, stale, stats
+
+
+def update_payloads(collection_name, updated):
+    """Rewrite the payloads of [(id, payload)] points without re-embedding them."""
+    if not updated:
+        return 0
+    return get_vector_store().set_payload(collection_name, [i for i, _ in updated], [p for _, p in updated])
+
+
+def delete_points(collection_name, ids):
+    return get_vector_store().delete(collection_name, ids) if ids else 0
+
+
+def sync_source(collection_name, source, payloads):
+    """Make the stored points of one source match payloads, embedding only new or changed chunks."""
+    return sync_sources(collection_name, {source: payloads})[0][source]
+
+
+def sync_sources(collection_name, sources):
+    """
+    sync_source() for several sources ({source: payloads}). The new chunks of
+    all sources are encoded in one bulk call, so a full re-embed is spread
+    over every encoder worker. Returns ({source: stats}, encode stats).
+    """
+    diffs = {source: diff_chunks(collection_name, source, payloads) for source, payloads in sources.items()}
+    new = [item for pending, _, _, _ in diffs.values() for item in pending]
+    vectors, encoded = encode_chunks([p for _, p in new])
+    if new:
+        upsert_chunks(collection_name, [p for _, p in new], vectors, ids=[i for i, _ in new])
+    for _, updated, stale, _ in diffs.values():
+        update_payloads(collection_name, updated)
+        delete_points(collection_name, stale)
+    return {source: stats for source, (_, _, _, stats) in diffs.items()}, encoded
+
+
+def write_chunks(chunks, out_file):
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_file, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            json.dump(chunk, f)
+            f.write("\n")
+    return out_file
+
+
+def resolve_regulation_file(standard):
+    for name in (standard, standard.strip().upper().replace(" ", "_")):
+        reg_file = REG_DIR / f"{name}.jsonl"
+        if reg_file.exists():
+            return reg_file
+    raise FileNotFoundError(f"No parsed regulation found for: {standard}")
+
+
+def compare_with_llm(company_chunks, standard, llm_model):
+    reg_file = resolve_regulation_file(standard)
+    company = [compare_with_LLMs.summarize_chunk(c) for c in company_chunks]
+    regulation = compare_with_LLMs.load_chunks(reg_file, max_chunks=compare_with_LLMs.MAX_ARTICLES)
+    prompt = compare_with_LLMs.build_prompt(company, regulation, reg_file.stem)
+    response = compare_with_LLMs.query_llm(prompt, llm_model)
+    if not response:
+        raise RuntimeError(f"LLM '{llm_model}' returned an empty response")
+    return response
+
+
+def article_key(r):
+    return (r.get("article_id"), r.get("title"), r.get("full_text"))
+
+
+def load_regulation(standard):
+    """All chunks of a standard with their stored vectors (embedding any that are not stored)."""
+    reg_file = resolve_regulation_file(standard)
+    with open(reg_file, "r", encoding="utf-8-sig", errors="replace") as f:
+        articles = [json.loads(line) for line in f if line.strip()]
+    stored = {}
+    store = get_vector_store()
+    if COLLECTION_NAME in store.list_collections():
+        _, vectors, payloads = store.scroll(COLLECTION_NAME, source_filter=reg_file.stem, with_vectors=True)
+        stored = {article_key(p): v for p, v in zip(payloads, vectors if vectors is not None else [])}
+    missing = [a for a in articles if article_key(a) not in stored]
+    if missing:
+        stored.update(zip(map(article_key, missing), embed_chunks(missing)))
+    vectors = np.stack([np.asarray(stored[article_key(a)], dtype=np.float32) for a in articles])
+    return reg_file.stem, articles, vectors, len(missing)
+
+
+def match_articles(articles, article_vectors, policy_chunks, policy_vectors):
+    """One similarity matrix gives both the coverage groups and each article's best excerpts."""
+    sims = compare_policies.coverage_matrix(article_vectors, policy_vectors)
+    coverage = compare_policies.coverage_report(articles, policy_chunks, sims, label=compare_with_LLMs.article_label)
+    k = min(compare_with_LLMs.EXCERPTS_PER_ARTICLE, sims.shape[1])
+    top = np.argsort(-sims, axis=1)[:, :k]
+    excerpts = [[policy_chunks[j]["full_text"] for j in row] for row in top]
+    return coverage, excerpts
+
+
+def similarity_verdict(row):
+    """Verdict for an article the coverage matrix already decided."""
+    verdict = {"article": row["article"], "risk": "", "mitigation": "", "method": "similarity", "score": row["score"]}
+    if row["group"] == "covered":
+        return {**verdict, "status": "Covered"}
+    if row["group"] == "missing":
+        return {
+            **verdict,
+            "status": "Missing",
+            "risk": f"No policy text resembles this article (best similarity {row['score']:.2f}).",
+            "mitigation": f"Add a policy section that addresses {row['article']}.",
+        }
+    return {**verdict, "status": "Not assessed"}
+
+
+def map_verdicts(articles, excerpts, coverage, reg_source, llm_model, concurrency, progress=None, gate=False):
+    """
+    Map step: LLM verdicts for every article, or with gate=True for the
+    ambiguous ones only, the rest keeping their similarity verdict.
+    """
+    verdicts = [similarity_verdict(row) for row in coverage["articles"]]
+    selected = [i for i, row in enumerate(coverage["articles"]) if not gate or row["group"] == "ambiguous"]
+    stats = {"llm_articles": len(selected), "calls": 0, "failed_calls": 0, "concurrency": concurrency}
+    if selected:
+        llm_verdicts, stats_llm = compare_with_LLMs.map_articles(
+            [articles[i] for i in selected], [excerpts[i] for i in selected], reg_source, llm_model,
+            concurrency=concurrency,
+            progress=progress and (lambda done, total: progress(articles_done=done, articles_total=total)),
+        )
+        stats.update(stats_llm)
+        for i, verdict in zip(selected, llm_verdicts):
+            verdicts[i] = {**verdict, "method": "llm", "score": coverage["articles"][i]["score"]}
+    return verdicts, stats
+
+
+def _count(key):
+    return lambda value: {key: len(value)}
+
+
+def _text_stats(text):
+    if isinstance(text, str):
+        return {"pages": 1, "characters": len(text)}
+    return {"pages": len(text), "characters": sum(len(t) for _, t in text)}
+
+
+def standard_payload(chunk):
+    return {k: chunk[k] for k in STANDARD_PAYLOAD_FIELDS if k in chunk}
+
+
+def ingest_settings():
+    """Manifest fields besides the model that must match for stored vectors to be reused."""
+    return {"runtime": active_runtime(), "vector_backend": VECTOR_BACKEND}
+
+
+# === Entry points ===
+def ingest_standard(pdf_path, standard_name, force=False, reindex=True, pages=None):
+    """
+    Chunk and persist one standard, then embed and upsert only the chunks not stored yet.
+
+    A document whose hash, embedding model, runtime and vector backend
+    match its manifest entry is skipped entirely unless force=True. reindex=False leaves the BM25
+    rebuild to the caller (rebuild_standards does it once at the end), and
+    pages passes in a document that was already parsed.
+    """
+    run = PipelineRun()
+    sha256 = run.stage("hash", manifest.file_hash, pdf_path)
+    model, settings = active_model_name(), ingest_settings()
+    if not force and manifest.is_current(standard_name, sha256, model, **settings) \
+            and (REG_DIR / f"{standard_name}.jsonl").exists():
+        chunks = manifest.get(standard_name)["chunks"]
+        return {"source": standard_name, "chunks": chunks, "unchanged": True,
+                "skipped": chunks, "added": 0, "updated": 0, "deleted": 0, "duplicates": 0, "stages": run.stages}
+    if pages is None:
+        pages = run.stage("parse", parse_document, pdf_path, summarize=_text_stats, rate="pages")
+    chunks = run.stage(
+        "chunk", chunker.chunk_text, pages,
+        source_name=standard_name,
+        jurisdiction=chunker.infer_jurisdiction(standard_name),
+        summarize=_count("chunks"),
+    )
+    run.stage("write", write_chunks, chunks, REG_DIR / f"{standard_name}.jsonl")
+    if reindex:
+        run.stage("index", bm25_index.build_index, REG_DIR, summarize=lambda ix: {"indexed_chunks": len(ix)})
+    payloads = [standard_payload(c) for c in chunks]
+    new, updated, stale, diff = run.stage(
+        "diff", diff_chunks, COLLECTION_NAME, standard_name, payloads, summarize=lambda r: r[3],
+    )
+    if new:
+        vectors, _ = run.stage("embed", encode_chunks, [p for _, p in new], summarize=lambda r: r[1])
+        run.stage(
+            "upsert", upsert_chunks, COLLECTION_NAME, [p for _, p in new], vectors, ids=[i for i, _ in new],
+            summarize=lambda n: {"points": n},
+        )
+    if updated:
+        run.stage("payload", update_payloads, COLLECTION_NAME, updated, summarize=lambda n: {"points": n})
+    if stale:
+        run.stage("delete", delete_points, COLLECTION_NAME, stale, summarize=lambda n: {"points": n})
+    manifest.record(standard_name, pdf_path, sha256, len(chunks), model, **settings)
+    return {"source": standard_name, "chunks": len(chunks), "unchanged": False, **diff, "stages": run.stages}
+
+
+def rebuild_standards(names=None, force=False):
+    """Re-ingest the documents in data/raw_docs that are new or changed since their manifest entry."""
+    docs = sorted(p for p in RAW_DIR.iterdir() if p.suffix.lower() in DOCUMENT_SUFFIXES)
+    if names:
+        docs = [p for p in docs if p.stem in names]
+        for name in set(names) - {p.stem for p in docs}:
+            print(f"⚠️ No raw document found for {name}")
+    # Parse the changed PDFs together so their page ranges share the worker pool
+    model, settings = active_model_name(), ingest_settings()
+    changed = [
+        p for p in docs if p.suffix.lower() == ".pdf"
+        and (force or not manifest.is_current(p.stem, manifest.file_hash(p), model, **settings))
+    ]
+    parsed = {}
+    if changed:
+        parsed, stats = pdf_parser.parse_documents(changed)
+        print(f"📄 Parsed {stats['pages']} pages from {stats['documents']} document(s) "
+              f"in {stats['seconds']}s ({stats['pages_per_s']} pages/s)")
+    results, failed = [], []
+    for path in docs:
+        try:
+            result = ingest_standard(path, path.stem, force=force, reindex=False, pages=parsed.get(path))
+        except PipelineError as e:
+            print(f"❌ {path.name}: {e}")
+            failed.append(path.stem)
+            continue
+        if result["unchanged"]:
+            print(f"✅ {path.name}: unchanged")
+        else:
+            print(f"🔼 {path.name}: {result['added']} added, {result['updated']} updated, "
+                  f"{result['skipped']} unchanged, {result['deleted']} deleted")
+        results.append(result)
+    if any(not r["unchanged"] for r in results):
+        index = bm25_index.build_index(REG_DIR)
+        print(f"✅ BM25 index rebuilt over {len(index)} chunks")
+    return results, failed
+
+
+def compare_policy(policy_path, standard, llm_model, mode=COMPARE_MODE, concurrency=compare_with_LLMs.COMPARE_CONCURRENCY,
+                   progress=None, collection=COMPANY_COLLECTION):
+    """
+    Chunk and embed an uploaded company policy, then compare it with a standard.
+
+    mode="single" sends one prompt with a sample of the standard's articles.
+    mode="coverage" only compares stored vectors: every article is covered,
+    missing or ambiguous by its best policy match, with no LLM call.
+    mode="map_reduce" checks every article against its most similar policy
+    excerpts in concurrent LLM calls and aggregates the verdicts.
+    mode="gated" does the same for the ambiguous articles only; the others
+    keep their coverage verdict.
+
+    The policy chunks are stored in `collection`, normally the upload's
+    own namespace collection (see namespaces.py). progress(**fields)
+    receives the current stage and, during the map stage, articles_done /
+    articles_total (see jobs.Job.progress).
+    """
+    if mode not in COMPARE_MODES:
+        raise ValueError(f"Unknown compare mode '{mode}', expected one of {COMPARE_MODES}")
+    run = PipelineRun(progress)
+    source = Path(policy_path).stem
+    text = run.stage("parse", parse_document, policy_path, summarize=_text_stats, rate="pages")
+    chunks = run.stage("chunk", chunk_policy, text, source, summarize=_count("chunks"))
+    vectors, _ = run.stage("embed", encode_chunks, chunks, summarize=lambda r: r[1])
+    run.stage(
+        "upsert", upsert_chunks, collection, chunks, vectors, scratch=True,
+        summarize=lambda n: {"points": n, "collection": collection},
+    )
+    if mode == "single":
+        result = run.stage("compare", compare_with_llm, chunks, standard, llm_model)
+        return {"result": result, "mode": mode, "stages": run.stages}
+
+    reg_source, articles, article_vectors, embedded = run.stage(
+        "regulation", load_regulation, standard,
+        summarize=lambda r: {"articles": len(r[1]), "embedded_now": r[3]},
+    )
+    coverage, excerpts = run.stage(
+        "coverage", match_articles, articles, article_vectors, chunks, vectors,
+        summarize=lambda r: r[0]["counts"],
+    )
+    if mode == "coverage":
+        verdicts = [similarity_verdict(row) for row in coverage["articles"]]
+        report, counts = compare_with_LLMs.reduce_verdicts(verdicts, reg_source)
+    else:
+        verdicts, _ = run.stage(
+            "map", map_verdicts, articles, excerpts, coverage, reg_source, llm_model, concurrency, progress,
+            gate=mode == "gated", summarize=lambda r: r[1],
+        )
+        report, counts = run.stage(
+            "reduce", compare_with_LLMs.reduce_verdicts, verdicts, reg_source, llm_model,
+            summarize=lambda r: r[1],
+        )
+    return {
+        "result": report,
+        "mode": mode,
+        "summary": counts,
+        "coverage": coverage,
+        "verdicts": verdicts,
+        "stages": run.stages,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-ingest standards in data/raw_docs whose file changed.")
+    parser.add_argument("standards", nargs="*", help="only these standards (default: all)")
+    parser.add_argument("--force", action="store_true", help="re-ingest even if the manifest says unchanged")
+    args = parser.parse_args()
+    _, failed = rebuild_standards(args.standards or None, force=args.force)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,113 @@
+"""
+Compact vector codes for candidate search.
+
+Int8 scalar quantization stores one signed byte per dimension (4x smaller
+than float32), scaled per dimension so the largest magnitude maps to 127.
+Binary quantization keeps only the sign bit (32x smaller) and scores with
+Hamming distance. Both are used to pick candidates that are then rescored
+against the full-precision vectors.
+"""
+import numpy as np
+
+BLOCK_ROWS = 8192  # rows decoded at a time, bounds the temporary float buffer
+
+# popcount for every byte value, used for Hamming distance on packed bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Int8Quantizer:
+    name = "int8"
+
+    def __init__(self, scale=None):
+        self.scale = scale
+
+    def fit(self, vectors):
+        peak = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+        self.scale = (np.where(peak == 0, 1.0, peak) / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes, query):
+        weighted = (np.asarray(query, dtype=np.float32) * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ weighted
+        return out
+
+    def params(self):
+        return {"scale": self.scale}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(scale=params["scale"])
+
+    @staticmethod
+    def bytes_per_vector(dim):
+        return dim
+
+
+class BinaryQuantizer:
+    name = "binary"
+
+    def __init__(self, dim=None):
+        self.dim = dim
+
+    def fit(self, vectors):
+        self.dim = vectors.shape[1]
+        return self
+
+    def encode(self, vectors):
+        return np.packbits(vectors > 0, axis=1)
+
+    def scores(self, codes, query):
+        """Higher is closer: dim - 2 * hamming, i.e. the dot product of the sign vectors."""
+        q = np.packbits(np.asarray(query) > 0)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            hamming = _POPCOUNT[np.bitwise_xor(block, q)].sum(axis=1, dtype=np.int32)
+            out[start:start + len(block)] = self.dim - 2 * hamming
+        return out
+
+    def params(self):
+        return {"dim": np.array(self.dim)}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(dim=int(params["dim"]))
+
+    @staticmethod
+    def bytes_per_vector(dim):
+        return (dim + 7) // 8
+
+
+QUANTIZERS = {"int8": Int8Quantizer, "binary": BinaryQuantizer}
+
+
+def get_quantizer(name):
+    if name not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization '{name}', expected one of {sorted(QUANTIZERS)}")
+    return QUANTIZERS[name]()
+
+
+def rescore(vectors, candidates, query, top_k):
+    """Exact scores for the candidate rows only; returns (rows, scores) best first."""
+    candidates = np.sort(candidates)  # sequential reads from the memory map
+    exact = np.asarray(vectors[candidates], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    order = np.argsort(-exact)[:top_k]
+    return candidates[order], exact[order]
+
+
+def memory_report(n, dim, quantization):
+    float_bytes = n * dim * 4
+    code_bytes = n * QUANTIZERS[quantization].bytes_per_vector(dim)
+    return {
+        "vectors": n,
+        "dim": dim,
+        "float32_bytes": float_bytes,
+        f"{quantization}_bytes": code_bytes,
+        "ratio": round(float_bytes / code_bytes, 1) if code_bytes else None,
+    }
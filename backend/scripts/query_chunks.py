@@ -1,35 +1,116 @@
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, SearchParams
 import numpy as np
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from query_cache import LRUCache, normalize_query
+import bm25_index
+from vector_store import get_vector_store
+from embeddings import get_encoder, check_model
 
 COLLECTION_NAME = "compliance_semantic"
-MODEL_NAME = "intfloat/e5-large-v2"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "512"))
 
-model = SentenceTransformer(MODEL_NAME)
-client = QdrantClient(host="localhost", port=6333)
+# The model and the vector store are created on first use (see get_encoder /
+# get_store), so importing this module is cheap and does not need Qdrant up.
+query_embedding_cache = LRUCache(maxsize=QUERY_CACHE_SIZE)
+RRF_K = 60
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+_store_checked = False
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the vector store, checking once that the collection matches the active model."""
+    global _store_checked
+    store = get_vector_store()
+    if not _store_checked:
+        with _store_lock:
+            if not _store_checked:
+                # Refuse to serve queries against vectors from a different embedding model
+                check_model(store, COLLECTION_NAME)
+                _store_checked = True
+    return store
+
+# === Query Embedding (cached) ===
+def embed_query(query):
+    encoder = get_encoder()
+    text = normalize_query(query)
+    key = (encoder.model_name, text)
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = encoder.encode_queries(text)
+        query_embedding_cache.put(key, vector)
+    return vector.tolist()
+
+def embed_queries(queries):
+    """Embed many queries with one batched encode, skipping cached ones."""
+    encoder = get_encoder()
+    texts = [normalize_query(q) for q in queries]
+    vectors = {}
+    missing = []
+    for text in texts:
+        if text in vectors or text in missing:
+            continue
+        vector = query_embedding_cache.get((encoder.model_name, text))
+        if vector is None:
+            missing.append(text)
+        else:
+            vectors[text] = vector
+    if missing:
+        encoded = encoder.encode_queries(missing)
+        for text, vector in zip(missing, encoded):
+            query_embedding_cache.put((encoder.model_name, text), vector)
+            vectors[text] = vector
+    return [vectors[t].tolist() for t in texts]
 
 # === Query + Filter ===
 def search_legal_chunks(query, top_k=8, source_filter=None):
-    query_vector = model.encode(f"query: {query}", normalize_embeddings=True).tolist()
-
-    q_filter = None
-    if source_filter:
-        q_filter = Filter(
-            must=[FieldCondition(key="source", match=MatchValue(value=source_filter))]
-        )
-
-    results = client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=top_k,
-        with_payload=True,
-        with_vectors=False,
-        query_filter=q_filter,
-        search_params=SearchParams(hnsw_ef=128)
-    )
+    query_vector = embed_query(query)
+    results = get_store().search(COLLECTION_NAME, query_vector, top_k=top_k, source_filter=source_filter)
     return results, query_vector
 
+def search_legal_chunks_batch(queries, top_k=8, source_filters=None):
+    """Embed and search many queries in one pass; results keep the input order."""
+    query_vectors = embed_queries(queries)
+    results = get_store().search_batch(COLLECTION_NAME, query_vectors, top_k=top_k, source_filters=source_filters)
+    return results, query_vectors
+
+# === Hybrid Lexical + Dense ===
+def result_key(hit):
+    p = hit.payload
+    return (p.get("source"), p.get("article_id"), p.get("full_text"))
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K, limit=None):
+    """Merge ranked hit lists; each hit scores sum(1 / (k + rank)) over the lists it appears in."""
+    fused = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, 1):
+            key = result_key(hit)
+            entry = fused.setdefault(key, [hit, 0.0])
+            entry[1] += 1.0 / (k + rank)
+    merged = sorted(((hit, score) for hit, score in fused.values()), key=lambda x: x[1], reverse=True)
+    return merged[:limit] if limit else merged
+
+def lexical_search(query, top_k=8, source_filter=None):
+    index = bm25_index.get_index()
+    return index.search(query, top_k=top_k, source_filter=source_filter) if index else []
+
+def hybrid_search(query, top_k=6, source_filter=None):
+    """Run BM25 and dense search in parallel and fuse them; returns [(hit, score)], query_vector."""
+    lexical = _search_pool.submit(lexical_search, query, top_k, source_filter)
+    dense, query_vector = search_legal_chunks(query, top_k=top_k, source_filter=source_filter)
+    return reciprocal_rank_fusion([dense, lexical.result()], limit=top_k), query_vector
+
+def hybrid_search_batch(queries, top_k=6, source_filters=None):
+    source_filters = source_filters or [None] * len(queries)
+    lexical = [_search_pool.submit(lexical_search, q, top_k, f) for q, f in zip(queries, source_filters)]
+    dense_batches, query_vectors = search_legal_chunks_batch(queries, top_k=top_k, source_filters=source_filters)
+    fused = [
+        reciprocal_rank_fusion([dense, lex.result()], limit=top_k)
+        for dense, lex in zip(dense_batches, lexical)
+    ]
+    return fused, query_vectors
+
 # === Keyword Booster ===
 def rerank_by_keywords(results, query, weight=0.25):
     query_words = set(query.lower().split())
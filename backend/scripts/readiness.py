@@ -0,0 +1,175 @@
+"""
+Background warm-up and readiness reporting.
+
+Nothing heavy happens when the app is imported: the embedding model, the
+vector store, the BM25 index and the Ollama client are all created on first
+use. Readiness.start() warms them up in a daemon thread, in order:
+
+- embedding_model: load the encoder and run one dummy query encode
+- vector_store: one search against the main collection, which also checks
+  that it was embedded with the active model
+- bm25: load (or build) the lexical index
+- reranker: load the cross-encoder and score one pair (only with
+  RERANKER_ENABLED=1), so the first request does not spend its latency
+  budget loading the model
+- llm: preload the Ollama model, then a one-token generate
+
+Each step records its state and latency. A failed step is retried every
+WARMUP_RETRY_SECONDS, so the app becomes ready by itself once Qdrant or
+Ollama come up. /readyz only reports ready when every required step has
+passed, i.e. when the first real query will not pay for any loading. With
+READY_REQUIRES_LLM=0 the llm step is optional: it keeps retrying in the
+background and is reported separately, but does not hold readiness back.
+"""
+import os
+import threading
+import time
+
+import bm25_index
+from embeddings import get_encoder
+from ollama_caller import get_ollama_client
+from query_chunks import COLLECTION_NAME, get_store, search_legal_chunks
+from reranker import get_reranker
+
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+READY_REQUIRES_LLM = os.getenv("READY_REQUIRES_LLM", "1") == "1"
+WARMUP_QUERY = "What are the notification requirements for a personal data breach?"
+
+
+def warm_embedding_model():
+    encoder = get_encoder()
+    encoder.encode_queries(WARMUP_QUERY, cache=False)  # must run the model, not hit the cache
+    return {"model": encoder.model_name, "runtime": encoder.runtime}
+
+
+def warm_vector_store():
+    store = get_store()
+    if COLLECTION_NAME not in store.list_collections():
+        return {"collection": COLLECTION_NAME, "points": 0}
+    search_legal_chunks(WARMUP_QUERY, top_k=1)
+    return {"collection": COLLECTION_NAME, "points": store.count(COLLECTION_NAME)}
+
+
+def warm_bm25():
+    return {"indexed_chunks": len(bm25_index.get_index())}
+
+
+def warm_reranker():
+    return get_reranker().warm()
+
+
+def warm_llm(model):
+    client = get_ollama_client()
+    client.preload(model)
+    client.generate("ping", model, options={"num_predict": 1})
+    return {"model": model}
+
+
+def probe_vector_store():
+    return {"collections": len(get_store().list_collections())}
+
+
+def probe_llm(model):
+    loaded = get_ollama_client().loaded_models()
+    return {"model": model, "loaded": any(name.split(":")[0] == model.split(":")[0] for name in loaded)}
+
+
+class Readiness:
+    def __init__(self, llm_model, requires_llm=READY_REQUIRES_LLM, retry_seconds=WARMUP_RETRY_SECONDS):
+        self.steps = {
+            "embedding_model": warm_embedding_model,
+            "vector_store": warm_vector_store,
+            "bm25": warm_bm25,
+        }
+        if get_reranker() is not None:
+            self.steps["reranker"] = warm_reranker
+        self.steps["llm"] = lambda: warm_llm(llm_model)
+        self.probes = {"vector_store": probe_vector_store, "llm": lambda: probe_llm(llm_model)}
+        self.required = [name for name in self.steps if name != "llm" or requires_llm]
+        self.retry_seconds = retry_seconds
+        self.started_at = None
+        self._status = {name: {"state": "pending", "ms": None} for name in self.steps}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.warmed = threading.Event()    # set once every required step has passed
+        self.finished = threading.Event()  # set once every step, optional ones included, has passed
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name] = {**self._status[name], **fields}
+
+    def _run_step(self, name):
+        self._set(name, state="warming")
+        start = time.perf_counter()
+        try:
+            details = self.steps[name]() or {}
+        except Exception as e:
+            self._set(name, state="error", error=f"{type(e).__name__}: {e}",
+                      ms=round((time.perf_counter() - start) * 1000, 1))
+            return False
+        self._set(name, state="ready", error=None, ms=round((time.perf_counter() - start) * 1000, 1), **details)
+        return True
+
+    def _warm_up(self):
+        pending = list(self.steps)
+        while True:
+            pending = [name for name in pending if not self._run_step(name)]
+            if not self.warmed.is_set() and not any(name in self.required for name in pending):
+                self.warmed.set()
+                print(f"✅ Warm-up finished in {time.time() - self.started_at:.1f}s")
+            if not pending:
+                self.finished.set()
+                return
+            print(f"⚠️ Warm-up pending for {', '.join(pending)}; retrying in {self.retry_seconds:.0f}s")
+            time.sleep(self.retry_seconds)
+
+    def start(self):
+        """Start warming up in a daemon thread (once)."""
+        with self._lock:
+            if self._thread is not None:
+                return self._thread
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def status(self):
+        with self._lock:
+            return {name: dict(s) for name, s in self._status.items()}
+
+    def probe(self):
+        """Live check of the network dependencies, with latency."""
+        results = {}
+        for name, fn in self.probes.items():
+            start = time.perf_counter()
+            try:
+                results[name] = {"ok": True, **fn()}
+            except Exception as e:
+                results[name] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            results[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return results
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started_at, 1) if self.started_at else None,
+            "dependencies": self.status(),
+        }
+
+    def readiness(self):
+        """
+        Return (ready, report): warm-up has passed for every required step and
+        it is still reachable. Optional steps are reported under "optional".
+        """
+        status = self.status()
+        probes = self.probe()
+        ready = all(status[name]["state"] == "ready" for name in self.required) and all(
+            probe["ok"] for name, probe in probes.items() if name in self.required
+        )
+        return ready, {
+            "ready": ready,
+            "required": self.required,
+            "dependencies": {name: s for name, s in status.items() if name in self.required},
+            "optional": {name: s for name, s in status.items() if name not in self.required},
+            "probes": probes,
+        }
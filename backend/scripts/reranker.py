@@ -0,0 +1,168 @@
+"""
+Optional cross-encoder reranking between retrieval and prompt building.
+
+All uncached (query, chunk) pairs are scored in one batched forward pass on
+CPU, and scores are kept in an LRU keyed by (normalized query, chunk hash).
+ms-marco cross-encoders return raw logits (mostly negative, relevant
+passages near or above 0), so they are turned into probabilities with a
+sigmoid: the context packer's score cliff is relative to the top score and
+needs scores on a 0-1 scale.
+Scoring runs in a worker thread under a latency budget: if it does not
+finish in time the caller gets the hybrid (BM25 + vector) order instead,
+and the late scores still land in the cache for the next request.
+
+The model is loaded by warm() during the app's readiness warm-up, outside
+any budget. Until then, and while the worker is still busy with an earlier
+call that ran over its budget, requests fall back immediately instead of
+queueing behind it.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from query_cache import LRUCache, normalize_query
+
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_BUDGET_MS = float(os.getenv("RERANKER_BUDGET_MS", "300"))
+RERANKER_CACHE_SIZE = int(os.getenv("RERANKER_CACHE_SIZE", "4096"))
+RERANKER_CANDIDATES = int(os.getenv("RERANKER_CANDIDATES", "12"))
+RERANKER_CONTEXT_K = int(os.getenv("RERANKER_CONTEXT_K", "3"))
+MAX_LENGTH = 512
+
+
+def probability(logit):
+    """Sigmoid of a cross-encoder logit, without overflowing for large negatives."""
+    if logit >= 0:
+        return 1.0 / (1.0 + math.exp(-logit))
+    z = math.exp(logit)
+    return z / (1.0 + z)
+
+
+def chunk_key(hit):
+    p = hit.payload
+    text = f"{p.get('source')}\x1f{p.get('article_id')}\x1f{p.get('full_text')}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def passage_text(hit):
+    p = hit.payload
+    return f"{p.get('title', '')}\n{p.get('full_text', '')}".strip()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=RERANKER_MODEL, budget_ms=RERANKER_BUDGET_MS, cache_size=RERANKER_CACHE_SIZE):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.cache = LRUCache(maxsize=cache_size)
+        self.fallbacks = 0
+        self._model = None
+        self._model_lock = threading.Lock()
+        # One worker keeps forward passes from competing for the same cores;
+        # _busy is held from submit until the call finishes, so nothing queues behind it
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._busy = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=MAX_LENGTH, device="cpu")
+        return self._model
+
+    def warm(self):
+        """Load the model and run one pair through it; called by the readiness warm-up."""
+        start = time.perf_counter()
+        self.model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+        return {"model": self.model_name, "load_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def _submit(self, fn, *args):
+        """Run fn on the worker, or return None if it is still busy with an earlier call."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._busy.release())
+        return future
+
+    def _fallback(self, ranked, top_n, reason, start):
+        self.fallbacks += 1
+        return ranked[:top_n], {
+            "reranker": "fallback",
+            "reason": reason,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def _score(self, query, pairs):
+        """Score (key, hit) pairs in one batch and cache the results as probabilities."""
+        texts = [(query, passage_text(hit)) for _, hit in pairs]
+        logits = self.model.predict(texts, batch_size=len(texts), show_progress_bar=False)
+        scores = {key: probability(float(logit)) for (key, _), logit in zip(pairs, logits)}
+        for key, score in scores.items():
+            self.cache.put((query, key), score)
+        return scores
+
+    def rerank(self, query, ranked, top_n=RERANKER_CONTEXT_K):
+        """
+        Reorder [(hit, score)] by cross-encoder probability and keep top_n.
+
+        Returns (results, info) where info says whether the model or the
+        fallback order was used and how long reranking took.
+        """
+        start = time.perf_counter()
+        query = normalize_query(query)
+        keyed = [(chunk_key(hit), hit) for hit, _ in ranked]
+        scores = {}
+        missing = []
+        for key, hit in keyed:
+            score = self.cache.get((query, key))
+            if score is None:
+                missing.append((key, hit))
+            else:
+                scores[key] = score
+
+        if missing:
+            if self._model is None:
+                # Never load under the budget: start loading in the background and fall back for now
+                self._submit(self.warm)
+                return self._fallback(ranked, top_n, "model still loading", start)
+            future = self._submit(self._score, query, missing)
+            if future is None:
+                return self._fallback(ranked, top_n, "busy with an earlier request", start)
+            try:
+                scores.update(future.result(timeout=self.budget_ms / 1000))
+            except TimeoutError:
+                return self._fallback(ranked, top_n, f"exceeded {self.budget_ms:.0f} ms budget", start)
+            except Exception as e:
+                print(f"⚠️ Reranker failed, keeping hybrid order: {e}")
+                return self._fallback(ranked, top_n, str(e), start)
+
+        reranked = sorted(((hit, scores[key]) for key, hit in keyed), key=lambda x: x[1], reverse=True)
+        return reranked[:top_n], {
+            "reranker": self.model_name,
+            "scored": len(missing),
+            "cached": len(keyed) - len(missing),
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def stats(self):
+        return {"model": self.model_name, "budget_ms": self.budget_ms, "fallbacks": self.fallbacks, **self.cache.stats()}
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Return the shared reranker, or None when RERANKER_ENABLED is off."""
+    global _reranker
+    if not RERANKER_ENABLED:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
@@ -1,21 +1,13 @@
 
 
 
-import subprocess
 from mcp_builder import build_mcp_prompt
-from query_chunks import search_legal_chunks, rerank_by_keywords
+from query_chunks import hybrid_search
+from ollama_caller import ask_ollama
 
 def run_llama3(prompt: str) -> str:
-    # Call local LLaMA 3 model using Ollama
-    process = subprocess.Popen(
-        ["ollama", "run", "llama3"],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    output, error = process.communicate(input=prompt)
-    return output.strip()
+    # Call local LLaMA 3 model through the shared Ollama client
+    return ask_ollama(prompt, model="llama3").strip()
 
 if __name__ == "__main__":
     print(" Welcome to Compliance Assistant (powered by LLaMA 3 + MCP + Qdrant)")
@@ -31,10 +23,8 @@ if __name__ == "__main__":
         if source:
             source = source.upper().replace(" ", "_")
 
-        raw_results, _ = search_legal_chunks(query, top_k=6, source_filter=source)
-
-        print("⏳ Reranking results...", end="", flush=True)
-        reranked = rerank_by_keywords(raw_results, query)
+        print("⏳ Searching (BM25 + vectors)...", end="", flush=True)
+        reranked, _ = hybrid_search(query, top_k=6, source_filter=source)
         print(" done.")
 
         if not reranked:
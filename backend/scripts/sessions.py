@@ -0,0 +1,137 @@
+"""
+Server-side conversation sessions.
+
+A session remembers what the model has already seen: the chunks retrieved
+in earlier turns and the `context` token array Ollama returns from
+/api/generate. A follow-up turn sends that array back with a prompt that
+holds only the new question and any chunks not shown before. Ollama then
+prefills just those tokens instead of the system instruction and the whole
+context again.
+
+Sessions expire after SESSION_TTL seconds without use, at most SESSION_MAX
+are kept (least recently used ones are dropped first), and a context array
+longer than SESSION_MAX_CONTEXT tokens is discarded so the next turn starts
+from a full prompt instead of overflowing the model's window.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "200"))
+SESSION_MAX_CONTEXT = int(os.getenv("SESSION_MAX_CONTEXT", "6000"))
+MAX_TURNS = 20  # turns kept for GET /api/sessions/<id>
+
+
+class Session:
+    def __init__(self, source_filter=None, model=None):
+        self.id = uuid.uuid4().hex
+        self.source_filter = source_filter
+        self.model = model
+        self.created_at = self.last_used = time.time()
+        self.turns = []
+        self.chunk_keys = set()   # chunks already in the model's context
+        self.sources_shown = 0    # SOURCE n numbering continues across turns
+        self.context = None       # Ollama context as int32, 4 bytes per token
+        self.context_resets = 0
+        # One turn at a time: each reply's context builds on the previous one
+        self.lock = threading.Lock()
+
+    @property
+    def last_query(self):
+        return self.turns[-1]["query"] if self.turns else None
+
+    def context_tokens(self):
+        return 0 if self.context is None else len(self.context)
+
+    def ollama_context(self):
+        return None if self.context is None else self.context.tolist()
+
+    def record_turn(self, query, answer, sources, new_keys, context, max_context=SESSION_MAX_CONTEXT):
+        self.turns = (self.turns + [{"query": query, "answer": answer, "sources": sources}])[-MAX_TURNS:]
+        if context and len(context) <= max_context:
+            self.context = np.asarray(context, dtype=np.int32)
+            self.chunk_keys.update(new_keys)
+            self.sources_shown += len(new_keys)
+        else:
+            # Too long (or no context returned): the next turn sends a full prompt again
+            self.context_resets += self.context is not None
+            self.context = None
+            self.chunk_keys = set()
+            self.sources_shown = 0
+
+    def summary(self):
+        return {
+            "session_id": self.id,
+            "standard": self.source_filter,
+            "model": self.model,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "context_tokens": self.context_tokens(),
+            "context_resets": self.context_resets,
+            "chunks_in_context": len(self.chunk_keys),
+            "turns": self.turns,
+        }
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL, maxsize=SESSION_MAX, max_context=SESSION_MAX_CONTEXT):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_context = max_context
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now):
+        for sid in [s for s, session in self._sessions.items() if now - session.last_used > self.ttl]:
+            del self._sessions[sid]
+            self.expired += 1
+
+    def create(self, source_filter=None, model=None):
+        session = Session(source_filter, model)
+        with self._lock:
+            self._purge_expired(time.time())
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id):
+        """Return a live session and mark it used, or None if unknown or expired."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            self._purge_expired(time.time())
+            tokens = sum(s.context_tokens() for s in self._sessions.values())
+            return {
+                "size": len(self._sessions),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "context_tokens": tokens,
+                "context_bytes": tokens * 4,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,536 @@
+"""
+Pluggable vector store.
+
+Every script talks to vectors through the VectorStore interface instead of
+a hard-coded QdrantClient. Two backends are available, picked with the
+VECTOR_BACKEND environment variable:
+
+- "qdrant" (default): the Qdrant server at QDRANT_HOST:QDRANT_PORT.
+- "numpy": an in-process store under data/vector_store. Each collection
+  is a memory-mapped float32 matrix plus id/payload arrays. Search is an
+  exact top-k from one matrix-vector product, and source filters use
+  precomputed row masks. It needs no server and works for tests and
+  air-gapped installs.
+
+VECTOR_QUANTIZATION=int8|binary turns on compact storage for either
+backend. Candidate search runs on the codes, and the best
+top_k * RESCORE_OVERSAMPLE candidates are rescored against full-precision
+vectors. In the NumPy backend the float matrix stays memory-mapped and
+only the rescored rows are read.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from quantization import get_quantizer, rescore
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+NUMPY_STORE_DIR = Path(os.getenv("VECTOR_STORE_DIR", BASE_DIR / "data" / "vector_store"))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_META_FILE = BASE_DIR / "data" / "qdrant_collections.json"
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+RESCORE_OVERSAMPLE = float(os.getenv("RESCORE_OVERSAMPLE", "4"))
+
+
+class ScoredHit:
+    """Search result with the same .id/.score/.payload shape as a Qdrant ScoredPoint."""
+
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id, score, payload):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+    def __repr__(self):
+        return f"ScoredHit(id={self.id!r}, score={self.score:.4f})"
+
+
+class VectorStore:
+    """Interface shared by the vector store backends."""
+
+    def list_collections(self):
+        raise NotImplementedError
+
+    def ensure_collection(self, name, dim):
+        raise NotImplementedError
+
+    def delete_collection(self, name):
+        raise NotImplementedError
+
+    def count(self, name):
+        raise NotImplementedError
+
+    def upsert(self, name, ids, vectors, payloads):
+        raise NotImplementedError
+
+    def delete(self, name, ids):
+        raise NotImplementedError
+
+    def set_payload(self, name, ids, payloads):
+        """Replace the payloads of existing points, keeping their vectors."""
+        raise NotImplementedError
+
+    def scroll(self, name, source_filter=None, with_vectors=False):
+        """Return (ids, vectors or None, payloads) for every point, optionally for one source."""
+        raise NotImplementedError
+
+    def get_metadata(self, name):
+        """Collection-level metadata such as the embedding model; {} when none was recorded."""
+        raise NotImplementedError
+
+    def set_metadata(self, name, metadata):
+        raise NotImplementedError
+
+    def search(self, name, vector, top_k=8, source_filter=None):
+        raise NotImplementedError
+
+    def search_batch(self, name, vectors, top_k=8, source_filters=None):
+        source_filters = source_filters or [None] * len(vectors)
+        return [self.search(name, v, top_k, f) for v, f in zip(vectors, source_filters)]
+
+
+# === Qdrant backend ===
+class QdrantVectorStore(VectorStore):
+    def __init__(self, host=QDRANT_HOST, port=QDRANT_PORT, client=None, hnsw_ef=128,
+                 quantization=VECTOR_QUANTIZATION, oversample=RESCORE_OVERSAMPLE):
+        from qdrant_client import QdrantClient
+        self.client = client or QdrantClient(host=host, port=port)
+        self.hnsw_ef = hnsw_ef
+        self.quantization = None if quantization in ("", "none") else quantization
+        self.oversample = oversample
+        self.meta_file = QDRANT_META_FILE
+        self._meta_lock = threading.Lock()
+
+    def _quantization_config(self):
+        from qdrant_client.http import models
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        if self.quantization:
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION '{self.quantization}'")
+        return None
+
+    def _search_params(self):
+        from qdrant_client.http.models import SearchParams, QuantizationSearchParams
+        if not self.quantization:
+            return SearchParams(hnsw_ef=self.hnsw_ef)
+        return SearchParams(
+            hnsw_ef=self.hnsw_ef,
+            quantization=QuantizationSearchParams(rescore=True, oversampling=self.oversample)
+        )
+
+    @staticmethod
+    def _filter(source_filter):
+        if not source_filter:
+            return None
+        from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+        return Filter(must=[FieldCondition(key="source", match=MatchValue(value=source_filter))])
+
+    def list_collections(self):
+        return [c.name for c in self.client.get_collections().collections]
+
+    def ensure_collection(self, name, dim):
+        from qdrant_client.http.models import VectorParams, Distance
+        if name not in self.list_collections():
+            # With quantization the codes stay in RAM and the originals move to disk
+            self.client.recreate_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=bool(self.quantization)),
+                quantization_config=self._quantization_config()
+            )
+            print(f"🆕 Created collection: {name}")
+            return True
+        return False
+
+    def delete_collection(self, name):
+        self.client.delete_collection(collection_name=name)
+        self.set_metadata(name, None)
+
+    def _read_meta(self):
+        if not self.meta_file.exists():
+            return {}
+        with open(self.meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_metadata(self, name):
+        # Qdrant 1.7 has no collection metadata, so it lives in a JSON file next to the data
+        with self._meta_lock:
+            return dict(self._read_meta().get(name, {}))
+
+    def set_metadata(self, name, metadata):
+        with self._meta_lock:
+            meta = self._read_meta()
+            if metadata is None:
+                meta.pop(name, None)
+            else:
+                meta[name] = metadata
+            self.meta_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.meta_file.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            os.replace(tmp, self.meta_file)
+
+    def count(self, name):
+        return self.client.count(collection_name=name, exact=True).count
+
+    def upsert(self, name, ids, vectors, payloads):
+        from qdrant_client.http.models import PointStruct
+        points = [
+            PointStruct(id=id_, vector=np.asarray(vec, dtype=np.float32).tolist(), payload=payload)
+            for id_, vec, payload in zip(ids, vectors, payloads)
+        ]
+        if points:
+            self.client.upsert(collection_name=name, points=points)
+        return len(points)
+
+    def delete(self, name, ids):
+        from qdrant_client.http.models import PointIdsList
+        ids = list(ids)
+        if ids:
+            self.client.delete(collection_name=name, points_selector=PointIdsList(points=ids))
+        return len(ids)
+
+    def set_payload(self, name, ids, payloads):
+        for id_, payload in zip(ids, payloads):
+            self.client.overwrite_payload(collection_name=name, payload=payload, points=[id_])
+        return len(ids)
+
+    def scroll(self, name, source_filter=None, with_vectors=False):
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=name,
+                scroll_filter=self._filter(source_filter),
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors,
+            )
+            for p in points:
+                ids.append(p.id)
+                payloads.append(p.payload)
+                if with_vectors:
+                    vectors.append(p.vector)
+            if offset is None:
+                break
+        if not with_vectors:
+            return ids, None, payloads
+        return ids, np.asarray(vectors, dtype=np.float32), payloads
+
+    def search(self, name, vector, top_k=8, source_filter=None):
+        return self.client.search(
+            collection_name=name,
+            query_vector=np.asarray(vector, dtype=np.float32).tolist(),
+            limit=top_k,
+            with_payload=True,
+            with_vectors=False,
+            query_filter=self._filter(source_filter),
+            search_params=self._search_params()
+        )
+
+    def search_batch(self, name, vectors, top_k=8, source_filters=None):
+        from qdrant_client.http.models import SearchRequest
+        source_filters = source_filters or [None] * len(vectors)
+        requests = [
+            SearchRequest(
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                filter=self._filter(source_filter),
+                limit=top_k,
+                with_payload=True,
+                with_vector=False,
+                params=self._search_params()
+            )
+            for vector, source_filter in zip(vectors, source_filters)
+        ]
+        return self.client.search_batch(collection_name=name, requests=requests)
+
+
+# === In-process NumPy backend ===
+class _Collection:
+    """Immutable snapshot of one collection; writers swap in a new snapshot."""
+
+    def __init__(self, vectors, ids, payloads, codes=None, quantizer=None):
+        self.vectors = vectors
+        self.codes = codes
+        self.quantizer = quantizer
+        self.ids = ids
+        self.payloads = payloads
+        self.row_of = {id_: i for i, id_ in enumerate(ids)}
+        sources = np.array([p.get("source", "") for p in payloads], dtype=object)
+        self.source_masks = {s: sources == s for s in set(sources.tolist())}
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+
+class NumpyVectorStore(VectorStore):
+    def __init__(self, root=NUMPY_STORE_DIR, quantization=VECTOR_QUANTIZATION, oversample=RESCORE_OVERSAMPLE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.quantization = None if quantization in ("", "none") else quantization
+        if self.quantization:
+            get_quantizer(self.quantization)  # fail fast on unknown modes
+        self.oversample = oversample
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, name):
+        return self.root / name
+
+    def _codes(self, directory, vectors, rebuild=False):
+        """Load (or build and save) the compact codes for a collection."""
+        if not self.quantization:
+            return None, None
+        path = directory / f"codes_{self.quantization}.npz"
+        quantizer = get_quantizer(self.quantization)
+        if path.exists() and not rebuild:
+            with np.load(path) as data:
+                params = {k: data[k] for k in data.files if k != "codes"}
+                codes = data["codes"]
+            if len(codes) == len(vectors):
+                return codes, type(quantizer).from_params(params)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        quantizer.fit(vectors)
+        codes = quantizer.encode(vectors)
+        np.savez(path, codes=codes, **quantizer.params())
+        return codes, quantizer
+
+    def _load(self, name):
+        snapshot = self._collections.get(name)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if name not in self._collections:
+                directory = self._dir(name)
+                if not (directory / "vectors.npy").exists():
+                    raise KeyError(f"Collection not found: {name}")
+                vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+                with open(directory / "points.jsonl", "r", encoding="utf-8") as f:
+                    points = [json.loads(line) for line in f]
+                codes, quantizer = self._codes(directory, vectors)
+                self._collections[name] = _Collection(
+                    vectors, [p["id"] for p in points], [p["payload"] for p in points], codes, quantizer
+                )
+            return self._collections[name]
+
+    def _write(self, name, vectors, ids, payloads):
+        """Persist a collection atomically and memory-map the new matrix (caller holds the lock)."""
+        directory = self._dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = directory / "vectors.tmp.npy"
+        tmp_points = directory / "points.tmp.jsonl"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(tmp_points, "w", encoding="utf-8") as f:
+            for id_, payload in zip(ids, payloads):
+                json.dump({"id": id_, "payload": payload}, f)
+                f.write("\n")
+        os.replace(tmp_vectors, directory / "vectors.npy")
+        os.replace(tmp_points, directory / "points.jsonl")
+        mapped = np.load(directory / "vectors.npy", mmap_mode="r")
+        codes, quantizer = self._codes(directory, vectors, rebuild=True)
+        self._collections[name] = _Collection(mapped, list(ids), list(payloads), codes, quantizer)
+
+    def list_collections(self):
+        return sorted(p.name for p in self.root.iterdir() if (p / "vectors.npy").exists())
+
+    def ensure_collection(self, name, dim):
+        with self._lock:
+            if name in self._collections or (self._dir(name) / "vectors.npy").exists():
+                return False
+            self._write(name, np.zeros((0, dim), dtype=np.float32), [], [])
+        print(f"🆕 Created collection: {name}")
+        return True
+
+    def delete_collection(self, name):
+        import shutil
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._dir(name), ignore_errors=True)
+
+    def count(self, name):
+        return len(self._load(name).ids)
+
+    def get_metadata(self, name):
+        path = self._dir(name) / "meta.json"
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def set_metadata(self, name, metadata):
+        directory = self._dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(directory / "meta.tmp.json", "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(directory / "meta.tmp.json", directory / "meta.json")
+
+    def upsert(self, name, ids, vectors, payloads):
+        ids = [str(i) for i in ids]
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if not ids:
+            return 0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        self._load(name)
+        with self._lock:
+            current = self._collections[name]
+            new_vectors = np.array(current.vectors, dtype=np.float32)
+            new_ids = list(current.ids)
+            new_payloads = list(current.payloads)
+            appended = []
+            for id_, vec, payload in zip(ids, vectors, payloads):
+                row = current.row_of.get(id_)
+                if row is None:
+                    appended.append(vec)
+                    new_ids.append(id_)
+                    new_payloads.append(payload)
+                else:
+                    new_vectors[row] = vec
+                    new_payloads[row] = payload
+            if appended:
+                new_vectors = np.vstack([new_vectors, np.stack(appended)])
+            self._write(name, new_vectors, new_ids, new_payloads)
+        return len(ids)
+
+    def delete(self, name, ids):
+        drop = {str(i) for i in ids}
+        self._load(name)
+        with self._lock:
+            current = self._collections[name]
+            keep = [i for i, id_ in enumerate(current.ids) if id_ not in drop]
+            removed = len(current.ids) - len(keep)
+            if removed:
+                self._write(
+                    name,
+                    np.asarray(current.vectors[keep], dtype=np.float32).reshape(len(keep), current.dim),
+                    [current.ids[i] for i in keep],
+                    [current.payloads[i] for i in keep],
+                )
+        return removed
+
+    def set_payload(self, name, ids, payloads):
+        self._load(name)
+        with self._lock:
+            current = self._collections[name]
+            new_payloads = list(current.payloads)
+            changed = 0
+            for id_, payload in zip(ids, payloads):
+                row = current.row_of.get(str(id_))
+                if row is not None:
+                    new_payloads[row] = payload
+                    changed += 1
+            if changed:
+                self._write(name, current.vectors, current.ids, new_payloads)
+        return changed
+
+    def scroll(self, name, source_filter=None, with_vectors=False):
+        c = self._load(name)
+        if source_filter:
+            mask = c.source_masks.get(source_filter)
+            rows = np.flatnonzero(mask) if mask is not None else np.array([], dtype=np.int64)
+        else:
+            rows = np.arange(len(c.ids))
+        vectors = np.asarray(c.vectors[rows], dtype=np.float32) if with_vectors else None
+        return [c.ids[i] for i in rows], vectors, [c.payloads[i] for i in rows]
+
+    @staticmethod
+    def _best_rows(c, scores, k, source_filter):
+        if source_filter:
+            mask = c.source_masks.get(source_filter)
+            if mask is None:
+                return np.array([], dtype=np.int64)
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.array([], dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top[np.isfinite(scores[top])]
+
+    def _hits(self, c, rows, scores):
+        return [ScoredHit(c.ids[i], float(s), c.payloads[i]) for i, s in zip(rows, scores)]
+
+    def _search_quantized(self, c, vector, top_k, source_filter):
+        approx = c.quantizer.scores(c.codes, vector)
+        candidates = self._best_rows(c, approx, int(np.ceil(top_k * self.oversample)), source_filter)
+        if not len(candidates):
+            return []
+        rows, scores = rescore(c.vectors, candidates, vector, top_k)
+        return self._hits(c, rows, scores)
+
+    def search(self, name, vector, top_k=8, source_filter=None):
+        c = self._load(name)
+        vector = np.asarray(vector, dtype=np.float32)
+        if c.codes is not None:
+            return self._search_quantized(c, vector, top_k, source_filter)
+        scores = c.vectors @ vector
+        rows = self._best_rows(c, scores, top_k, source_filter)
+        return self._hits(c, rows, scores[rows])
+
+    def search_batch(self, name, vectors, top_k=8, source_filters=None):
+        c = self._load(name)
+        source_filters = source_filters or [None] * len(vectors)
+        if not len(vectors):
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if c.codes is not None:
+            return [self._search_quantized(c, v, top_k, f) for v, f in zip(vectors, source_filters)]
+        scores = vectors @ c.vectors.T
+        results = []
+        for row_scores, source_filter in zip(scores, source_filters):
+            rows = self._best_rows(c, row_scores, top_k, source_filter)
+            results.append(self._hits(c, rows, row_scores[rows]))
+        return results
+
+
+# === Factory ===
+BACKENDS = {"qdrant": QdrantVectorStore, "numpy": NumpyVectorStore}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide store selected by VECTOR_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if VECTOR_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}', expected one of {sorted(BACKENDS)}")
+                _store = BACKENDS[VECTOR_BACKEND]()
+    return _store
+
+
+def copy_collection(source, target, name, dim):
+    """Copy every point of a collection between backends (e.g. Qdrant → NumPy)."""
+    ids, vectors, payloads = source.scroll(name, with_vectors=True)
+    target.ensure_collection(name, dim)
+    metadata = source.get_metadata(name)
+    if metadata:
+        target.set_metadata(name, metadata)
+    return target.upsert(name, ids, vectors, payloads)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Copy collections from the Qdrant server into the NumPy store")
+    parser.add_argument("collections", nargs="+", help="Collection names, e.g. compliance_semantic")
+    args = parser.parse_args()
+
+    qdrant, local = QdrantVectorStore(), NumpyVectorStore()
+    for name in args.collections:
+        dim = qdrant.client.get_collection(name).config.params.vectors.size
+        n = copy_collection(qdrant, local, name, dim)
+        print(f"✅ Copied {n} points from Qdrant '{name}' → {local.root / name}")
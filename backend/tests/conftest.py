@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend modules are flat scripts imported the same way app.py does
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
@@ -0,0 +1,34 @@
+import numpy as np
+
+from answer_cache import AnswerCache
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_answer_cache_matches_similar_queries_per_filter_and_model():
+    cache = AnswerCache(maxsize=4, ttl=0, threshold=0.95)
+    cache.store(unit(1, 0, 0), "GDPR", "llama3", "answer", [], query="q")
+    entry, score = cache.lookup(unit(1, 0.1, 0), "GDPR", "llama3")
+    assert entry["answer"] == "answer" and score > 0.95
+    assert cache.lookup(unit(0, 1, 0), "GDPR", "llama3")[0] is None
+    assert cache.lookup(unit(1, 0, 0), None, "llama3")[0] is None
+    assert cache.lookup(unit(1, 0, 0), "GDPR", "mistral")[0] is None
+
+
+def test_answer_cache_invalidation_and_expiry(monkeypatch):
+    cache = AnswerCache(maxsize=1, ttl=10, threshold=0.9)
+    cache.store(unit(1, 0), None, "m", "old", [])
+    cache.bump_corpus_version()
+    assert cache.lookup(unit(1, 0), None, "m")[0] is None
+
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: now[0])
+    cache.store(unit(1, 0), None, "m", "first", [])
+    cache.store(unit(0, 1), None, "m", "second", [])
+    assert cache.stats()["size"] == 1
+    assert cache.lookup(unit(0, 1), None, "m")[0]["answer"] == "second"
+    now[0] += 11
+    assert cache.lookup(unit(0, 1), None, "m")[0] is None
@@ -0,0 +1,12 @@
+import runpy
+from pathlib import Path
+
+APP = Path(__file__).resolve().parents[1] / "app.py"
+
+
+def test_spawned_workers_do_not_build_app_state():
+    # A spawned pool worker runs the parent's main file under this name
+    namespace = runpy.run_path(str(APP), run_name="__mp_main__")
+    assert "run_compare_job" in namespace
+    for name in ("answer_cache", "readiness", "sessions", "uploads", "jobs"):
+        assert name not in namespace
@@ -0,0 +1,52 @@
+import numpy as np
+
+from bm25_index import HEADING_WEIGHT, BM25Index, tokenize
+
+RECORDS = [
+    {"id": "gdpr-33", "article_id": "Article 33", "title": "Notification of a personal data breach",
+     "source": "GDPR", "full_text": "The controller shall notify the breach within 72 hours."},
+    {"id": "gdpr-5", "article_id": "Article 5", "title": "Principles",
+     "source": "GDPR", "full_text": "Personal data shall be processed lawfully and fairly."},
+    {"id": "iso-a92", "article_id": "A.9.2", "title": "User access management",
+     "source": "ISO27001", "full_text": "Ensure authorized user access and prevent unauthorized access."},
+]
+
+
+def test_tokenize_keeps_labels_and_dotted_ids():
+    tokens = tokenize("See Article 33 and A.9.2")
+    assert "article_33" in tokens
+    assert "a.9.2" in tokens and "9.2" in tokens
+
+
+def test_exact_label_and_source_filter():
+    index = BM25Index.build(RECORDS)
+    assert index.search("Article 33")[0].id == "gdpr-33"
+    assert index.search("A.9.2")[0].id == "iso-a92"
+    assert [h.id for h in index.search("access", source_filter="GDPR")] == []
+    assert index.search("anything", source_filter="unknown") == []
+
+
+def test_csr_postings_match_the_documents():
+    index = BM25Index.build(RECORDS)
+    t = index.term_ids["access"]
+    docs = index.doc_ids[index.indptr[t]:index.indptr[t + 1]]
+    assert docs.tolist() == [2]
+    assert index.tfs[index.indptr[t]].item() == 2 + HEADING_WEIGHT
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "bm25.npz"
+    built = BM25Index.build(RECORDS)
+    built.save(path)
+    loaded = BM25Index.load(RECORDS, path)
+    assert loaded is not None
+    np.testing.assert_allclose(loaded.scores("personal data breach"), built.scores("personal data breach"))
+
+
+def test_load_rejects_changed_text_with_the_same_ids(tmp_path):
+    path = tmp_path / "bm25.npz"
+    BM25Index.build(RECORDS).save(path)
+    edited = [dict(RECORDS[0], full_text="Rewritten article text."), *RECORDS[1:]]
+    assert BM25Index.load(edited, path) is None
+    assert BM25Index.load(RECORDS[::-1], path) is None
+    assert BM25Index.load(RECORDS[:2], path) is None
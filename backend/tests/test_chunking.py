@@ -0,0 +1,59 @@
+from chunking import _Section, is_article_header, iter_chunks, iter_sections
+from context_packer import count_tokens
+
+
+def sentences(n, start=0):
+    return " ".join(f"Sentence number {i} ends here." for i in range(start, start + n))
+
+
+def test_headers():
+    assert is_article_header("Article 33 Notification")
+    assert is_article_header("A.9.2 User access management")
+    assert is_article_header("1.  PURPOSE")
+    assert not is_article_header("The controller shall notify the authority.")
+    assert is_article_header("2. Roles and Responsibilities")
+    assert not is_article_header("1. The controller shall notify the supervisory authority")
+    assert not is_article_header("3. Personal data shall be processed lawfully")
+    assert not is_article_header("4. Member States may provide")
+
+
+def test_section_splits_into_bounded_overlapping_parts():
+    section = _Section("Article 1", "Scope", page=1)
+    section.add(sentences(40), 1)
+    section.add(sentences(40, 40), 2)
+    pieces = list(section.take_full(max_tokens=100, overlap=10))
+    pieces.append(section.finish())
+
+    assert len(pieces) > 2
+    assert [p["part"] for p in pieces] == list(range(1, len(pieces) + 1))
+    for piece in pieces:
+        assert count_tokens(piece["content"]) <= 100
+        assert piece["article_id"] == "Article 1" and piece["title"] == "Scope"
+    # Pieces end after a sentence and the next one repeats a little of it
+    assert pieces[0]["content"].endswith(".")
+    assert pieces[1]["content"].split()[0] in pieces[0]["content"].split()[-5:]
+    assert pieces[0]["page"] == 1 and pieces[-1]["page_end"] == 2
+
+
+def test_short_section_has_no_part():
+    section = _Section("Article 2", "Definitions")
+    section.add("Short text.", None)
+    assert list(section.take_full(100, 10)) == []
+    assert "part" not in section.finish()
+
+
+def test_iter_sections_starts_a_chunk_at_every_header():
+    pages = [(1, "Preamble text\nArticle 1 Scope\nApplies to all."), (2, "Article 2 Definitions\nTerms.")]
+    chunks = list(iter_sections(pages, max_tokens=400, overlap=50))
+    assert [(c["article_id"], c["title"], c["page"]) for c in chunks] == [
+        ("", "", 1), ("Article", "1 Scope", 1), ("Article", "2 Definitions", 2)
+    ]
+
+
+def test_iter_chunks_bounds_every_record():
+    text = "Article 1 Scope\n" + sentences(200)
+    records = list(iter_chunks(text, "GDPR", "EU", lambda t: ["kw"], max_tokens=120, overlap=20))
+    assert len(records) > 1
+    assert all(count_tokens(r["full_text"]) <= 120 for r in records)
+    assert [r["id"] for r in records[:2]] == ["gdpr_0", "gdpr_1"]
+    assert all(r["top_keywords"] == ["kw"] and "page" not in r for r in records)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import compare_policies
+import compare_with_LLMs
+import pipeline
+
+ARTICLES = [{"article_id": f"Article {n}", "title": "", "full_text": "text"} for n in (5, 32, 33)]
+SIMS = np.array([[0.90, 0.10], [0.84, 0.20], [0.74, 0.30]], dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def model_bands(monkeypatch):
+    monkeypatch.setattr(compare_policies, "SIMILARITY_THRESHOLD", None)
+    monkeypatch.setattr(compare_policies, "COVERAGE_MARGIN", None)
+
+
+def test_bands_follow_the_embedding_model():
+    e5 = compare_policies.coverage_thresholds("e5-large-v2")
+    bge = compare_policies.coverage_thresholds("bge-base-en-v1.5")
+    assert e5["covered"] > bge["covered"]
+    # e5 similarities of unrelated text sit around 0.7-0.75
+    _, _, groups = compare_policies.classify(SIMS, e5)
+    assert list(groups) == ["covered", "ambiguous", "missing"]
+    _, _, groups = compare_policies.classify(SIMS, bge)
+    assert list(groups) == ["covered", "covered", "ambiguous"]
+
+
+def test_env_settings_override_the_model_bands(monkeypatch):
+    monkeypatch.setattr(compare_policies, "SIMILARITY_THRESHOLD", "0.5")
+    monkeypatch.setattr(compare_policies, "COVERAGE_MARGIN", "0.1")
+    assert compare_policies.coverage_thresholds("e5-large-v2") == {
+        "model": "intfloat/e5-large-v2", "threshold": 0.5, "covered": 0.6, "missing": 0.4,
+    }
+
+
+@pytest.mark.parametrize("gate, sent", [(False, 3), (True, 1)])
+def test_map_verdicts_gates_only_when_asked(monkeypatch, gate, sent):
+    calls = []
+
+    def fake_map(articles, excerpts, reg_source, model, concurrency, progress):
+        calls.append(articles)
+        return [{"article": a["article_id"], "status": "Partial", "risk": "", "mitigation": ""} for a in articles], {}
+
+    monkeypatch.setattr(compare_with_LLMs, "map_articles", fake_map)
+    coverage = compare_policies.coverage_report(ARTICLES, [{"full_text": "a"}, {"full_text": "b"}], SIMS)
+    verdicts, stats = pipeline.map_verdicts(ARTICLES, [[]] * 3, coverage, "GDPR", "llama3", 2, gate=gate)
+
+    assert len(calls[0]) == sent and stats["llm_articles"] == sent
+    assert [v["method"] for v in verdicts] == (["llm"] * 3 if not gate else ["similarity", "llm", "similarity"])
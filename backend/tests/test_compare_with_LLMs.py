@@ -0,0 +1,31 @@
+from compare_with_LLMs import parse_verdicts
+
+ITEMS = [
+    ({"article_id": "Article 5", "title": "Principles"}, []),
+    ({"article_id": "Article 32", "title": "Security of processing"}, []),
+    ({"article_id": "Article 33", "title": "Breach notification"}, []),
+]
+
+
+def test_parse_verdicts_matches_items_by_number():
+    reply = """
+- ITEM 2: ❌ MISSING
+  Risk: No encryption requirement.
+  Mitigation: Require encryption at rest.
+- ITEM 1: Covered
+"""
+    verdicts = parse_verdicts(reply, ITEMS)
+    assert verdicts[0] == {"article": "Article 5 Principles", "status": "Covered", "risk": "", "mitigation": ""}
+    assert verdicts[1] == {
+        "article": "Article 32 Security of processing",
+        "status": "Missing",
+        "risk": "No encryption requirement.",
+        "mitigation": "Require encryption at rest.",
+    }
+    assert verdicts[2]["status"] == "Not assessed"
+
+
+def test_parse_verdicts_keeps_the_first_answer_per_item():
+    reply = "ITEM 1: partial\nRisk: vague\nITEM 1: Covered"
+    assert parse_verdicts(reply, ITEMS[:1])[0]["status"] == "Partial"
+    assert parse_verdicts("", ITEMS[:1])[0]["status"] == "Not assessed"
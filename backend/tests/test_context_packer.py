@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+import context_packer
+from query_chunks import reciprocal_rank_fusion
+
+
+def hit(key, text=None):
+    return SimpleNamespace(payload={"source": "GDPR", "article_id": key, "full_text": text or f"Text of {key}."})
+
+
+@pytest.fixture(autouse=True)
+def no_index(monkeypatch):
+    monkeypatch.setattr(context_packer, "query_weights", lambda query: {})
+
+
+def header(position, hit, score):
+    return f"### SOURCE {position}\n"
+
+
+def test_cut_at_cliff_drops_results_after_a_large_step():
+    results = [("a", 0.9), ("b", 0.85), ("c", 0.4), ("d", 0.38)]
+    assert context_packer.cut_at_cliff(results, 0.4) == results[:2]
+    assert context_packer.cut_at_cliff(results, 0) == results
+
+
+def test_cut_at_cliff_keeps_a_gentle_slope():
+    results = [("a", 0.9), ("b", 0.8), ("c", 0.7)]
+    assert context_packer.cut_at_cliff(results, 0.4) == results
+
+
+def test_pack_context_keeps_rrf_results_that_agree_only_on_the_top_hit():
+    dense = [hit(k) for k in "abcd"]
+    lexical = [hit(k) for k in "aefg"]
+    fused = reciprocal_rank_fusion([dense, lexical])
+    # Read as similarities, the fused scores would be cut after the first hit
+    assert context_packer.cut_at_cliff(fused, context_packer.SCORE_CLIFF) == fused[:1]
+    blocks, stats = context_packer.pack_context("breach", fused, header, budget=10_000)
+    assert len(blocks) == 7
+    assert stats["cut_by_score"] == 0
+
+
+def test_pack_context_applies_the_cliff_when_asked():
+    results = [(hit("a"), 9.0), (hit("b"), 8.5), (hit("c"), 1.0)]
+    blocks, stats = context_packer.pack_context("breach", results, header, budget=10_000,
+                                                cliff=context_packer.SCORE_CLIFF)
+    assert [b[0].payload["article_id"] for b in blocks] == ["a", "b"]
+    assert stats["cut_by_score"] == 1
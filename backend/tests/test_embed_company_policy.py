@@ -0,0 +1,31 @@
+import pytest
+
+import embed_company_policy
+import embeddings
+from vector_store import NumpyVectorStore
+
+COLLECTION = embed_company_policy.COLLECTION_NAME
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = NumpyVectorStore(root=tmp_path / "store")
+    store.ensure_collection(COLLECTION, 4)
+    monkeypatch.setattr(embed_company_policy, "get_vector_store", lambda: store)
+    monkeypatch.setattr(embed_company_policy, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(embed_company_policy, "embed_and_store", lambda files: set())
+    monkeypatch.setattr(embeddings, "EMBEDDING_MODEL", "e5-small-v2")
+    monkeypatch.setattr(embeddings, "EMBEDDING_RUNTIME", "torch")
+    return store
+
+
+@pytest.mark.parametrize("meta, kept", [
+    ({"embedding_model": "intfloat/e5-small-v2", "runtime": "torch"}, True),
+    ({"embedding_model": "intfloat/e5-small-v2"}, True),
+    ({"embedding_model": "intfloat/e5-small-v2", "runtime": "onnx-int8"}, False),
+    ({"embedding_model": "intfloat/e5-base-v2", "runtime": "torch"}, False),
+])
+def test_process_all_resets_a_collection_from_another_model_or_runtime(store, meta, kept):
+    store.set_metadata(COLLECTION, meta)
+    embed_company_policy.process_all()
+    assert (COLLECTION in store.list_collections()) == kept
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(root=tmp_path, max_mb=1, segment_rows=4)
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def test_put_then_get_round_trip(cache):
+    texts = [f"text {i}" for i in range(6)]
+    stored = vectors(6)
+    assert cache.put("m", "torch", "passage: ", texts, stored) == 6
+
+    found, missing = cache.get("m", "torch", "passage: ", texts + ["unknown"])
+
+    assert missing == [6]
+    np.testing.assert_array_equal(np.stack([found[i] for i in range(6)]), stored)
+
+
+def test_runtime_prefix_and_model_are_part_of_the_key(cache):
+    cache.put("m", "torch", "passage: ", ["a"], vectors(1))
+    assert cache.get("m", "onnx-int8", "passage: ", ["a"])[1] == [0]
+    assert cache.get("m", "torch", "query: ", ["a"])[1] == [0]
+    assert cache.get("other", "torch", "passage: ", ["a"])[1] == [0]
+
+
+def test_hits_refresh_last_used_at_most_once_per_interval(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    cache.put("m", "torch", "", ["a"], vectors(1))
+
+    def last_used():
+        db = cache._connect()
+        try:
+            return db.execute("SELECT last_used FROM entries").fetchone()[0]
+        finally:
+            db.close()
+
+    clock[0] += embedding_cache.TOUCH_INTERVAL / 2
+    cache.get("m", "torch", "", ["a"])
+    assert last_used() == 1000.0
+    clock[0] += embedding_cache.TOUCH_INTERVAL
+    cache.get("m", "torch", "", ["a"])
+    assert last_used() == clock[0]
+
+
+def test_evict_drops_least_recently_used_and_compacts(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    texts = [f"t{i}" for i in range(8)]
+    stored = vectors(8)
+    for i, text in enumerate(texts):
+        clock[0] += 1
+        cache.put("m", "torch", "", [text], stored[i:i + 1])
+    assert cache.stats()["segments"] == 2
+
+    evicted = cache.evict(target_bytes=3 * 8 * 4)
+
+    assert evicted == 5
+    found, missing = cache.get("m", "torch", "", texts)
+    assert missing == [0, 1, 2, 3, 4]
+    np.testing.assert_array_equal(np.stack([found[i] for i in (5, 6, 7)]), stored[5:])
+    stats = cache.stats()
+    assert stats["segments"] == 1 and stats["bytes"] == 3 * 8 * 4
+    assert len(list(cache.root.glob("segment_*.npy"))) == 1
+
+
+def test_cached_encode_only_encodes_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_cache", EmbeddingCache(root=tmp_path))
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    embedding_cache.cached_encode("m", "torch", "p:", ["a", "bb"], encode)
+    result, hits = embedding_cache.cached_encode("m", "torch", "p:", ["bb", "ccc"], encode)
+
+    assert calls == [["p:a", "p:bb"], ["p:ccc"]]
+    assert hits == 1
+    np.testing.assert_array_equal(result, [[4, 1], [5, 1]])
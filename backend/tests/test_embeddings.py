@@ -0,0 +1,40 @@
+import pytest
+
+from embeddings import EmbeddingModelMismatch, Encoder, ModelSpec, check_model, record_model
+from vector_store import NumpyVectorStore
+
+
+class FakeEncoder(Encoder):
+    def __init__(self, runtime):
+        super().__init__(ModelSpec("fake/model", 4))
+        self.runtime = runtime
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(root=tmp_path)
+
+
+def test_record_model_stamps_model_and_runtime(store):
+    record_model(store, "c", FakeEncoder("torch"))
+    assert store.get_metadata("c") == {"embedding_model": "fake/model", "dim": 4, "runtime": "torch"}
+
+
+def test_check_model_rejects_another_runtime(store):
+    record_model(store, "c", FakeEncoder("torch"))
+    check_model(store, "c", FakeEncoder("torch"))
+    with pytest.raises(EmbeddingModelMismatch, match="EMBEDDING_RUNTIME"):
+        check_model(store, "c", FakeEncoder("onnx-int8"))
+
+
+def test_record_model_resets_scratch_collections_on_runtime_change(store):
+    record_model(store, "c", FakeEncoder("torch"))
+    record_model(store, "c", FakeEncoder("onnx-int8"), reset=True)
+    assert store.get_metadata("c")["runtime"] == "onnx-int8"
+
+
+def test_record_model_backfills_a_missing_runtime(store):
+    store.ensure_collection("c", 4)
+    store.set_metadata("c", {"embedding_model": "fake/model", "dim": 4})
+    record_model(store, "c", FakeEncoder("torch"))
+    assert store.get_metadata("c")["runtime"] == "torch"
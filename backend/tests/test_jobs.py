@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from jobs import JobQueue, JobStore, QueueFull
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.sqlite3")
+
+
+def wait_for(store, job_id, status, timeout=2):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if store.get(job_id)["status"] == status:
+            return True
+        done.wait(0.01)
+    return False
+
+
+def test_resume_requeues_queued_and_interrupts_running(store):
+    queued = store.create("echo", {"x": 1})
+    running = store.create("echo", {"x": 2})
+    store.transition(running, ("queued",), "running")
+
+    queue = JobQueue(store=store, workers=1)  # a fresh process after a restart
+    queue.register("echo", lambda params, job: {"echo": params["x"]})
+    queue.resume()
+
+    assert wait_for(store, queued, "succeeded")
+    assert store.get(queued, with_result=True)["result"] == {"echo": 1}
+    interrupted = store.get(running)
+    assert interrupted["status"] == "interrupted" and "restarted" in interrupted["error"]
+
+
+def test_progress_and_cancel_of_a_running_job(store):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(params, job):
+        job.progress(step=1)
+        started.set()
+        release.wait(2)
+        job.progress(step=2)  # raises once a cancel was requested
+
+    queue = JobQueue(store=store, workers=1)
+    queue.register("slow", slow)
+    job_id = queue.submit("slow", {})
+    assert started.wait(2)
+    assert store.get(job_id)["progress"] == {"step": 1}
+    assert queue.cancel(job_id) == "cancelling"
+    release.set()
+    assert wait_for(store, job_id, "cancelled")
+
+
+def test_failed_job_records_the_error_and_queue_is_bounded(store):
+    queue = JobQueue(store=store, workers=1, max_pending=1)
+    block = threading.Event()
+    queue.register("fail", lambda params, job: 1 / 0)
+    queue.register("block", lambda params, job: block.wait(2))
+
+    failed = queue.submit("fail", {})
+    assert wait_for(store, failed, "failed")
+    assert store.get(failed)["error"].startswith("ZeroDivisionError")
+
+    queue.submit("block", {})
+    with pytest.raises(QueueFull):
+        queue.submit("block", {})
+    block.set()
+    with pytest.raises(ValueError):
+        queue.submit("unknown", {})
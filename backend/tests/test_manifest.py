@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import manifest
+import pipeline
+
+
+def test_record_and_is_current(tmp_path):
+    path = tmp_path / "manifest.json"
+    doc = tmp_path / "GDPR.pdf"
+    doc.write_bytes(b"%PDF-1.4 test")
+    sha = manifest.file_hash(doc)
+
+    assert not manifest.is_current("GDPR", sha, "model-a", path)
+    manifest.record("GDPR", doc, sha, 12, "model-a", path)
+    assert manifest.is_current("GDPR", sha, "model-a", path)
+    assert not manifest.is_current("GDPR", sha, "model-b", path)
+    assert not manifest.is_current("GDPR", "0" * 64, "model-a", path)
+    assert json.loads(path.read_text())["GDPR"]["chunks"] == 12
+
+
+def test_is_current_compares_runtime_and_backend(tmp_path):
+    path = tmp_path / "manifest.json"
+    settings = {"runtime": "torch", "vector_backend": "qdrant"}
+    manifest.record("GDPR", tmp_path / "GDPR.pdf", "a" * 64, 3, "model-a", path, **settings)
+
+    assert manifest.is_current("GDPR", "a" * 64, "model-a", path, **settings)
+    assert not manifest.is_current("GDPR", "a" * 64, "model-a", path, **{**settings, "runtime": "onnx-int8"})
+    assert not manifest.is_current("GDPR", "a" * 64, "model-a", path, **{**settings, "vector_backend": "numpy"})
+
+
+def test_ingest_skips_a_document_that_is_current(tmp_path, monkeypatch):
+    path = tmp_path / "manifest.json"
+    doc = tmp_path / "GDPR.pdf"
+    doc.write_bytes(b"%PDF-1.4 test")
+    settings = {"runtime": "torch", "vector_backend": "numpy"}
+    manifest.record("GDPR", doc, manifest.file_hash(doc), 7, "model-a", path, **settings)
+    (tmp_path / "GDPR.jsonl").write_text("")
+    real_get = manifest.get
+    monkeypatch.setattr(manifest, "get", lambda source, _=None: real_get(source, path))
+    monkeypatch.setattr(pipeline, "REG_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "active_model_name", lambda: "model-a")
+    monkeypatch.setattr(pipeline, "ingest_settings", lambda: settings)
+    monkeypatch.setattr(pipeline, "parse_document", lambda _: pytest.fail("a current document was parsed"))
+
+    result = pipeline.ingest_standard(doc, "GDPR")
+
+    assert result["unchanged"] and result["chunks"] == 7 and result["added"] == 0
+    assert [s["stage"] for s in result["stages"]] == ["hash"]
@@ -0,0 +1,46 @@
+import json
+import time
+
+import pytest
+
+import namespaces
+from namespaces import COLLECTION_PREFIX, MARKER, NamespaceStore
+from vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def vector_store(tmp_path, monkeypatch):
+    store = NumpyVectorStore(root=tmp_path / "vectors")
+    monkeypatch.setattr(namespaces, "get_vector_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def uploads(tmp_path, vector_store, monkeypatch):
+    ns = NamespaceStore(root=tmp_path / "uploads", ttl=60)
+    monkeypatch.setattr(ns, "start_collector", lambda: None)
+    return ns
+
+
+def test_get_rejects_unknown_or_malformed_ids(uploads):
+    namespace = uploads.create()
+    assert uploads.get(namespace.id).collection == f"{COLLECTION_PREFIX}{namespace.id}"
+    assert uploads.get("../etc") is None
+    assert uploads.get("0" * 16) is None
+
+
+def test_collect_removes_expired_namespaces_and_orphans(uploads, vector_store):
+    live, expired = uploads.create(), uploads.create()
+    for namespace in (live, expired):
+        vector_store.ensure_collection(namespace.collection, 4)
+    vector_store.ensure_collection(f"{COLLECTION_PREFIX}{'f' * 16}", 4)  # directory already gone
+    vector_store.ensure_collection("standards", 4)
+    marker = expired.dir / MARKER
+    info = json.loads(marker.read_text())
+    marker.write_text(json.dumps({**info, "last_used": time.time() - 120}))
+
+    assert uploads.collect() == 2
+
+    assert not expired.dir.exists() and live.dir.exists()
+    assert vector_store.list_collections() == sorted([live.collection, "standards"])
+    assert uploads.stats()["namespaces"] == 1 and uploads.collected == 2
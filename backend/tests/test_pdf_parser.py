@@ -0,0 +1,39 @@
+import fitz
+import pytest
+
+from pdf_parser import iter_documents, page_lines, page_ranges, parse_documents
+
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        doc.new_page().insert_text((72, 72), f"Article {n}\nBody of page {n} of {path.stem}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    return [make_pdf(tmp_path / "a.pdf", 5), make_pdf(tmp_path / "b.pdf", 3)]
+
+
+def test_page_ranges_cover_every_page():
+    assert page_ranges(5, 2) == [(0, 2), (2, 4), (4, 5)]
+    assert page_ranges(0, 2) == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_iter_documents_yields_each_document_in_order(pdfs, workers):
+    stats = {}
+    documents = list(iter_documents(pdfs, workers=workers, pages_per_task=2, stats=stats))
+    assert [path for path, _ in documents] == pdfs
+    assert [[n for n, _ in pages] for _, pages in documents] == [[1, 2, 3, 4, 5], [1, 2, 3]]
+    assert "Body of page 3 of b" in documents[1][1][2][1]
+    assert stats["documents"] == 2 and stats["pages"] == 8 and stats["pages_per_s"]
+    assert dict(documents) == parse_documents(pdfs, workers=1)[0]
+
+
+def test_page_lines_accepts_text_or_pages():
+    assert list(page_lines("a\nb")) == [(None, "a"), (None, "b")]
+    assert list(page_lines(iter([(1, "a"), (2, "b\nc")]))) == [(1, "a"), (2, "b"), (2, "c")]
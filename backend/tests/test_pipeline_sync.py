@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import pipeline
+from vector_store import NumpyVectorStore
+
+MODEL = "test-model"
+COLLECTION = "standards"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = NumpyVectorStore(root=tmp_path)
+    store.ensure_collection(COLLECTION, 4)
+    monkeypatch.setattr(pipeline, "get_vector_store", lambda: store)
+    monkeypatch.setattr(pipeline, "active_model_name", lambda: MODEL)
+    return store
+
+
+def payload(article, text, **extra):
+    return {"source": "GDPR", "article_id": article, "title": f"Article {article}", "full_text": text, **extra}
+
+
+def seed(store, payloads):
+    ids = [pipeline.chunk_id("GDPR", p, MODEL) for p in payloads]
+    store.upsert(COLLECTION, ids, np.eye(len(ids), 4, dtype=np.float32), payloads)
+    return ids
+
+
+def test_diff_chunks_splits_new_updated_and_stale(store):
+    ids = seed(store, [payload("1", "alpha"), payload("2", "beta"), payload("3", "gamma")])
+    wanted = [payload("1", "alpha"), payload("2", "beta", page=4), payload("4", "delta")]
+
+    new, updated, stale, stats = pipeline.diff_chunks(COLLECTION, "GDPR", wanted)
+
+    assert [p["article_id"] for _, p in new] == ["4"]
+    assert updated == [(ids[1], wanted[1])]
+    assert stale == [ids[2]]
+    assert stats == {"skipped": 1, "added": 1, "updated": 1, "deleted": 1, "duplicates": 0}
+
+
+def test_diff_chunks_counts_duplicates(store):
+    seed(store, [payload("1", "alpha")])
+    new, updated, stale, stats = pipeline.diff_chunks(COLLECTION, "GDPR", [payload("1", "alpha")] * 2)
+    assert (new, updated, stale) == ([], [], [])
+    assert stats["duplicates"] == 1 and stats["skipped"] == 1
+
+
+def test_update_payloads_keeps_vectors(store):
+    ids = seed(store, [payload("1", "alpha"), payload("2", "beta")])
+    before = np.array(store.scroll(COLLECTION, with_vectors=True)[1])
+    changed = payload("2", "beta", page=7, top_keywords=["beta"])
+
+    assert pipeline.update_payloads(COLLECTION, [(ids[1], changed)]) == 1
+
+    stored_ids, vectors, payloads = store.scroll(COLLECTION, with_vectors=True)
+    assert dict(zip(stored_ids, payloads))[ids[1]] == changed
+    np.testing.assert_array_equal(vectors, before)
+    assert pipeline.diff_chunks(COLLECTION, "GDPR", [payload("1", "alpha"), changed])[3]["updated"] == 0
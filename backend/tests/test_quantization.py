@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from quantization import BinaryQuantizer, Int8Quantizer, get_quantizer, memory_report, rescore
+from vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def vectors():
+    v = np.random.default_rng(7).normal(size=(200, 32)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_int8_round_trip_within_half_a_step(vectors):
+    q = Int8Quantizer().fit(vectors)
+    codes = q.encode(vectors)
+    assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+    decoded = codes.astype(np.float32) * q.scale
+    assert np.all(np.abs(decoded - vectors) <= q.scale / 2 + 1e-6)
+
+    restored = Int8Quantizer.from_params(q.params())
+    np.testing.assert_array_equal(restored.encode(vectors), codes)
+    np.testing.assert_allclose(restored.scores(codes, vectors[0]), vectors @ vectors[0], atol=0.05)
+
+
+def test_binary_scores_are_sign_dot_products(vectors):
+    q = BinaryQuantizer().fit(vectors)
+    codes = q.encode(vectors)
+    assert codes.shape == (200, 4) and codes.dtype == np.uint8
+    signs = np.where(vectors > 0, 1, -1)
+    np.testing.assert_array_equal(q.scores(codes, vectors[3]), signs @ signs[3])
+
+    restored = BinaryQuantizer.from_params(q.params())
+    assert restored.dim == 32
+    np.testing.assert_array_equal(restored.scores(codes, vectors[3]), q.scores(codes, vectors[3]))
+
+
+def test_rescore_orders_candidates_exactly(vectors):
+    rows, scores = rescore(vectors, np.array([5, 0, 9]), vectors[9], top_k=2)
+    assert rows[0] == 9 and scores[0] == pytest.approx(1.0)
+    assert len(rows) == 2
+
+
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        get_quantizer("int4")
+    assert memory_report(10, 32, "binary")["ratio"] == 32.0
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_quantized_store_finds_the_exact_neighbour(tmp_path, vectors, mode):
+    store = NumpyVectorStore(root=tmp_path, quantization=mode, oversample=4)
+    store.ensure_collection("c", 32)
+    store.upsert("c", [f"p{i}" for i in range(len(vectors))], vectors, [{"n": i} for i in range(len(vectors))])
+    hits = store.search("c", vectors[42], top_k=3)
+    assert hits[0].id == "p42" and hits[0].score == pytest.approx(1.0, abs=1e-5)
+    assert (tmp_path / "c" / f"codes_{mode}.npz").exists()
@@ -0,0 +1,16 @@
+from query_cache import LRUCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What\tis\n GDPR？ ") == "What is GDPR?"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 1, "hit_rate": 0.6667}
+    LRUCache(maxsize=0).put("x", 1)
@@ -0,0 +1,34 @@
+import pytest
+
+from query_chunks import reciprocal_rank_fusion
+
+
+class Hit:
+    def __init__(self, id, score, payload):
+        self.id, self.score, self.payload = id, score, payload
+
+
+def hit(article, source="GDPR", score=1.0):
+    return Hit(article, score, {"source": source, "article_id": article, "full_text": f"text {article}"})
+
+
+def test_rrf_sums_reciprocal_ranks_across_lists():
+    dense = [hit("1"), hit("2"), hit("3")]
+    lexical = [hit("3"), hit("1")]
+    fused = reciprocal_rank_fusion([dense, lexical], k=60)
+    assert [h.payload["article_id"] for h, _ in fused] == ["1", "3", "2"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[2][1] == pytest.approx(1 / 62)
+
+
+def test_rrf_merges_by_content_not_by_point_id():
+    a, b = hit("1"), hit("1")
+    b.id = "another-id"
+    fused = reciprocal_rank_fusion([[a], [b]])
+    assert len(fused) == 1 and fused[0][0] is a
+
+
+def test_rrf_keeps_sources_apart_and_limits():
+    fused = reciprocal_rank_fusion([[hit("1", "GDPR"), hit("1", "CCPA"), hit("2")]], limit=2)
+    assert [(h.payload["source"], h.payload["article_id"]) for h, _ in fused] == [("GDPR", "1"), ("CCPA", "1")]
+    assert reciprocal_rank_fusion([[], []]) == []
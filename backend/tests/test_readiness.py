@@ -0,0 +1,58 @@
+import pytest
+
+import readiness
+from readiness import Readiness
+
+
+@pytest.fixture
+def llm_down(monkeypatch):
+    calls = []
+
+    def fail(model):
+        calls.append(model)
+        if len(calls) < 3:
+            raise ConnectionError("ollama unreachable")
+        return {"model": model}
+
+    monkeypatch.setattr(readiness, "warm_embedding_model", lambda: {})
+    monkeypatch.setattr(readiness, "warm_vector_store", lambda: {})
+    monkeypatch.setattr(readiness, "warm_bm25", lambda: {})
+    monkeypatch.setattr(readiness, "warm_llm", fail)
+    return calls
+
+
+def make(requires_llm):
+    r = Readiness("llama3", requires_llm=requires_llm, retry_seconds=0.01)
+    r.probes = {}
+    return r
+
+
+def test_optional_llm_does_not_hold_back_warmed(llm_down):
+    r = make(requires_llm=False)
+    r.start()
+    assert r.warmed.wait(1)
+    assert r.finished.wait(1)
+    assert len(llm_down) == 3
+    ready, report = r.readiness()
+    assert ready and "llm" not in report["dependencies"]
+    assert report["optional"]["llm"]["state"] == "ready"
+
+
+def test_warmed_waits_for_a_required_llm(llm_down):
+    r = make(requires_llm=True)
+    ready, report = r.readiness()
+    assert not ready and report["optional"] == {}
+    r.start()
+    assert r.finished.wait(1)
+    assert r.warmed.is_set() and len(llm_down) == 3
+    assert r.readiness()[0]
+
+
+def test_failed_required_step_is_reported(monkeypatch, llm_down):
+    monkeypatch.setattr(readiness, "warm_bm25", lambda: 1 / 0)
+    r = make(requires_llm=False)
+    r._warm_up = lambda: None
+    assert not r._run_step("bm25")
+    ready, report = r.readiness()
+    assert not ready
+    assert report["dependencies"]["bm25"]["error"].startswith("ZeroDivisionError")
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from context_packer import SCORE_CLIFF, cut_at_cliff
+from reranker import CrossEncoderReranker
+from vector_store import ScoredHit
+
+
+class FakeModel:
+    """Scores a passage by its length; blocks while `gate` is cleared."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        self.calls += 1
+        self.gate.wait()
+        return [float(len(passage)) for _, passage in pairs]
+
+
+def hits(*texts):
+    return [(ScoredHit(str(i), 1.0 / (i + 1), {"full_text": t, "article_id": str(i)}), 1.0 / (i + 1))
+            for i, t in enumerate(texts)]
+
+
+@pytest.fixture
+def reranker():
+    r = CrossEncoderReranker(model_name="fake", budget_ms=100, cache_size=64)
+    r._model = FakeModel()
+    return r
+
+
+def test_reorders_by_cross_encoder_score_and_caches(reranker):
+    ranked = hits("short", "a much longer passage", "medium text")
+    results, info = reranker.rerank("Query", ranked, top_n=2)
+    assert [h.id for h, _ in results] == ["1", "2"]
+    assert info["scored"] == 3 and info["reranker"] == "fake"
+
+    _, info = reranker.rerank("  Query ", ranked, top_n=2)
+    assert info["cached"] == 3 and reranker._model.calls == 1
+
+
+def test_cliff_applies_to_probabilities_not_raw_logits(reranker):
+    # ms-marco style logits: two relevant passages near 0, the rest far below
+    logits = {"a": -0.2, "bb": -0.9, "ccc": -7.5, "dddd": -8.1}
+    reranker._model.predict = lambda pairs, **kw: [logits[p] for _, p in pairs]
+    results, _ = reranker.rerank("q", hits(*logits), top_n=4)
+
+    assert all(0 < s < 1 for _, s in results)
+    assert [h.payload["full_text"] for h, _ in cut_at_cliff(results, SCORE_CLIFF)] == ["a", "bb"]
+    raw = [(h, logits[h.payload["full_text"]]) for h, _ in results]
+    assert len(cut_at_cliff(raw, SCORE_CLIFF)) == 1
+
+
+def test_near_zero_logits_are_not_cut(reranker):
+    logits = {"a": 0.1, "bb": 0.05, "ccc": -0.1}
+    reranker._model.predict = lambda pairs, **kw: [logits[p] for _, p in pairs]
+    results, _ = reranker.rerank("q", hits(*logits), top_n=3)
+    assert len(cut_at_cliff(results, SCORE_CLIFF)) == 3
+
+
+def test_falls_back_without_loading_under_the_budget(monkeypatch):
+    r = CrossEncoderReranker(model_name="fake", budget_ms=100)
+    loaded = threading.Event()
+    monkeypatch.setattr(r, "warm", lambda: loaded.set())
+
+    results, info = r.rerank("q", hits("a", "bb"), top_n=1)
+
+    assert info == {"reranker": "fallback", "reason": "model still loading", "ms": info["ms"]}
+    assert [h.id for h, _ in results] == ["0"]
+    assert loaded.wait(1)
+
+
+def test_does_not_queue_behind_a_call_that_ran_over_budget(reranker):
+    model = reranker._model
+    model.gate.clear()
+    _, info = reranker.rerank("q", hits("a", "bb"))
+    assert info["reason"].startswith("exceeded")
+
+    start = time.perf_counter()
+    _, info = reranker.rerank("other query", hits("a", "bb"))
+    assert info["reason"] == "busy with an earlier request"
+    assert time.perf_counter() - start < 0.05
+    assert model.calls == 1
+
+    model.gate.set()
+    deadline = time.time() + 1
+    while reranker._busy.locked() and time.time() < deadline:
+        time.sleep(0.005)
+    _, info = reranker.rerank("q", hits("a", "bb"))
+    assert info["cached"] == 2  # the late scores of the timed-out call were kept